@@ -0,0 +1,87 @@
+"""
+LM Studio tuner core (the GUI is docs/research/lmstudio_tuner_gui.py).
+
+GUI-free modules, importable on their own:
+
+- formatting: token counting, prompt templates, RequestParams, payloads
+- presets: built-in presets, default prompts, saved-preset access
+- metrics: StreamMetrics, LMStudioStats-style counters and histograms
+- client: pooled HTTP sessions, streaming, cancellation (needs requests)
+- runaway: loop / stale / filler guards for streams, max_tokens advice
+- cache, history, preset_store: response cache, run history, preset file
+- codeexec: sandboxed execution scoring of generated code
+- sweep, autotune, loadgen, profiling, contextprof, compare, bestofn,
+  replay, dataset: the headless features
+- mockserver, bench: offline fake server and client-overhead benchmarks
+- cli: ``python -m lmstudio_tuner``; gui: the Tk front-end
+
+Names listed in __all__ are resolved on first attribute access (PEP 562),
+so ``import lmstudio_tuner`` itself costs next to nothing and e.g.
+``lmstudio_tuner.apply_prompt_format`` never imports requests or Tk.
+"""
+from __future__ import annotations
+
+import importlib
+from typing import Any, Dict, List
+
+_EXPORTS: Dict[str, str] = {
+    "apply_prompt_format": "formatting",
+    "build_payload": "formatting",
+    "count_tokens": "formatting",
+    "estimate_tokens": "formatting",
+    "RequestParams": "formatting",
+    "TokenUsage": "formatting",
+    "DEFAULT_SYSTEM_PROMPT": "presets",
+    "DEFAULT_USER_PROMPT": "presets",
+    "PRESETS": "presets",
+    "make_params": "presets",
+    "resolve_preset": "presets",
+    "LatencyHistogram": "metrics",
+    "STATS": "metrics",
+    "StreamMetrics": "metrics",
+    "TunerStats": "metrics",
+    "percentile": "metrics",
+    "CancelToken": "client",
+    "configure_sessions": "client",
+    "fetch_models": "client",
+    "stream_chat_completion": "client",
+    "RUNAWAY": "runaway",
+    "RunawayGuard": "runaway",
+    "recommend_limits": "runaway",
+    "ResponseCache": "cache",
+    "cached_chat_completion": "cache",
+    "RunHistory": "history",
+    "CodeExecutor": "codeexec",
+    "exec_score": "codeexec",
+    "PresetStore": "preset_store",
+    "PresetStoreError": "preset_store",
+    "run_sweep": "sweep",
+    "auto_tune": "autotune",
+    "run_load_test": "loadgen",
+    "profile_model_load": "profiling",
+    "profile_context": "contextprof",
+    "run_comparison": "compare",
+    "run_best_of_n": "bestofn",
+    "load_reason_templates": "replay",
+    "run_replay": "replay",
+    "run_dataset": "dataset",
+    "MockConfig": "mockserver",
+    "serve_mock": "mockserver",
+    "run_benchmarks": "bench",
+    "main": "cli",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,216 @@
+"""
+Successive-halving search over sampling parameters against a scoring
+function and a latency budget; the quality/latency Pareto front is saved
+as presets.
+"""
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .client import CancelToken, stream_chat_completion
+from .formatting import RequestParams
+from .metrics import StreamMetrics, percentile
+from .presets import PRESETS, preset_store
+
+
+TUNE_SPACE: Dict[str, Tuple[float, float]] = {
+    "temperature": (0.0, 1.3),
+    "top_p": (0.5, 1.0),
+    "presence_penalty": (-0.5, 0.5),
+    "frequency_penalty": (-0.5, 0.5),
+    "repetition_penalty": (0.95, 1.25),
+}
+TUNE_MAX_TOKENS = (256, 512, 800, 1200, 2048)
+
+
+# score(text, params, metrics) -> higher is better
+ScoreFn = Callable[[str, RequestParams, StreamMetrics], float]
+
+
+def default_score(text: str, params: RequestParams, metrics: StreamMetrics) -> float:
+    """Cheap quality proxy for the default coding prompt (0..1).
+
+    Rewards fenced code, an answer that ended on its own before max_tokens
+    (not stopped by a runaway guard) and low word-level repetition. Pass a real scorer with --score for anything else.
+    """
+    if not text.strip():
+        return 0.0
+    score = 0.0
+    if "```" in text:
+        score += 0.4
+    if metrics.tokens < params.max_tokens and metrics.finish_reason != "runaway":
+        score += 0.3
+    words = text.split()
+    score += 0.3 * (len(set(words)) / len(words) if words else 0.0)
+    return score
+
+
+def load_score_fn(spec: str) -> ScoreFn:
+    """Load `module:function` or `path/to/file.py:function`; "exec" runs the response's code."""
+    if spec == "exec":
+        from .codeexec import exec_score
+        return exec_score
+    target, _, name = spec.rpartition(":")
+    if not target or not name:
+        raise ValueError(f"Score function must look like module:function, got {spec!r}")
+    if target.endswith(".py"):
+        mod_spec = importlib.util.spec_from_file_location(Path(target).stem, target)
+        if mod_spec is None or mod_spec.loader is None:
+            raise ImportError(f"Cannot load {target}")
+        module = importlib.util.module_from_spec(mod_spec)
+        mod_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return getattr(module, name)
+
+
+@dataclass
+class TuneCandidate:
+    settings: Dict[str, Any]
+    scores: List[float] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)  # successful trials only
+    failures: int = 0  # errors and trials cut off over the latency budget
+    pruned: str = ""
+
+    @property
+    def score(self) -> float:
+        """Mean score with every failed trial counted as 0, so flaky settings rank lower."""
+        trials = len(self.scores) + self.failures
+        return sum(self.scores) / trials if trials else 0.0
+
+    @property
+    def latency(self) -> float:
+        return percentile(self.latencies, 50)
+
+
+def sample_candidates(n: int, rng: random.Random, base_max_tokens: int = 800) -> List[Dict[str, Any]]:
+    """Built-in PRESETS first (as anchors), then uniform samples from TUNE_SPACE."""
+    out: List[Dict[str, Any]] = [dict(p, max_tokens=base_max_tokens) for p in PRESETS.values()][:n]
+    while len(out) < n:
+        settings: Dict[str, Any] = {k: round(rng.uniform(lo, hi), 3) for k, (lo, hi) in TUNE_SPACE.items()}
+        settings["max_tokens"] = rng.choice(TUNE_MAX_TOKENS)
+        out.append(settings)
+    return out
+
+
+def pareto_front(candidates: List[TuneCandidate]) -> List[TuneCandidate]:
+    """Candidates not beaten on both score (higher) and latency (lower), fastest first."""
+    pool = [c for c in candidates if c.scores]
+    front = [
+        c for c in pool
+        if not any(
+            o is not c and o.score >= c.score and o.latency <= c.latency
+            and (o.score > c.score or o.latency < c.latency)
+            for o in pool
+        )
+    ]
+    return sorted(front, key=lambda c: c.latency)
+
+
+def _tune_trial(base: RequestParams, settings: Dict[str, Any], prompt: str,
+                score_fn: ScoreFn, cutoff: float,
+                runaway_guard: bool = False) -> Tuple[Optional[float], Optional[float]]:
+    """One generation; returns (score, latency), both None if it was cut off or failed."""
+    params = replace(base, user_prompt=prompt, **settings)
+    token = CancelToken()
+    timer = threading.Timer(cutoff, token.cancel, kwargs={"reason": "over latency budget"})
+    timer.start()
+    try:
+        text, metrics = stream_chat_completion(params, cancel=token, guard=runaway_guard)
+    except Exception:
+        return None, None
+    finally:
+        timer.cancel()
+    if metrics.cancelled:
+        return None, None
+    return float(score_fn(text, params, metrics)), metrics.total
+
+
+def auto_tune(
+    base: RequestParams,
+    prompts: List[str],
+    score_fn: ScoreFn = default_score,
+    latency_budget: float = 30.0,
+    n_candidates: int = 16,
+    eta: int = 2,
+    rounds: int = 3,
+    workers: int = 2,
+    seed: Optional[int] = None,
+    on_progress: Optional[Callable[[str], None]] = None,
+    runaway_guard: bool = False,
+) -> Tuple[List[TuneCandidate], List[TuneCandidate]]:
+    """Successive halving: every round keeps the best 1/eta within the budget
+    and gives the survivors eta times more trials. A trial running past 1.5x
+    the budget is cancelled, which prunes the candidate for being too slow.
+
+    Trials decode in full unless `runaway_guard` is set.
+
+    Returns (all candidates, Pareto front of score vs. p50 latency).
+    """
+    rng = random.Random(seed)
+    prompts = prompts or [base.user_prompt]
+    candidates = [TuneCandidate(s) for s in sample_candidates(n_candidates, rng, base.max_tokens)]
+    alive = list(candidates)
+    trials = 1
+    cutoff = latency_budget * 1.5
+    for rnd in range(1, rounds + 1):
+        jobs = [(c, prompts[(len(c.scores) + c.failures + k) % len(prompts)]) for c in alive for k in range(trials)]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(_tune_trial, base, c.settings, prompt, score_fn, cutoff, runaway_guard): c for c, prompt in jobs}
+            for done, fut in enumerate(as_completed(futures), 1):
+                cand = futures[fut]
+                score, latency = fut.result()
+                if score is None or latency is None:
+                    cand.failures += 1  # no latency: a failure's elapsed time would flatter it
+                else:
+                    cand.scores.append(score)
+                    cand.latencies.append(latency)
+                if on_progress:
+                    on_progress(f"Auto-tune round {rnd}/{rounds}: {done}/{len(jobs)} trials")
+        for cand in alive:
+            if not cand.scores:
+                cand.pruned = f"round {rnd}: failed or cut off"
+            elif cand.latency > latency_budget:
+                cand.pruned = f"round {rnd}: p50 {cand.latency:.1f}s over budget"
+        survivors = sorted((c for c in alive if not c.pruned), key=lambda c: c.score, reverse=True)
+        keep = max(1, math.ceil(len(survivors) / eta))
+        for cand in survivors[keep:]:
+            cand.pruned = f"round {rnd}: score {cand.score:.3f}"
+        alive = survivors[:keep]
+        if len(alive) <= 1:
+            break
+        trials *= eta
+    front = pareto_front([c for c in candidates if c.latency <= latency_budget])
+    return candidates, front
+
+
+def save_tuned_presets(front: List[TuneCandidate], model: str) -> List[str]:
+    """Store the front in .autodev/presets.json as auto/<model>/<rank>, tagged "autotune"."""
+    presets: Dict[str, Dict[str, Any]] = {}
+    for rank, cand in enumerate(front, 1):
+        presets[f"auto/{model}/{rank}"] = dict(cand.settings, model=model, tags=["autotune"], autotune={
+            "score": round(cand.score, 4),
+            "latency_p50": round(cand.latency, 3),
+            "trials": len(cand.scores),
+            "failures": cand.failures,
+            "ts": round(time.time()),
+        })
+    preset_store().put_many(presets)
+    return list(presets)
+
+
+def format_front(front: List[TuneCandidate]) -> str:
+    lines = [f"{'#':>2} {'score':>6} {'p50 s':>6}  settings"]
+    for rank, c in enumerate(front, 1):
+        settings = ", ".join(f"{k}={v}" for k, v in c.settings.items())
+        lines.append(f"{rank:>2} {c.score:>6.3f} {c.latency:>6.2f}  {settings}")
+    return "\n".join(lines)
@@ -0,0 +1,221 @@
+"""
+Client-overhead benchmarks for the LM Studio tuner.
+
+Times what the tuner itself adds around a generation, so a change to
+prompt formatting, payload encoding, SSE parsing, UI flushing or
+connection handling shows up as a number instead of a feeling:
+
+- format / payload / json_*: prompt templates, build_payload, JSON encode
+  and decode of payloads and SSE chunks
+- sse_parse: iter_sse_data over a recorded stream body
+- ui_flush: UIUpdateQueue draining a burst of chunks into a headless text
+  sink (queue and coalescing cost, not Tk rendering)
+- request_pooled / request_fresh / stream_overhead: round trips against an
+  in-process mockserver with zero synthetic delay, over the pooled
+  keep-alive session vs. a new connection per request
+
+Each benchmark runs `rounds` rounds of `number` calls; the median and p95
+per-call time of the rounds are reported. The mock server shares the
+interpreter with the client, so network numbers are comparable between
+runs rather than absolute.
+"""
+from __future__ import annotations
+
+import io
+import json
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .formatting import RequestParams, apply_prompt_format, build_messages, build_payload, resolve_usage
+from .metrics import percentile
+from .presets import DEFAULT_SYSTEM_PROMPT, DEFAULT_USER_PROMPT, PRESETS, make_params
+
+FORMATS = ("None", "Llama 3", "ChatML", "Mistral")
+NETWORK_BENCHMARKS = ("request_pooled", "request_fresh", "stream_overhead")
+
+
+@dataclass
+class BenchResult:
+    name: str
+    number: int
+    rounds: int
+    median_us: float
+    p95_us: float
+    note: str = ""
+
+
+def time_call(fn: Callable[[], Any], number: int, rounds: int) -> Tuple[float, float]:
+    """Median and p95 microseconds per call over `rounds` rounds of `number` calls."""
+    fn()  # warm up caches and connections
+    per_call = []
+    for _ in range(max(1, rounds)):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number * 1e6)
+    return percentile(per_call, 50), percentile(per_call, 95)
+
+
+def _sse_body(text: str) -> bytes:
+    words = text.split(" ")
+    chunks = [{"id": "chatcmpl-bench", "object": "chat.completion.chunk", "model": "bench",
+               "choices": [{"index": 0, "delta": {"content": w + " "}, "finish_reason": None}]} for w in words]
+    lines = [f"data: {json.dumps(c)}\n\n" for c in chunks] + ["data: [DONE]\n\n"]
+    return "".join(lines).encode("utf-8")
+
+
+class _TextSink:
+    """The slice of tk.Text that UIUpdateQueue uses, without a display."""
+
+    def __init__(self) -> None:
+        self.chars = 0
+
+    def winfo_exists(self) -> bool:
+        return True
+
+    def yview(self) -> Tuple[float, float]:
+        return (0.0, 1.0)
+
+    def insert(self, index: str, data: str) -> None:
+        self.chars += len(data)
+
+    def delete(self, start: str, end: Optional[str] = None) -> None:
+        self.chars = 0
+
+    def see(self, index: str) -> None:
+        pass
+
+    def after(self, ms: int, fn: Callable[[], Any]) -> None:
+        pass  # flush() is driven by the benchmark instead of a Tk timer
+
+    def set(self, value: str) -> None:
+        pass
+
+
+def _local_benchmarks(params: RequestParams) -> Dict[str, Tuple[Callable[[], Any], int, str]]:
+    messages = build_messages(params.system_prompt, params.user_prompt)
+    payload = build_payload(params, stream=True)
+    encoded = json.dumps(payload)
+    chunk = json.dumps({"id": "chatcmpl-bench", "object": "chat.completion.chunk", "model": params.model,
+                        "choices": [{"index": 0, "delta": {"content": " token"}, "finish_reason": None}]})
+    completion = DEFAULT_USER_PROMPT * 4
+    body = _sse_body(completion)
+    benches: Dict[str, Tuple[Callable[[], Any], int, str]] = {
+        "format": (lambda: [apply_prompt_format(messages, f) for f in FORMATS], 2000, "all 4 formats"),
+        "payload": (lambda: build_payload(params, stream=True), 5000, ""),
+        "json_encode": (lambda: json.dumps(payload).encode("utf-8"), 5000, f"{len(encoded)} B payload"),
+        "json_decode_chunk": (lambda: json.loads(chunk), 20000, "one SSE delta"),
+        "usage_estimate": (lambda: resolve_usage(None, payload, completion), 5000, "no usage block"),
+    }
+    try:
+        import requests
+        from .client import iter_sse_data
+    except ImportError:
+        pass
+    else:
+        def sse_parse() -> int:
+            resp = requests.Response()
+            resp.raw = io.BytesIO(body)
+            return sum(1 for _ in iter_sse_data(resp))
+        benches["sse_parse"] = (sse_parse, 200, f"{body.count(b'data:')} events, {len(body)} B")
+    try:
+        from .gui import UIUpdateQueue
+    except ImportError:
+        pass
+    else:
+        sink = _TextSink()
+        ui = UIUpdateQueue(sink, sink, sink, max_chars=200_000)  # type: ignore[arg-type]
+        pieces = completion.split(" ")
+
+        def ui_flush() -> None:
+            for p in pieces:
+                ui.append_text(p + " ")
+            ui.set_status("streaming")
+            ui.flush()
+        benches["ui_flush"] = (ui_flush, 500, f"{len(pieces)} chunks per flush")
+    return benches
+
+
+def _network_benchmarks(params: RequestParams, server: Any,
+                        runaway_guard: bool = False) -> Dict[str, Tuple[Callable[[], Any], int, str]]:
+    import requests
+    from .client import get_session, stream_chat_completion
+    from .formatting import build_headers
+
+    one = replace(params, endpoint=server.url, max_tokens=1)
+    full = replace(params, endpoint=server.url, max_tokens=0)
+    url = f"{server.url}/v1/chat/completions"
+    body = build_payload(one)
+    headers = build_headers("")
+
+    def pooled() -> None:
+        get_session(server.url).post(url, json=body, headers=headers, timeout=10).raise_for_status()
+
+    def fresh() -> None:
+        requests.post(url, json=body, headers=dict(headers, Connection="close"), timeout=10).raise_for_status()
+
+    _, m = stream_chat_completion(full, guard=runaway_guard)
+    return {
+        "request_pooled": (pooled, 200, "1 token, keep-alive session"),
+        "request_fresh": (fresh, 200, "1 token, new connection each"),
+        "stream_overhead": (lambda: stream_chat_completion(full, guard=runaway_guard), 50,
+                            f"{m.chunks} deltas per stream{', guarded' if runaway_guard else ''}"),
+    }
+
+
+def run_benchmarks(only: Optional[List[str]] = None, network: bool = True, scale: float = 1.0,
+                   rounds: int = 5, on_result: Optional[Callable[[BenchResult], None]] = None,
+                   runaway_guard: bool = False) -> List[BenchResult]:
+    """Run the selected benchmarks; `scale` multiplies every call count (e.g. 0.1 for a quick pass).
+
+    `runaway_guard` includes the guard's per-delta cost in stream_overhead.
+    """
+    params = make_params("http://127.0.0.1:1", "", "bench-model", PRESETS["Coding"], "ChatML",
+                         DEFAULT_SYSTEM_PROMPT, DEFAULT_USER_PROMPT, 800)
+    benches = _local_benchmarks(params)
+    server = None
+    if network and (not only or any(n in only for n in NETWORK_BENCHMARKS)):
+        from .mockserver import MockConfig, serve_mock
+        server = serve_mock(MockConfig(models=[params.model], ttft=0.0, token_delay=0.0))
+        try:
+            benches.update(_network_benchmarks(params, server, runaway_guard))
+        except ImportError:
+            pass
+    results = []
+    try:
+        for name, (fn, number, note) in benches.items():
+            if only and name not in only:
+                continue
+            n = max(1, int(number * scale))
+            median, p95 = time_call(fn, n, rounds)
+            result = BenchResult(name, n, rounds, median, p95, note)
+            results.append(result)
+            if on_result:
+                on_result(result)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def bench_path() -> Path:
+    return Path('.autodev') / 'bench.jsonl'
+
+
+def last_bench() -> Dict[str, float]:
+    try:
+        with bench_path().open('r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        return json.loads(lines[-1]).get("median_us", {}) if lines else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def format_bench(result: BenchResult, previous: Optional[float] = None) -> str:
+    def fmt(us: float) -> str:
+        return f"{us / 1000:.2f}ms" if us >= 1000 else f"{us:.1f}us"
+    prev = fmt(previous) if previous else "-"
+    return f"{result.name:<18} {fmt(result.median_us):>10} {fmt(result.p95_us):>10} {prev:>10}  {result.note}"
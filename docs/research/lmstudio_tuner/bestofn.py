@@ -0,0 +1,432 @@
+"""
+Best-of-N sampling: N candidates for one prompt, scored while they stream.
+
+Candidates run in parallel (one streamed request each), or as a single
+request with the OpenAI ``n`` parameter when the server honours it
+(LM Studio answers ``n`` with one choice, so "auto" probes once per
+endpoint/model and falls back). Losers are stopped early:
+
+- a candidate that streams more than ``token_budget`` deltas (unless it
+  is the last one left)
+- once a candidate has finished, running ones with at least
+  ``min_tokens`` deltas whose partial score trails the best finished
+  candidate's score at the same length by more than ``margin``
+- stragglers still running ``patience`` x the first finisher's latency
+
+With ``n`` only the whole request can be aborted, so losers are dropped
+from scoring and the request is closed once no choice is left worth
+waiting for. Scorers with ``partial = False`` (exec_score) are too costly
+for partial output and only judge finished candidates. The result reports the added latency and the GPU time
+(summed generation seconds, an upper bound when the server batches)
+against a single sample, measured first with ``baseline=True`` or
+estimated from the finished candidates.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .autotune import ScoreFn, default_score
+from .client import CancelToken, error_kind, get_session, iter_sse_data, stream_chat_completion
+from .formatting import RequestParams, build_headers, build_payload
+from .history import RunHistory, history_row
+from .metrics import STATS, StreamMetrics, percentile
+
+
+@dataclass
+class Candidate:
+    index: int
+    text: str = ""
+    metrics: StreamMetrics = field(default_factory=StreamMetrics)
+    score: Optional[float] = None
+    partial_score: float = 0.0
+    partial_at: int = 0  # deltas when partial_score was taken
+    deltas: int = 0
+    offsets: List[int] = field(default_factory=list)  # len(text) after each delta
+    started: float = 0.0
+    ended: float = 0.0
+    cancelled: str = ""  # reason, when stopped early
+    error: str = ""
+
+    @property
+    def running(self) -> bool:
+        return not self.ended
+
+    @property
+    def finished(self) -> bool:
+        return self.score is not None
+
+    @property
+    def busy(self) -> float:
+        return max(0.0, (self.ended or time.perf_counter()) - self.started) if self.started else 0.0
+
+    @property
+    def status(self) -> str:
+        if self.error:
+            return "error"
+        if self.cancelled:
+            return f"cancelled ({self.cancelled})"
+        return "done" if self.finished else "running"
+
+
+@dataclass
+class BestOfNResult:
+    candidates: List[Candidate]
+    mode: str  # "parallel" or "server-n"
+    wall: float = 0.0
+    baseline: Optional[float] = None  # single-sample latency
+    baseline_measured: bool = False
+    baseline_tokens: int = 0
+    max_tokens: int = 0
+
+    @property
+    def best(self) -> Optional[Candidate]:
+        done = [c for c in self.candidates if c.finished]
+        return max(done, key=lambda c: (c.score, -c.metrics.total)) if done else None
+
+    @property
+    def added_latency(self) -> Optional[float]:
+        return self.wall - self.baseline if self.baseline is not None else None
+
+    @property
+    def gpu_time(self) -> float:
+        if self.mode == "server-n":
+            return self.wall  # one request; choices decode in the same batch
+        return sum(c.busy for c in self.candidates)
+
+    @property
+    def tokens_generated(self) -> int:
+        return sum(c.metrics.tokens or c.deltas for c in self.candidates)
+
+    @property
+    def tokens_saved(self) -> int:
+        """Tokens left undecoded by early cancellation, up to max_tokens (as StreamMetrics.savings)."""
+        return sum(max(0, self.max_tokens - c.deltas) for c in self.candidates if c.cancelled)
+
+
+_server_n_support: Dict[Tuple[str, str], bool] = {}
+_server_n_lock = threading.Lock()
+
+
+def server_supports_n(params: RequestParams) -> bool:
+    """Whether the server returns several choices for `n`; probed once per endpoint/model."""
+    key = (params.endpoint.rstrip('/'), params.model)
+    with _server_n_lock:
+        if key in _server_n_support:
+            return _server_n_support[key]
+    payload = dict(build_payload(params), n=2, max_tokens=1)
+    try:
+        resp = get_session(params.endpoint).post(f"{key[0]}/v1/chat/completions", json=payload,
+                                                 headers=build_headers(params.api_key), timeout=60)
+        supported = resp.ok and len((resp.json() or {}).get("choices") or []) >= 2
+    except (requests.RequestException, ValueError):
+        supported = False
+    with _server_n_lock:
+        _server_n_support[key] = supported
+    return supported
+
+
+class _Judge:
+    """Shared early-cancellation policy; callers hold `lock`."""
+
+    def __init__(self, params: RequestParams, score_fn: ScoreFn, candidates: List[Candidate],
+                 token_budget: Optional[int], margin: float, min_tokens: int, patience: float,
+                 check_every: int, t0: float):
+        self.params = params
+        self.score_fn = score_fn
+        self.candidates = candidates
+        self.token_budget = token_budget
+        self.margin = margin
+        self.min_tokens = min_tokens
+        self.patience = patience
+        self.check_every = max(1, check_every)
+        self.partial = getattr(score_fn, "partial", True)
+        self.t0 = t0
+        self.first_finish: Optional[float] = None
+        self.lock = threading.Lock()
+        self._prefix_scores: Dict[Tuple[int, int], float] = {}
+
+    def leader(self) -> Optional[Candidate]:
+        done = [c for c in self.candidates if c.score is not None]
+        return max(done, key=lambda c: c.score or 0.0) if done else None
+
+    def last_hope(self, c: Candidate) -> bool:
+        """Nothing finished and every other candidate is gone: keep `c` so there is an answer."""
+        return not any(o.finished or (o is not c and o.running and not o.cancelled) for o in self.candidates)
+
+    def reference(self, leader: Candidate, deltas: int) -> float:
+        """The leader's score after `deltas` deltas (its final score once past its length)."""
+        if deltas >= leader.deltas or leader.score is None:
+            return leader.score or 0.0
+        key = (leader.index, deltas)
+        if key not in self._prefix_scores:
+            prefix = leader.text[:leader.offsets[deltas - 1]] if deltas else ""
+            self._prefix_scores[key] = self.score_fn(prefix, self.params, StreamMetrics(tokens=deltas))
+        return self._prefix_scores[key]
+
+    def on_delta(self, c: Candidate) -> str:
+        """Reason to stop `c` after its latest delta, or ""."""
+        c.offsets.append(len(c.text))
+        if self.token_budget and c.deltas > self.token_budget and not self.last_hope(c):
+            return "token budget"
+        if self.partial and c.deltas % self.check_every == 0:
+            c.partial_score = self.score_fn(c.text, self.params, StreamMetrics(tokens=c.deltas))
+            c.partial_at = c.deltas
+        return self.behind(c)
+
+    def behind(self, c: Candidate) -> str:
+        leader = self.leader()
+        if (leader is not None and c.partial_at >= self.min_tokens
+                and c.partial_score + self.margin < self.reference(leader, c.partial_at)):
+            return "behind"
+        if self.first_finish is not None and time.perf_counter() - self.t0 > self.patience * self.first_finish:
+            return "too slow"
+        return ""
+
+    def finish(self, c: Candidate, metrics: StreamMetrics, score: float) -> None:
+        c.metrics = metrics
+        c.score = score
+        # When the stream ended, not when scoring did: scores can settle out of order.
+        at = (c.ended or time.perf_counter()) - self.t0
+        if self.first_finish is None or at < self.first_finish:
+            self.first_finish = at
+
+
+def _run_parallel(judge: _Judge, n: int, cancel: Optional[CancelToken],
+                  on_update: Optional[Callable[[Candidate], None]]) -> None:
+    params = judge.params
+    candidates = judge.candidates
+    tokens = [CancelToken() for _ in range(n)]
+
+    def stop(c: Candidate, reason: str) -> None:
+        if reason and not c.cancelled and c.running:
+            c.cancelled = reason
+            tokens[c.index].cancel(reason)
+
+    def sweep() -> None:
+        with judge.lock:
+            for other in candidates:
+                if other.running and not other.cancelled:
+                    stop(other, judge.behind(other))
+
+    def run(c: Candidate) -> None:
+        def on_text(text: str) -> None:
+            with judge.lock:
+                c.text += text
+                c.deltas += 1
+                stop(c, judge.on_delta(c))
+
+        c.started = time.perf_counter()
+        try:
+            text, metrics = stream_chat_completion(params, on_text, cancel=tokens[c.index])
+        except Exception as e:
+            with judge.lock:
+                c.error = str(e)
+                c.ended = time.perf_counter()
+        else:
+            ended = time.perf_counter()
+            # A guard-stopped candidate did not finish: its kept prefix is no complete answer.
+            done = not metrics.cancelled and not metrics.runaway
+            score = judge.score_fn(text, params, metrics) if done else None
+            with judge.lock:
+                c.ended = ended
+                if score is not None:
+                    judge.finish(c, metrics, score)
+                else:
+                    c.metrics = metrics
+                    if metrics.runaway and not c.cancelled:
+                        c.cancelled = f"runaway {metrics.runaway}"
+        if on_update:
+            on_update(c)
+        sweep()
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        pending = {pool.submit(run, c) for c in candidates}
+        while pending:
+            _, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if cancel and cancel.cancelled:
+                with judge.lock:
+                    for c in candidates:
+                        stop(c, "stopped")
+            elif judge.first_finish is not None:
+                sweep()  # stragglers that produce no deltas never reach on_delta
+
+
+def _run_server_n(judge: _Judge, n: int, cancel: Optional[CancelToken],
+                  on_update: Optional[Callable[[Candidate], None]]) -> None:
+    params = judge.params
+    candidates = judge.candidates
+    payload = dict(build_payload(params, stream=True), n=n)
+    url = f"{params.endpoint.rstrip('/')}/v1/chat/completions"
+    token = cancel or CancelToken()
+    prev: Dict[int, float] = {}
+    usage: Optional[Dict[str, object]] = None
+    t0 = time.perf_counter()
+    for c in candidates:
+        c.started = t0
+
+    def close(c: Candidate) -> None:
+        c.ended = time.perf_counter()
+        c.metrics.total = c.ended - t0
+        if on_update:
+            on_update(c)
+
+    def settle(c: Candidate) -> None:
+        # Off the reader thread and outside the lock: exec_score runs a
+        # sandbox per candidate, and the other streams must keep flowing.
+        score = judge.score_fn(c.text, params, c.metrics)
+        with judge.lock:
+            judge.finish(c, c.metrics, score)
+        if on_update:
+            on_update(c)
+
+    scorer = ThreadPoolExecutor(max_workers=n)
+    try:
+        with token.bind(), get_session(params.endpoint).post(url, json=payload, headers=build_headers(params.api_key),
+                                                             stream=True, timeout=300) as resp:
+            resp.raise_for_status()
+            token.attach(resp)
+            try:
+                for data in iter_sse_data(resp):
+                    if token.cancelled:
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        i = int(choice.get("index") or 0)
+                        if not 0 <= i < n:
+                            continue
+                        c = candidates[i]
+                        if not c.running:
+                            continue
+                        text = (choice.get("delta") or {}).get("content") or ""
+                        now = time.perf_counter() - t0
+                        with judge.lock:
+                            if text:
+                                m = c.metrics
+                                if i in prev:
+                                    m.itl.append(now - prev[i])
+                                else:
+                                    m.ttft = now
+                                prev[i] = m.last_token = now
+                                m.chunks = m.tokens = c.deltas = c.deltas + 1
+                                c.text += text
+                                reason = judge.on_delta(c)
+                                if reason:
+                                    c.cancelled = reason
+                                    close(c)
+                            if choice.get("finish_reason") and c.running:
+                                c.ended = time.perf_counter()  # no longer running; the score follows
+                                c.metrics.total = now
+                                scorer.submit(settle, c)
+                            for other in candidates:
+                                if other.running and not other.cancelled:
+                                    reason = judge.behind(other)
+                                    if reason:
+                                        other.cancelled = reason
+                                        close(other)
+                    if not any(c.running for c in candidates):
+                        break
+            finally:
+                token.detach()
+    except (requests.RequestException, OSError) as e:
+        if not token.cancelled:
+            STATS.record_failure(error_kind(e))
+            with judge.lock:
+                for c in candidates:
+                    if c.running:
+                        c.error = str(e)
+                        close(c)
+            return
+    finally:
+        scorer.shutdown(wait=True)
+    with judge.lock:
+        for c in candidates:
+            if c.running:
+                c.cancelled = "stopped"
+                close(c)
+    if not token.cancelled:
+        tokens = int((usage or {}).get("completion_tokens") or sum(c.deltas for c in candidates))
+        STATS.record_success(time.perf_counter() - t0, tokens)
+
+
+def run_best_of_n(
+    params: RequestParams,
+    n: int = 4,
+    score_fn: ScoreFn = default_score,
+    token_budget: Optional[int] = None,
+    margin: float = 0.15,
+    min_tokens: int = 32,
+    patience: float = 2.0,
+    check_every: int = 8,
+    server_n: str = "auto",
+    baseline: bool = False,
+    cancel: Optional[CancelToken] = None,
+    on_update: Optional[Callable[[Candidate], None]] = None,
+    history: Optional[RunHistory] = None,
+    preset: str = "",
+) -> BestOfNResult:
+    """Sample `n` candidates and keep the best-scoring one.
+
+    server_n: "auto" (probe), "on" (always send n) or "off" (parallel
+    requests). With `baseline`, one sample is timed on its own first.
+    """
+    n = max(1, n)
+    result = BestOfNResult([Candidate(i) for i in range(n)], "parallel", max_tokens=params.max_tokens)
+    if baseline:
+        _, solo = stream_chat_completion(params, cancel=cancel)
+        result.baseline, result.baseline_measured, result.baseline_tokens = solo.total, True, solo.tokens
+    if cancel and cancel.cancelled:
+        return result
+    if n > 1 and (server_n == "on" or (server_n == "auto" and server_supports_n(params))):
+        result.mode = "server-n"
+    t0 = time.perf_counter()
+    judge = _Judge(params, score_fn, result.candidates, token_budget, margin, min_tokens,
+                   patience, check_every, t0)
+    if result.mode == "server-n":
+        _run_server_n(judge, n, cancel, on_update)
+    else:
+        _run_parallel(judge, n, cancel, on_update)
+    result.wall = time.perf_counter() - t0
+    if result.baseline is None:
+        done = [c.metrics.total for c in result.candidates if c.finished]
+        if done:
+            result.baseline = percentile(done, 50)
+    if history is not None:
+        history.record_many([
+            history_row(params, preset, "bestofn", c.text, c.metrics, error=c.error or c.cancelled)
+            for c in result.candidates if c.finished or c.error
+        ])
+    return result
+
+
+def format_best_of_n(result: BestOfNResult) -> str:
+    n = len(result.candidates)
+    best = result.best
+    head = f"best-of-{n} ({result.mode}): "
+    head += (f"winner #{best.index + 1} score {best.score:.3f}" if best else "no candidate finished")
+    head += f", decided after {result.wall:.2f}s"
+    lines = [head, f"{'#':>2} {'status':<26} {'score':>6} {'toks':>5} {'TTFT':>7} {'total':>7}"]
+    for c in result.candidates:
+        score = f"{c.score:.3f}" if c.score is not None else f"~{c.partial_score:.2f}"
+        mark = " *" if c is best else ""
+        lines.append(f"{c.index + 1:>2} {c.status + mark:<26} {score:>6} {c.metrics.tokens or c.deltas:>5} "
+                     f"{c.metrics.ttft:>6.2f}s {c.metrics.total or c.busy:>6.2f}s")
+    if result.baseline:
+        kind = "measured" if result.baseline_measured else "est. from candidates"
+        lines.append(
+            f"single sample {result.baseline:.2f}s ({kind}) -> added latency {result.added_latency:+.2f}s "
+            f"(x{result.wall / result.baseline:.2f}), GPU time {result.gpu_time:.2f}s "
+            f"(x{result.gpu_time / result.baseline:.2f})")
+    lines.append(f"{result.tokens_generated} tokens generated; early cancellation left up to "
+                 f"{result.tokens_saved} of the max_tokens budget undecoded")
+    return "\n".join(lines)
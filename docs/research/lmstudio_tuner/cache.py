@@ -0,0 +1,170 @@
+"""
+Content-addressed response cache for deterministic runs.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
+
+from .formatting import RequestParams, TokenUsage, build_payload
+from .metrics import StreamMetrics
+
+if TYPE_CHECKING:
+    from .client import CancelToken
+    from .runaway import RunawayGuard
+
+
+def cache_dir() -> Path:
+    return Path('.autodev') / 'cache' / 'responses'
+
+
+class ResponseCache:
+    """Content-addressed cache of completions for deterministic runs.
+
+    Keys hash the exact request body (model, formatted messages and every
+    sampling field), so any parameter change is a miss. Entries live in an
+    in-memory LRU of `max_entries` and as JSON files under `directory`; the
+    disk tier evicts least-recently-used files once it passes `max_bytes`.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_entries: int = 256,
+                 max_bytes: int = 256 * 1024 * 1024, deterministic_only: bool = True):
+        self.directory = directory or cache_dir()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.deterministic_only = deterministic_only
+        self.hits = 0
+        self.misses = 0
+        self._mem: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def cacheable(self, params: RequestParams) -> bool:
+        return not self.deterministic_only or params.temperature == 0
+
+    @staticmethod
+    def key(params: RequestParams) -> str:
+        body = json.dumps(build_payload(params), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, params: RequestParams) -> Optional[Dict[str, Any]]:
+        key = self.key(params)
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry
+        path = self._path(key)
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mtime doubles as the disk tier's LRU clock
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, params: RequestParams, content: str, usage: TokenUsage) -> None:
+        key = self.key(params)
+        entry = {
+            "content": content,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "token_source": usage.source,
+            "model": params.model,
+            "ts": round(time.time()),
+        }
+        with self._lock:
+            self._remember(key, entry)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        # A temp file per writer: concurrent puts of the same key must not share one.
+        fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_bytes:
+                self._evict_disk()
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _scan_disk(self) -> int:
+        return sum(p.stat().st_size for p in self.directory.glob("*/*.json"))
+
+    def _evict_disk(self) -> None:
+        files = sorted(self.directory.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+        target = int(self.max_bytes * 0.9)
+        total = self._scan_disk()
+        for path in files:
+            if total <= target:
+                break
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                total -= size
+            except OSError:
+                continue
+        self._disk_bytes = total
+
+    def summary(self) -> str:
+        return f"cache {self.hits} hit / {self.misses} miss"
+
+
+def cached_chat_completion(
+    params: RequestParams,
+    cache: Optional[ResponseCache],
+    on_text: Optional[Callable[[str], None]] = None,
+    cancel: Optional[CancelToken] = None,
+    guard: Union[RunawayGuard, bool, None] = None,
+) -> Tuple[str, StreamMetrics]:
+    """stream_chat_completion behind `cache` (no-op when cache is None or the run is not cacheable)."""
+    use_cache = cache is not None and cache.cacheable(params)
+    if use_cache:
+        t0 = time.perf_counter()
+        entry = cache.get(params)
+        if entry is not None:
+            content = entry.get("content", "")
+            if on_text and content:
+                on_text(content)
+            metrics = StreamMetrics(cached=True, tokens=int(entry.get("completion_tokens", 0)),
+                                    prompt_tokens=int(entry.get("prompt_tokens", 0)),
+                                    token_source=entry.get("token_source", "estimate"))
+            metrics.total = metrics.ttft = metrics.last_token = time.perf_counter() - t0
+            return content, metrics
+    from .client import stream_chat_completion  # the HTTP stack is only needed on a miss
+    content, metrics = stream_chat_completion(params, on_text, cancel, guard)
+    if use_cache and not metrics.cancelled and not metrics.runaway:  # only complete generations
+        cache.put(params, content, TokenUsage(metrics.prompt_tokens, metrics.tokens, metrics.token_source))
+    return content, metrics
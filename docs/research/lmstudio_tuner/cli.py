@@ -0,0 +1,930 @@
+"""
+Command line front-end: ``python -m lmstudio_tuner <command>``.
+
+Feature modules are imported inside each command so that ``--help``,
+``history`` or ``importtime`` do not pay for the HTTP stack, and the Tk
+GUI is only imported when no command is given.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .bench import bench_path
+from .cache import cache_dir
+from .history import history_path
+from .metrics import STATS, SnapshotWriter, serve_metrics
+from .presets import DEFAULT_SYSTEM_PROMPT, DEFAULT_USER_PROMPT, PRESETS, make_params, presets_path, resolve_preset
+
+if TYPE_CHECKING:
+    from .sweep import SweepConfig
+
+
+def _split_list(value: str) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def _read_prompts(path: str) -> List[str]:
+    """One prompt per line; JSON lines may carry `prompt` or `user_prompt`."""
+    prompts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                obj = json.loads(line)
+                line = obj.get("prompt") or obj.get("user_prompt") or ""
+            if line:
+                prompts.append(line)
+    return prompts
+
+
+def _sweep_configs(args: argparse.Namespace) -> List[SweepConfig]:
+    from .client import fetch_models
+    from .sweep import SweepConfig
+
+    if args.matrix:
+        with open(args.matrix, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        return [SweepConfig(e["model"], e.get("preset", "Balanced"), e.get("format", "None")) for e in entries]
+    models = _split_list(args.models)
+    if models == ["all"]:
+        models = fetch_models(args.endpoint, args.api_key)
+    return [
+        SweepConfig(m, p, f)
+        for m, p, f in itertools.product(models, _split_list(args.presets), _split_list(args.formats))
+    ]
+
+
+def cmd_sweep(args: argparse.Namespace) -> int:
+    from .cache import ResponseCache
+    from .client import format_session_stats
+    from .history import run_history
+    from .sweep import SWEEP_FIELDS, format_summary, run_sweep, summarize_rows
+
+    configs = _sweep_configs(args)
+    if not configs:
+        print("Nothing to run: no models/presets/formats selected", file=sys.stderr)
+        return 2
+    prompts = list(args.prompt or [])
+    if args.prompts_file:
+        prompts.extend(_read_prompts(args.prompts_file))
+    if not prompts:
+        prompts = [DEFAULT_USER_PROMPT]
+
+    jsonl_f = open(args.jsonl, 'a', encoding='utf-8') if args.jsonl else None
+    csv_f = open(args.csv, 'w', encoding='utf-8', newline='') if args.csv else None
+    writer = csv.DictWriter(csv_f, fieldnames=SWEEP_FIELDS, extrasaction='ignore') if csv_f else None
+    if writer:
+        writer.writeheader()
+    total = len(configs) * len(prompts) * args.repeats
+    done = 0
+    cache = ResponseCache(Path(args.cache_dir) if args.cache_dir else None,
+                          max_bytes=int(args.cache_mb * 1024 * 1024)) if args.cache else None
+    executor = None
+    if args.exec:
+        from .codeexec import CodeExecutor
+        executor = CodeExecutor(args.exec_workers, timeout=args.exec_timeout)
+
+    def on_row(row: Dict[str, Any]) -> None:
+        nonlocal done
+        done += 1
+        if jsonl_f:
+            jsonl_f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            jsonl_f.flush()
+        if writer:
+            writer.writerow(row)
+            csv_f.flush()
+        status = f"{row.get('latency_s', 0):.2f}s" if row.get("ok") else f"ERROR {row.get('error')}"
+        if row.get("exec_ok") is not None:
+            status += f" | code {'PASS' if row['exec_ok'] else 'FAIL'} {row['exec_tests'] - row['exec_failed']}/{row['exec_tests']} tests"
+        print(f"[{done}/{total}] {row['model']} | {row['preset']} | {row['format']} "
+              f"#{row['prompt_index']}.{row['repeat']}: {status}", file=sys.stderr)
+
+    try:
+        rows = run_sweep(args.endpoint, args.api_key, configs, prompts,
+                         system_prompt=args.system_prompt, max_tokens=args.max_tokens,
+                         workers=args.workers, repeats=args.repeats, on_row=on_row, cache=cache,
+                         history=None if args.no_history else run_history(), executor=executor,
+                         runaway_guard=args.runaway_guard)
+    finally:
+        if executor:
+            executor.shutdown()
+        if jsonl_f:
+            jsonl_f.close()
+        if csv_f:
+            csv_f.close()
+    print(format_summary(summarize_rows(rows)))
+    print(f"connections: {format_session_stats()}", file=sys.stderr)
+    if cache:
+        print(cache.summary(), file=sys.stderr)
+    return 0 if all(r.get("ok") for r in rows) else 1
+
+
+def cmd_replay(args: argparse.Namespace) -> int:
+    from .autotune import load_score_fn
+    from .cache import ResponseCache
+    from .client import format_session_stats
+    from .history import run_history
+    from .replay import (REPLAY_FIELDS, TemplateError, format_recommendations, format_replay_summary,
+                         load_reason_templates, reasoning_score, recommend_presets, run_replay, summarize_replay)
+
+    try:
+        templates = load_reason_templates(args.templates)
+    except TemplateError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.only:
+        templates = [t for t in templates if t.name in _split_list(args.only)]
+    configs = _sweep_configs(args)
+    if not templates or not configs:
+        print("Nothing to run: no reason steps in the templates, or no models/presets/formats selected", file=sys.stderr)
+        return 2
+    values: Dict[str, str] = {}
+    for item in args.param or []:
+        key, sep, value = item.partition("=")
+        if not sep:
+            print(f"--param must look like KEY=VALUE or KEY=@file, got {item!r}", file=sys.stderr)
+            return 2
+        if value.startswith("@"):
+            with open(value[1:], 'r', encoding='utf-8') as f:
+                value = f.read()
+        values[key] = value
+    for t in templates:
+        print(f"{t.name}: {len(t.steps)} reason steps ({', '.join(s.id for s in t.steps)})"
+              + (f", params {', '.join(t.params)}" if t.params else ""), file=sys.stderr)
+
+    jsonl_f = open(args.jsonl, 'a', encoding='utf-8') if args.jsonl else None
+    csv_f = open(args.csv, 'w', encoding='utf-8', newline='') if args.csv else None
+    writer = csv.DictWriter(csv_f, fieldnames=REPLAY_FIELDS, extrasaction='ignore') if csv_f else None
+    if writer:
+        writer.writeheader()
+    cache = ResponseCache(Path(args.cache_dir) if args.cache_dir else None) if args.cache else None
+    done = 0
+
+    def on_row(row: Dict[str, Any]) -> None:
+        nonlocal done
+        done += 1
+        if jsonl_f:
+            jsonl_f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            jsonl_f.flush()
+        if writer:
+            writer.writerow(row)
+            csv_f.flush()
+        status = (f"{row['latency_s']:.2f}s ttft {row['ttft_s']:.2f}s {row['decode_tps']:.1f} tok/s "
+                  f"{row['tokens']} toks score {row['score']:.2f}") if row.get("ok") else f"ERROR {row.get('error')}"
+        print(f"[{done}] {row['template']}/{row['step']} {row['model']} | {row['preset']} | {row['format']} "
+              f"#{row['repeat']}: {status}", file=sys.stderr)
+
+    try:
+        rows = run_replay(args.endpoint, args.api_key, templates, configs, values, max_tokens=args.max_tokens,
+                          repeats=args.repeats, workers=args.workers,
+                          score_fn=load_score_fn(args.score) if args.score else reasoning_score,
+                          on_row=on_row, cache=cache, history=None if args.no_history else run_history())
+    finally:
+        if jsonl_f:
+            jsonl_f.close()
+        if csv_f:
+            csv_f.close()
+    print(format_replay_summary(summarize_replay(rows)))
+    print()
+    recommendations = recommend_presets(rows, args.threshold)
+    print(format_recommendations(recommendations))
+    print(f"connections: {format_session_stats()}", file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(recommendations, f, indent=2)
+    return 0 if recommendations and all(r["meets_threshold"] for r in recommendations) else 1
+
+
+def cmd_dataset(args: argparse.Namespace) -> int:
+    import signal
+    import threading
+
+    from .autotune import load_score_fn
+    from .cache import ResponseCache
+    from .dataset import DatasetError, checkpoint_path, dataset_results_path, format_progress, run_dataset
+    from .history import run_history
+
+    preset = resolve_preset(args.preset)
+    base = make_params(args.endpoint, args.api_key, args.model, preset, args.format,
+                       args.system_prompt, "", args.max_tokens)
+    results = Path(args.out) if args.out else dataset_results_path(Path(args.dataset), args.model, args.preset)
+    stop = threading.Event()
+    previous = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    print(f"results: {results} (checkpoint {checkpoint_path(results)})", file=sys.stderr)
+    try:
+        progress = run_dataset(
+            Path(args.dataset), base, args.preset, results, workers=args.workers, max_pending=args.max_pending,
+            prompt_field=args.field, template=args.template, limit=args.limit,
+            score_fn=load_score_fn(args.score) if args.score else None, store_output=args.store_output,
+            restart=args.restart, checkpoint_every=args.checkpoint_every,
+            cache=ResponseCache(Path(args.cache_dir) if args.cache_dir else None) if args.cache else None,
+            history=None if args.no_history else run_history(),
+            on_progress=lambda p: print(format_progress(p), file=sys.stderr),
+            progress_interval=args.progress_interval, stop=stop,
+        )
+    except DatasetError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+    if stop.is_set():
+        print(f"Interrupted after {progress.done}/{progress.total}; run the same command again to resume",
+              file=sys.stderr)
+        return 130
+    print(f"{progress.done} rows: {progress.ok} ok, {progress.failed} failed, {progress.skipped} skipped, "
+          f"{progress.tokens} tokens")
+    if progress.latency.count:
+        print(f"latency p50/p95/p99 {progress.latency.quantile(0.5):.2f}/{progress.latency.quantile(0.95):.2f}/"
+              f"{progress.latency.quantile(0.99):.2f}s  TTFT p50 {progress.ttft.quantile(0.5):.2f}s (this session)")
+    return 0 if not progress.failed else 1
+
+
+def cmd_history(args: argparse.Namespace) -> int:
+    from .history import RunHistory, format_trend, run_history
+
+    history = RunHistory(Path(args.db)) if args.db else run_history()
+    since = time.time() - args.days * 86400 if args.days else None
+    if args.runs:
+        for r in reversed(history.query(args.model, args.preset, args.source, since, limit=args.runs)):
+            status = f"{r['latency_s'] or 0:.2f}s ttft {r['ttft_s'] or 0:.2f}s {r['decode_tps'] or 0:.1f} tok/s" if r["ok"] else f"ERROR {r['error']}"
+            if r["runaway"]:
+                status += f" stopped ({r['runaway']})"
+            print(f"#{r['id']} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(r['ts']))} "
+                  f"[{r['source']}] {r['model']} | {r['preset']} | {r['format']}: {status}")
+        return 0
+    trend = history.trend(args.model, args.preset, args.source, since, bucket_s=args.bucket_hours * 3600)
+    if not trend:
+        print("No matching runs recorded", file=sys.stderr)
+        return 1
+    print(format_trend(trend))
+    return 0
+
+
+def cmd_recommend_limits(args: argparse.Namespace) -> int:
+    from .history import RunHistory, run_history
+    from .runaway import format_limit_advice, recommend_limits
+
+    history = RunHistory(Path(args.db)) if args.db else run_history()
+    since = time.time() - args.days * 86400 if args.days else None
+    rows = history.query(args.model, args.preset, args.source, since, limit=None)
+    advice = recommend_limits(rows, headroom=args.headroom, min_runs=args.min_runs)
+    if not advice:
+        print("No matching runs recorded", file=sys.stderr)
+        return 1
+    print(format_limit_advice(advice))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({a.preset: {"max_tokens": a.max_tokens, "stop": a.stop, "runs": a.runs,
+                                  "stops_by_guard": a.stops_by_guard, "saved_by_guard": a.saved_by_guard,
+                                  "note": a.note} for a in advice}, f, indent=2)
+    return 0
+
+
+def cmd_autotune(args: argparse.Namespace) -> int:
+    from .autotune import auto_tune, default_score, format_front, load_score_fn, save_tuned_presets
+
+    prompts = list(args.prompt or [])
+    if args.prompts_file:
+        prompts.extend(_read_prompts(args.prompts_file))
+    base = make_params(args.endpoint, args.api_key, args.model, PRESETS["Balanced"], args.format,
+                       args.system_prompt, prompts[0] if prompts else DEFAULT_USER_PROMPT, args.max_tokens)
+    score_fn = load_score_fn(args.score) if args.score else default_score
+    candidates, front = auto_tune(
+        base, prompts, score_fn, latency_budget=args.latency_budget, n_candidates=args.candidates,
+        eta=args.eta, rounds=args.rounds, workers=args.workers, seed=args.seed,
+        on_progress=lambda msg: print(msg, file=sys.stderr), runaway_guard=args.runaway_guard,
+    )
+    for c in candidates:
+        if c.pruned:
+            print(f"pruned {c.pruned}: {c.settings}", file=sys.stderr)
+    print(format_front(front))
+    if front and not args.no_save:
+        names = save_tuned_presets(front, args.model)
+        print(f"Saved {len(names)} presets to {presets_path()}", file=sys.stderr)
+    return 0 if front else 1
+
+
+def cmd_load(args: argparse.Namespace) -> int:
+    import asyncio
+    from .loadgen import format_load_level, format_load_report, ramp_levels, run_load_test
+    from .metrics import percentile
+
+    params = make_params(args.endpoint, args.api_key, args.model, resolve_preset(args.preset), args.format,
+                         args.system_prompt, args.prompt or DEFAULT_USER_PROMPT, args.max_tokens)
+    levels = [int(v) for v in _split_list(args.levels)] if args.levels else ramp_levels(args.max_concurrency)
+    results = asyncio.run(run_load_test(params, levels, args.requests_per_session,
+                                        on_level=lambda lv: print(format_load_level(lv), file=sys.stderr)))
+    print(format_load_report(results))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([{
+                "concurrency": lv.concurrency, "requests": lv.requests, "errors": lv.errors,
+                "wall_s": round(lv.wall, 3), "throughput_tps": round(lv.throughput, 2), "rps": round(lv.rps, 3),
+                "ttft_p50": percentile(lv.ttfts, 50), "ttft_p95": percentile(lv.ttfts, 95),
+                "latency_p50": percentile(lv.latencies, 50), "latency_p95": percentile(lv.latencies, 95),
+                "latency_buckets": dict(zip([str(b) for b in lv.latency_hist.bounds] + ["+Inf"], lv.latency_hist.counts)),
+            } for lv in results], f, indent=2)
+    return 0
+
+
+def cmd_profile_load(args: argparse.Namespace) -> int:
+    from .client import fetch_models
+    from .profiling import format_load_profile, profile_model_load, save_model_catalog
+
+    models = _split_list(args.models)
+    if models == ["all"]:
+        models = fetch_models(args.endpoint, args.api_key)
+        save_model_catalog(args.endpoint, models)
+    if not models:
+        print("No models to profile", file=sys.stderr)
+        return 2
+    results = profile_model_load(args.endpoint, args.api_key, models, warm_runs=args.warm_runs,
+                                 on_result=lambda p: print(format_load_profile(p)))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([dict(vars(p), swap_cost=p.swap_cost) for p in results], f, indent=2)
+    return 0 if any(not p.error for p in results) else 1
+
+
+def cmd_profile_context(args: argparse.Namespace) -> int:
+    from .client import fetch_models
+    from .contextprof import format_context_point, format_context_profile, profile_context
+
+    models = _split_list(args.models)
+    if models == ["all"]:
+        models = fetch_models(args.endpoint, args.api_key)
+    turns = [int(t) for t in _split_list(args.turns)] or [0]
+    profiles = []
+    for model, fmt, n_turns in itertools.product(models, _split_list(args.formats) or ["None"], turns):
+        base = make_params(args.endpoint, args.api_key, model, PRESETS["Deterministic"], fmt,
+                           args.system_prompt, "", args.gen_tokens)
+        print(f"== {model} | {fmt}" + (f" | {n_turns} turns" if n_turns else ""), file=sys.stderr)
+        profile = profile_context(base, start=args.start, max_context=args.max_context, turns=n_turns,
+                                  max_ttft=args.max_ttft, min_tps=args.min_tps, resolution=args.resolution,
+                                  repeats=args.repeats, gen_tokens=args.gen_tokens, calibrate=not args.no_calibrate,
+                                  on_point=lambda p: print(format_context_point(p), file=sys.stderr))
+        print(format_context_profile(profile))
+        print()
+        profiles.append(profile)
+    rows = [dict(model=p.model, format=p.format_type, turns=p.turns, target_tokens=pt.target_tokens,
+                 prompt_tokens=pt.prompt_tokens, ttft_s=round(pt.ttft, 4), prefill_s=round(pt.prefill, 4),
+                 prefill_tps=round(pt.prefill_tps, 1), decode_tps=round(pt.decode_tps, 2),
+                 total_s=round(pt.total, 4), error=pt.error, violation=pt.violation)
+            for p in profiles for pt in p.curve]
+    if args.csv and rows:
+        with open(args.csv, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([{"model": p.model, "format": p.format_type, "turns": p.turns, "limit_tokens": p.limit_tokens,
+                        "token_scale": round(p.token_scale, 4),
+                        "limit_reason": p.first_violation.violation if p.first_violation else "",
+                        "curve": [r for r in rows if (r["model"], r["format"], r["turns"]) == (p.model, p.format_type, p.turns)]}
+                       for p in profiles], f, indent=2)
+    return 0 if profiles and all(p.limit_tokens for p in profiles) else 1
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    from .compare import CURRENT_SETTINGS, CompareSlot, compare_diff, format_comparison, run_comparison, slot_params
+    from .history import run_history
+
+    models = _split_list(args.models)
+    presets = _split_list(args.presets) or [CURRENT_SETTINGS]
+    if len(presets) == 1:
+        presets *= len(models)
+    if len(models) == 1:
+        models *= len(presets)
+    if len(models) != len(presets) or not 2 <= len(models) <= 4:
+        print("Give 2-4 model/preset pairs (--models and --presets of equal length, or one of them single)", file=sys.stderr)
+        return 2
+    base = make_params(args.endpoint, args.api_key, models[0], PRESETS["Balanced"], args.format,
+                       args.system_prompt, args.prompt or DEFAULT_USER_PROMPT, args.max_tokens)
+    slots = [CompareSlot(f"{i + 1}. {m} | {p}", slot_params(base, m, p), p) for i, (m, p) in enumerate(zip(models, presets))]
+    if args.max_tokens is not None:  # slot_params applies each preset's own max_tokens
+        for s in slots:
+            s.params.max_tokens = args.max_tokens
+    run_comparison(slots, trials=args.trials, concurrent=not args.sequential,
+                   history=None if args.no_history else run_history(),
+                   on_trial=lambda t, order: print(f"trial {t + 1}: order {[o + 1 for o in order]}", file=sys.stderr))
+    print(format_comparison(slots))
+    for slot in slots[1:]:
+        print()
+        print(compare_diff(slots[0].output, slot.output, slots[0].label, slot.label))
+    return 0 if all(not s.errors for s in slots) else 1
+
+
+def cmd_score_code(args: argparse.Namespace) -> int:
+    from .codeexec import CodeExecutor, format_exec_result
+
+    executor = CodeExecutor(args.workers, timeout=args.timeout, cpu_s=args.cpu_seconds, memory_mb=args.memory_mb)
+    texts: List[Tuple[str, str]] = []
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith(".jsonl"):
+                for n, line in enumerate(f, 1):
+                    obj = json.loads(line) if line.strip() else {}
+                    text = obj.get("output") or obj.get("content") or ""
+                    if text:
+                        texts.append((f"{path}:{n}", text))
+            else:
+                texts.append((path, f.read()))
+    try:
+        futures = [(label, executor.submit(text)) for label, text in texts]
+        results = []
+        for label, fut in futures:
+            result = fut.result()
+            results.append(result)
+            print(f"{label}: {format_exec_result(result)} (score {result.score:.2f})")
+    finally:
+        executor.shutdown()
+    return 0 if results and all(r.ok for r in results) else 1
+
+
+def cmd_mock_server(args: argparse.Namespace) -> int:
+    from .mockserver import MockConfig, MockServer
+
+    config = MockConfig(
+        models=_split_list(args.models), ttft=args.ttft, prefill_per_token=args.prefill_per_token,
+        token_delay=args.token_delay, swap_delay=args.swap_delay, context_limit=args.context_limit,
+        chars_per_token=args.chars_per_token,
+        decode_slowdown=args.decode_slowdown, error_rate=args.error_rate,
+        error_status=args.error_status, drop_rate=args.drop_rate, max_concurrency=args.max_concurrency,
+        reject_over_limit=args.reject, supports_n=args.supports_n, vary=args.vary,
+        runaway_rate=args.runaway_rate, seed=args.seed,
+    )
+    server = MockServer(config, args.host, args.port)
+    print(f"mock LM Studio listening on {server.url} (models: {', '.join(config.models)})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps({k: v for k, v in server.state.stats().items() if k != "config"}), file=sys.stderr)
+    return 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    from .bench import bench_path, format_bench, last_bench, run_benchmarks
+
+    previous = last_bench()
+    regressed = []
+    print(f"{'benchmark':<18} {'median':>10} {'p95':>10} {'previous':>10}")
+
+    def on_result(result: Any) -> None:
+        prev = previous.get(result.name)
+        print(format_bench(result, prev))
+        if prev and args.max_regression is not None and result.median_us > prev * (1 + args.max_regression / 100.0):
+            regressed.append(result.name)
+
+    results = run_benchmarks(_split_list(args.only), network=not args.no_network,
+                             scale=0.1 if args.quick else 1.0, rounds=args.rounds, on_result=on_result,
+                             runaway_guard=args.runaway_guard)
+    if args.record and results:
+        from .history import append_jsonl
+        append_jsonl(bench_path(), {"ts": round(time.time(), 3), "python": sys.version.split()[0],
+                                    "median_us": {r.name: round(r.median_us, 2) for r in results}})
+    if regressed:
+        print(f"Slower than the last record by more than {args.max_regression:g}%: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_best_of(args: argparse.Namespace) -> int:
+    from .autotune import default_score, load_score_fn
+    from .bestofn import format_best_of_n, run_best_of_n
+    from .history import run_history
+
+    params = make_params(args.endpoint, args.api_key, args.model, resolve_preset(args.preset), args.format,
+                         args.system_prompt, args.prompt or DEFAULT_USER_PROMPT, args.max_tokens)
+    result = run_best_of_n(
+        params, args.n, load_score_fn(args.score) if args.score else default_score,
+        token_budget=args.token_budget, margin=args.margin, min_tokens=args.min_tokens,
+        patience=args.patience, server_n=args.server_n, baseline=args.baseline,
+        on_update=lambda c: print(f"#{c.index + 1}: {c.status}", file=sys.stderr),
+        history=None if args.no_history else run_history(), preset=args.preset,
+    )
+    print(format_best_of_n(result))
+    if args.show and result.best:
+        print()
+        print(result.best.text)
+    return 0 if result.best else 1
+
+
+# ===== Import time =====
+
+IMPORT_TIME_MODULES = (
+    "lmstudio_tuner", "lmstudio_tuner.formatting", "lmstudio_tuner.presets", "lmstudio_tuner.metrics",
+    "lmstudio_tuner.history", "lmstudio_tuner.cli", "lmstudio_tuner.client", "lmstudio_tuner.sweep",
+    "lmstudio_tuner.gui",
+)
+
+
+def import_times_path() -> Path:
+    return Path('.autodev') / 'import_times.jsonl'
+
+
+def measure_import_time(module: str, runs: int = 5) -> float:
+    """Median cold import time of `module` in ms, each run in a fresh interpreter (-X importtime)."""
+    env = dict(os.environ)
+    root = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = root + os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else root
+    samples = []
+    for _ in range(max(1, runs)):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+        for line in proc.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                samples.append(int(parts[1]) / 1000.0)
+    samples.sort()
+    return samples[len(samples) // 2] if samples else 0.0
+
+
+def _last_import_times() -> Dict[str, float]:
+    try:
+        with import_times_path().open('r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        return json.loads(lines[-1]).get("modules", {}) if lines else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def cmd_importtime(args: argparse.Namespace) -> int:
+    modules = _split_list(args.modules) or list(IMPORT_TIME_MODULES)
+    previous = _last_import_times()
+    times: Dict[str, float] = {}
+    regressed = []
+    print(f"{'module':<28} {'cold import':>12} {'previous':>10}")
+    for module in modules:
+        try:
+            ms = measure_import_time(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:<28} {'failed':>12}  {e}")
+            continue
+        times[module] = round(ms, 2)
+        prev = previous.get(module)
+        print(f"{module:<28} {ms:>10.1f}ms {f'{prev:.1f}ms' if prev is not None else '-':>10}")
+        if prev and args.max_regression is not None and ms > prev * (1 + args.max_regression / 100.0):
+            regressed.append(module)
+    if args.record and times:
+        from .history import append_jsonl
+        append_jsonl(import_times_path(), {"ts": round(time.time(), 3), "python": sys.version.split()[0], "modules": times})
+    if regressed:
+        print(f"Slower than the last record by more than {args.max_regression:g}%: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _add_session_args(parser: argparse.ArgumentParser, measure: bool = False) -> None:
+    # Defaults live in client.SessionConfig; None leaves them untouched.
+    # `measure` commands time full generations, so their runaway guard is opt-in.
+    parser.add_argument("--pool-size", type=int, help="Max pooled connections per endpoint (default 8)")
+    parser.add_argument("--max-retries", type=int, help="Default 2")
+    parser.add_argument("--retry-delay", type=float, help="Seconds before the first retry, doubling per attempt (default 1)")
+    parser.add_argument("--no-keep-alive", action="store_true", help="Send Connection: close on every request")
+    if measure:
+        parser.add_argument("--runaway-guard", action="store_true",
+                            help="Drop looping or run-on streams early (off so timings cover full generations)")
+    else:
+        parser.add_argument("--no-runaway-guard", action="store_true",
+                            help="Let generations loop or run on to max_tokens instead of dropping the stream")
+
+
+def _apply_session_args(args: argparse.Namespace) -> None:
+    if not hasattr(args, "pool_size"):
+        return
+    changes: Dict[str, Any] = {}
+    if args.pool_size is not None:
+        changes["pool_size"] = max(1, args.pool_size)
+    if args.max_retries is not None:
+        changes["max_retries"] = max(0, args.max_retries)
+    if args.retry_delay is not None:
+        changes["retry_delay"] = max(0.0, args.retry_delay)
+    if args.no_keep_alive:
+        changes["keep_alive"] = False
+    if changes:
+        from .client import configure_sessions
+        configure_sessions(**changes)
+    if getattr(args, "no_runaway_guard", False):
+        from .runaway import RUNAWAY
+        RUNAWAY.enabled = False
+
+
+def _start_metrics(args: argparse.Namespace) -> List[Any]:
+    """Start the exporters asked for on the command line; returns their handles."""
+    handles: List[Any] = []
+    if args.metrics_port:
+        server = serve_metrics(STATS, args.metrics_host, args.metrics_port)
+        print(f"metrics: http://{args.metrics_host}:{server.server_port}/metrics", file=sys.stderr)
+        handles.append(server)
+    if args.metrics_json:
+        handles.append(SnapshotWriter(STATS, Path(args.metrics_json), args.metrics_interval).start())
+    return handles
+
+
+def _stop_metrics(handles: List[Any]) -> None:
+    for handle in handles:
+        if isinstance(handle, SnapshotWriter):
+            handle.stop()
+        else:
+            handle.shutdown()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    prog = "python -m lmstudio_tuner" if Path(sys.argv[0]).name == "__main__.py" else None
+    parser = argparse.ArgumentParser(prog=prog, description="LM Studio tuner (no command starts the GUI)")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve OpenMetrics on this port (/metrics, plus /stats.json)")
+    parser.add_argument("--metrics-host", default="127.0.0.1")
+    parser.add_argument("--metrics-json", help="Write a LMStudioStats-style JSON snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between JSON snapshots")
+    sub = parser.add_subparsers(dest="command")
+
+    sweep = sub.add_parser("sweep", help="Run a models x presets x formats x prompts benchmark matrix")
+    sweep.add_argument("--endpoint", default="http://localhost:1234")
+    sweep.add_argument("--api-key", default="")
+    sweep.add_argument("--models", default="all", help="Comma-separated model ids, or 'all' to query /v1/models")
+    sweep.add_argument("--presets", default="Coding", help=f"Comma-separated preset names ({', '.join(PRESETS)} or saved)")
+    sweep.add_argument("--formats", default="None", help="Comma-separated prompt formats (None, Llama 3, ChatML, Mistral)")
+    sweep.add_argument("--matrix", help="JSON list of {model, preset, format} to run instead of the full grid")
+    sweep.add_argument("--prompt", action="append", help="User prompt (repeatable)")
+    sweep.add_argument("--prompts-file", help="File with one prompt per line (or JSONL with a 'prompt' field)")
+    sweep.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT)
+    sweep.add_argument("--max-tokens", type=int, help="Default: the preset's max_tokens, else 800")
+    sweep.add_argument("--workers", type=int, default=1, help="Concurrent requests")
+    sweep.add_argument("--repeats", type=int, default=1)
+    sweep.add_argument("--jsonl", help="Append per-run rows to this JSONL file")
+    sweep.add_argument("--csv", help="Write per-run rows to this CSV file")
+    sweep.add_argument("--cache", action="store_true", help="Serve repeated temperature-0 runs from the response cache")
+    sweep.add_argument("--cache-dir", help=f"Disk tier location (default {cache_dir()})")
+    sweep.add_argument("--cache-mb", type=float, default=256, help="Disk tier size limit in MB")
+    sweep.add_argument("--no-history", action="store_true", help=f"Do not record runs in {history_path()}")
+    sweep.add_argument("--exec", action="store_true", help="Run each response's Python code in a sandbox and record pass/fail")
+    sweep.add_argument("--exec-workers", type=int, default=0, help="Sandboxed interpreters at once (default: CPUs - 1)")
+    sweep.add_argument("--exec-timeout", type=float, default=10.0, help="Seconds per response's code")
+    sweep.add_argument("--tokenizer", help="Local tokenizer used when the server omits usage (tiktoken:<enc>, hf:<repo>, or tokenizer.json)")
+    sweep.add_argument("--tokenizer-download", action="store_true",
+                       help="Fetch an hf:<repo> tokenizer that is not in the local Hugging Face cache")
+    _add_session_args(sweep, measure=True)
+    sweep.set_defaults(func=cmd_sweep)
+
+    rep = sub.add_parser("replay", help="Replay the reason steps of orchestrator templates across models and presets")
+    rep.add_argument("--templates", nargs="*", help="Template files or directories (default: templates/)")
+    rep.add_argument("--only", help="Comma-separated template names to replay")
+    rep.add_argument("--param", action="append", help="Template value KEY=VALUE or KEY=@file (repeatable)")
+    rep.add_argument("--endpoint", default="http://localhost:1234")
+    rep.add_argument("--api-key", default="")
+    rep.add_argument("--models", default="all", help="Comma-separated model ids, or 'all' to query /v1/models")
+    rep.add_argument("--presets", default=",".join(PRESETS), help="Comma-separated preset names (default: all built-in)")
+    rep.add_argument("--formats", default="None", help="Comma-separated prompt formats (the executor sends None)")
+    rep.add_argument("--matrix", help="JSON list of {model, preset, format} to run instead of the full grid")
+    rep.add_argument("--max-tokens", type=int, help="Default: the preset's max_tokens, else 800")
+    rep.add_argument("--repeats", type=int, default=1, help="Chains per template and configuration")
+    rep.add_argument("--workers", type=int, default=1, help="Chains in flight at once (steps of a chain stay in order)")
+    rep.add_argument("--score", help="Quality function module:function or file.py:function (default: reasoning proxy)")
+    rep.add_argument("--threshold", type=float, default=0.7, help="Minimum mean score every step must reach")
+    rep.add_argument("--jsonl", help="Append per-step rows to this JSONL file")
+    rep.add_argument("--csv", help="Write per-step rows to this CSV file")
+    rep.add_argument("--json", help="Write the recommendations to this JSON file")
+    rep.add_argument("--cache", action="store_true", help="Serve repeated temperature-0 steps from the response cache")
+    rep.add_argument("--cache-dir", help=f"Disk tier location (default {cache_dir()})")
+    rep.add_argument("--no-history", action="store_true", help=f"Do not record runs in {history_path()}")
+    _add_session_args(rep)
+    rep.set_defaults(func=cmd_replay)
+
+    data = sub.add_parser("dataset", help="Evaluate a preset over a large JSONL prompt file with checkpoint/resume")
+    data.add_argument("dataset", help="JSONL (one record per line) or text file (one prompt per line)")
+    data.add_argument("--endpoint", default="http://localhost:1234")
+    data.add_argument("--api-key", default="")
+    data.add_argument("--model", required=True)
+    data.add_argument("--preset", default="Coding")
+    data.add_argument("--format", default="None")
+    data.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT, help="Used when a record has no 'system' field")
+    data.add_argument("--max-tokens", type=int, help="Default: the preset's max_tokens, else 800")
+    data.add_argument("--field", help="Record field holding the prompt (default: prompt, user_prompt, input, question, body, text)")
+    data.add_argument("--template", help="Build the prompt from record fields, e.g. '{title}\n\n{body}'")
+    data.add_argument("--limit", type=int, help="Only the first N lines of the dataset")
+    data.add_argument("--workers", type=int, default=2, help="Concurrent requests")
+    data.add_argument("--max-pending", type=int, default=0, help="Requests queued or running at once (default 2 x workers)")
+    data.add_argument("--out", help="Results JSONL (default .autodev/datasets/<dataset>.<model>.<preset>.jsonl)")
+    data.add_argument("--restart", action="store_true", help="Discard earlier results and the checkpoint")
+    data.add_argument("--store-output", action="store_true", help="Keep each response's text in the results file")
+    data.add_argument("--score", help="Quality function: 'exec', module:function or file.py:function")
+    data.add_argument("--checkpoint-every", type=int, default=50, help="Results between checkpoints")
+    data.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines")
+    data.add_argument("--cache", action="store_true", help="Serve repeated temperature-0 prompts from the response cache")
+    data.add_argument("--cache-dir", help=f"Disk tier location (default {cache_dir()})")
+    data.add_argument("--no-history", action="store_true", help=f"Do not record runs in {history_path()}")
+    _add_session_args(data)
+    data.set_defaults(func=cmd_dataset)
+
+    tune = sub.add_parser("autotune", help="Search sampling parameters against a scorer and latency budget")
+    tune.add_argument("--endpoint", default="http://localhost:1234")
+    tune.add_argument("--api-key", default="")
+    tune.add_argument("--model", required=True)
+    tune.add_argument("--format", default="None")
+    tune.add_argument("--prompt", action="append", help="User prompt (repeatable; trials rotate through them)")
+    tune.add_argument("--prompts-file")
+    tune.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT)
+    tune.add_argument("--max-tokens", type=int, default=800, help="max_tokens for the built-in preset anchors")
+    tune.add_argument("--score", help="Scoring function as module:function or file.py:function, or 'exec' to run the code (default: built-in heuristic)")
+    tune.add_argument("--latency-budget", type=float, default=30.0, help="Seconds; slower candidates are pruned")
+    tune.add_argument("--candidates", type=int, default=16)
+    tune.add_argument("--eta", type=int, default=2, help="Keep 1/eta of the candidates per round")
+    tune.add_argument("--rounds", type=int, default=3)
+    tune.add_argument("--workers", type=int, default=2)
+    tune.add_argument("--seed", type=int)
+    tune.add_argument("--no-save", action="store_true", help="Do not write the Pareto front to presets.json")
+    _add_session_args(tune, measure=True)
+    tune.set_defaults(func=cmd_autotune)
+
+    load = sub.add_parser("load", help="Ramp concurrent sessions to find the server's saturation point")
+    load.add_argument("--endpoint", default="http://localhost:1234")
+    load.add_argument("--api-key", default="")
+    load.add_argument("--model", required=True)
+    load.add_argument("--preset", default="Balanced")
+    load.add_argument("--format", default="None")
+    load.add_argument("--prompt")
+    load.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT)
+    load.add_argument("--max-tokens", type=int, default=256)
+    load.add_argument("--max-concurrency", type=int, default=8, help="Ramp 1, 2, 4, ... up to this")
+    load.add_argument("--levels", help="Explicit comma-separated concurrency levels instead of the ramp")
+    load.add_argument("--requests-per-session", type=int, default=3)
+    load.add_argument("--json", help="Write per-level results to this JSON file")
+    load.set_defaults(func=cmd_load)
+
+    prof = sub.add_parser("profile-load", help="Measure cold-start (after a model swap) vs. warm latency per model")
+    prof.add_argument("--endpoint", default="http://localhost:1234")
+    prof.add_argument("--api-key", default="")
+    prof.add_argument("--models", default="all", help="Comma-separated model ids, or 'all'")
+    prof.add_argument("--warm-runs", type=int, default=3)
+    prof.add_argument("--json", help="Write results to this JSON file")
+    _add_session_args(prof)
+    prof.set_defaults(func=cmd_profile_load)
+
+    ctx = sub.add_parser("profile-context", help="TTFT / prefill / decode speed vs. prompt size, and the usable context")
+    ctx.add_argument("--endpoint", default="http://localhost:1234")
+    ctx.add_argument("--api-key", default="")
+    ctx.add_argument("--models", default="all", help="Comma-separated model ids, or 'all'")
+    ctx.add_argument("--formats", default="None", help="Comma-separated prompt formats to profile")
+    ctx.add_argument("--turns", default="0", help="Comma-separated turn counts; 0 puts the context in the system message")
+    ctx.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT)
+    ctx.add_argument("--start", type=int, default=512, help="First prompt size in tokens (doubled each step)")
+    ctx.add_argument("--max-context", type=int, default=32768)
+    ctx.add_argument("--max-ttft", type=float, help="Seconds; larger TTFT counts as past the limit")
+    ctx.add_argument("--min-tps", type=float, help="Decode tok/s; slower counts as past the limit")
+    ctx.add_argument("--resolution", type=int, default=256, help="Stop the binary search at this many tokens")
+    ctx.add_argument("--repeats", type=int, default=1, help="Requests per size (median)")
+    ctx.add_argument("--gen-tokens", type=int, default=32, help="max_tokens per request (enough to time decode)")
+    ctx.add_argument("--tokenizer", help="Local tokenizer used to size prompts (tiktoken:<enc>, hf:<repo>, or tokenizer.json)")
+    ctx.add_argument("--tokenizer-download", action="store_true",
+                     help="Fetch an hf:<repo> tokenizer that is not in the local Hugging Face cache")
+    ctx.add_argument("--no-calibrate", action="store_true",
+                     help="Trust the local token count instead of rescaling it by the server's reported prompt tokens")
+    ctx.add_argument("--csv", help="Write every measured point to this CSV file")
+    ctx.add_argument("--json", help="Write the curves and limits to this JSON file")
+    _add_session_args(ctx)
+    ctx.set_defaults(func=cmd_profile_context)
+
+    cmp_ = sub.add_parser("compare", help="Run one prompt against 2-4 model/preset combinations side by side")
+    cmp_.add_argument("--endpoint", default="http://localhost:1234")
+    cmp_.add_argument("--api-key", default="")
+    cmp_.add_argument("--models", required=True, help="Comma-separated; paired with --presets")
+    cmp_.add_argument("--presets", default="", help="Comma-separated preset names (default: Balanced sampling)")
+    cmp_.add_argument("--format", default="None")
+    cmp_.add_argument("--prompt")
+    cmp_.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT)
+    cmp_.add_argument("--max-tokens", type=int, help="Default: the preset's max_tokens, else 800")
+    cmp_.add_argument("--trials", type=int, default=1)
+    cmp_.add_argument("--sequential", action="store_true", help="Run slots one after another (rotating order) instead of concurrently")
+    cmp_.add_argument("--no-history", action="store_true", help=f"Do not record runs in {history_path()}")
+    _add_session_args(cmp_)
+    cmp_.set_defaults(func=cmd_compare)
+
+    best = sub.add_parser("best-of", help="Sample N candidates in parallel, stop losers early, keep the best")
+    best.add_argument("--endpoint", default="http://localhost:1234")
+    best.add_argument("--api-key", default="")
+    best.add_argument("--model", required=True)
+    best.add_argument("--preset", default="Coding")
+    best.add_argument("--format", default="None")
+    best.add_argument("--prompt")
+    best.add_argument("--system-prompt", default=DEFAULT_SYSTEM_PROMPT)
+    best.add_argument("--max-tokens", type=int, help="Default: the preset's max_tokens, else 800")
+    best.add_argument("-n", type=int, default=4, help="Candidates")
+    best.add_argument("--score", help="Scoring function as module:function or file.py:function, or 'exec' to run the code (default: built-in heuristic)")
+    best.add_argument("--token-budget", type=int, help="Stop candidates that stream more deltas than this")
+    best.add_argument("--margin", type=float, default=0.15, help="Stop candidates trailing the leader at equal length by more than this score")
+    best.add_argument("--min-tokens", type=int, default=32, help="Deltas before a candidate can be judged behind")
+    best.add_argument("--patience", type=float, default=2.0, help="Stop candidates still running at this multiple of the first finisher's latency")
+    best.add_argument("--server-n", choices=["auto", "on", "off"], default="auto",
+                      help="Send one request with n= instead of N requests (auto: when the server honours it)")
+    best.add_argument("--baseline", action="store_true", help="Time one single sample first to report the added latency")
+    best.add_argument("--show", action="store_true", help="Print the winning output")
+    best.add_argument("--no-history", action="store_true", help=f"Do not record runs in {history_path()}")
+    _add_session_args(best)
+    best.set_defaults(func=cmd_best_of)
+
+    hist = sub.add_parser("history", help="Latency/throughput trends (or recent runs) from the run history")
+    hist.add_argument("--db", help=f"History database (default {history_path()})")
+    hist.add_argument("--model")
+    hist.add_argument("--preset")
+    hist.add_argument("--source", choices=["gui", "sweep", "compare", "bestofn", "replay", "dataset"])
+    hist.add_argument("--days", type=float, default=30, help="Look back this many days (0 = all)")
+    hist.add_argument("--bucket-hours", type=float, default=24)
+    hist.add_argument("--runs", type=int, default=0, help="List the N most recent runs instead of the trend")
+    hist.set_defaults(func=cmd_history)
+
+    lim = sub.add_parser("recommend-limits", help="Suggest max_tokens and stop sequences per preset from the run history")
+    lim.add_argument("--db", help=f"History database (default {history_path()})")
+    lim.add_argument("--model")
+    lim.add_argument("--preset")
+    lim.add_argument("--source", choices=["gui", "sweep", "compare", "bestofn", "replay", "dataset"])
+    lim.add_argument("--days", type=float, default=30, help="Look back this many days (0 = all)")
+    lim.add_argument("--headroom", type=float, default=1.25, help="max_tokens = p95 of natural completion lengths x this")
+    lim.add_argument("--min-runs", type=int, default=5, help="Natural completions needed before recommending max_tokens")
+    lim.add_argument("--json", help="Write the recommendations to this JSON file")
+    lim.set_defaults(func=cmd_recommend_limits)
+
+    imp = sub.add_parser("importtime", help="Measure cold import time of the tuner modules")
+    imp.add_argument("--modules", default="", help=f"Comma-separated (default: {', '.join(IMPORT_TIME_MODULES)})")
+    imp.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    imp.add_argument("--record", action="store_true", help=f"Append the result to {import_times_path()}")
+    imp.add_argument("--max-regression", type=float, help="Exit 1 if a module got slower than the last record by more than this percent")
+    imp.set_defaults(func=cmd_importtime)
+
+    code = sub.add_parser("score-code", help="Run the Python code in saved responses (files, or JSONL with 'output') in a sandbox")
+    code.add_argument("files", nargs="+")
+    code.add_argument("--workers", type=int, default=0, help="Sandboxed interpreters at once (default: CPUs - 1)")
+    code.add_argument("--timeout", type=float, default=10.0, help="Wall-clock seconds per response")
+    code.add_argument("--cpu-seconds", type=int, default=10)
+    code.add_argument("--memory-mb", type=int, default=512)
+    code.set_defaults(func=cmd_score_code)
+
+    mock = sub.add_parser("mock-server", help="Serve a fake LM Studio API with synthetic latency for offline runs")
+    mock.add_argument("--host", default="127.0.0.1")
+    mock.add_argument("--port", type=int, default=1234)
+    mock.add_argument("--models", default="mock-small,mock-large")
+    mock.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    mock.add_argument("--prefill-per-token", type=float, default=0.0, help="Extra TTFT seconds per prompt token")
+    mock.add_argument("--token-delay", type=float, default=0.01, help="Seconds per generated token")
+    mock.add_argument("--swap-delay", type=float, default=0.0, help="Extra TTFT when the requested model changes")
+    mock.add_argument("--context-limit", type=int, default=0, help="Reject prompts over this many tokens with 400 (0 = unlimited)")
+    mock.add_argument("--chars-per-token", type=float, default=4.0,
+                      help="Prompt characters per reported token (4 = the client's estimate; try 6 for real BPE)")
+    mock.add_argument("--decode-slowdown", type=float, default=0.0, help="Extra seconds per token per 1k prompt tokens")
+    mock.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with --error-status")
+    mock.add_argument("--error-status", type=int, default=500)
+    mock.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of streams cut off mid-generation")
+    mock.add_argument("--max-concurrency", type=int, default=0, help="Generations at once (0 = unlimited); extra requests queue")
+    mock.add_argument("--reject", action="store_true", help="Answer 503 above --max-concurrency instead of queueing")
+    mock.add_argument("--supports-n", action="store_true", help="Honour the n parameter (LM Studio returns one choice)")
+    mock.add_argument("--vary", action="store_true", help="End sampled (temperature > 0) answers at random lengths")
+    mock.add_argument("--runaway-rate", type=float, default=0.0,
+                      help="Fraction of answers that repeat their last sentence until max_tokens")
+    mock.add_argument("--seed", type=int)
+    mock.set_defaults(func=cmd_mock_server)
+
+    bench = sub.add_parser("bench", help="Measure client-side overhead (formatting, JSON, SSE, UI flush, connections)")
+    bench.add_argument("--only", default="", help="Comma-separated benchmark names")
+    bench.add_argument("--no-network", action="store_true", help="Skip the round trips against the in-process mock server")
+    bench.add_argument("--quick", action="store_true", help="A tenth of the iterations")
+    bench.add_argument("--rounds", type=int, default=5)
+    bench.add_argument("--record", action="store_true", help=f"Append the medians to {bench_path()}")
+    bench.add_argument("--max-regression", type=float, help="Exit 1 if a benchmark got slower than the last record by more than this percent")
+    _add_session_args(bench, measure=True)
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    metrics = _start_metrics(args)
+    try:
+        if not args.command:
+            from .gui import run_gui
+            run_gui()
+            return 0
+        _apply_session_args(args)
+        if getattr(args, "tokenizer", None):
+            from . import formatting
+            formatting.TOKENIZER_SPECS["*"] = args.tokenizer
+            formatting.ALLOW_TOKENIZER_DOWNLOAD = args.tokenizer_download
+        return args.func(args)
+    finally:
+        _stop_metrics(metrics)
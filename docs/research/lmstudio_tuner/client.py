@@ -0,0 +1,419 @@
+"""
+HTTP client for LM Studio's OpenAI-compatible API.
+
+One pooled keep-alive session per endpoint with the provider's retry
+schedule, SSE streaming with per-token timings and cancellation, and the
+model listing endpoints. Every request is counted in metrics.STATS.
+"""
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import HTTPError as _UrllibHTTPError, ProtocolError
+from urllib3.util.retry import Retry
+
+from .formatting import RequestParams, build_headers, build_payload, resolve_usage
+from .metrics import STATS, StreamMetrics
+from .runaway import RUNAWAY, RunawayGuard
+
+
+@dataclass
+class SessionConfig:
+    """Pooling/retry settings; retries mirror LMStudioConfig in src/providers/lmstudio.ts."""
+    pool_size: int = 8
+    keep_alive: bool = True
+    max_retries: int = 2
+    retry_delay: float = 1.0  # seconds before the first retry, doubled after each
+
+
+class _BackoffRetry(Retry):
+    """Retry with the provider's schedule: retry_delay * 2 ** (attempt - 1).
+
+    urllib3 skips the delay before the first retry; LMStudioProvider does not.
+    """
+
+    def get_backoff_time(self) -> float:
+        attempts = len(self.history)
+        if attempts < 1:
+            return 0.0
+        return float(min(self.backoff_max, self.backoff_factor * (2 ** (attempts - 1))))
+
+    def increment(self, *args: Any, **kwargs: Any) -> Retry:
+        new = super().increment(*args, **kwargs)  # raises once retries are exhausted
+        STATS.record_retry()
+        return new
+
+
+# CancelToken bound to the current thread by CancelToken.bind()
+_bound = threading.local()
+
+
+class _CancelHookMixin:
+    """Hands the socket to the thread's bound CancelToken once the request is
+    sent, so a request still waiting for its response headers can be aborted."""
+
+    def request(self, *args: Any, **kwargs: Any) -> None:
+        super().request(*args, **kwargs)  # type: ignore[misc]
+        token = getattr(_bound, "token", None)
+        if token is not None:
+            token.attach_socket(self.sock)  # type: ignore[attr-defined]
+
+
+class _HTTPConnection(_CancelHookMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_CancelHookMixin, HTTPSConnection):
+    pass
+
+
+class _HTTPPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class _CancellableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+
+SESSION_CONFIG = SessionConfig()
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def configure_sessions(**changes: Any) -> None:
+    """Update SESSION_CONFIG and drop existing sessions so the change applies."""
+    for key, value in changes.items():
+        if not hasattr(SESSION_CONFIG, key):
+            raise AttributeError(f"Unknown session setting: {key}")
+        setattr(SESSION_CONFIG, key, value)
+    close_sessions()
+
+
+def close_sessions() -> None:
+    with _sessions_lock:
+        for sess in _sessions.values():
+            sess.close()
+        _sessions.clear()
+
+
+def get_session(endpoint: str) -> requests.Session:
+    """Shared session for `endpoint`, created on first use."""
+    key = endpoint.rstrip('/')
+    with _sessions_lock:
+        sess = _sessions.get(key)
+        if sess is not None:
+            return sess
+        cfg = SESSION_CONFIG
+        retry = _BackoffRetry(
+            total=cfg.max_retries,
+            connect=cfg.max_retries,
+            read=0,  # never replay a generation that already reached the server
+            status=cfg.max_retries,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=None,
+            backoff_factor=cfg.retry_delay,
+            raise_on_status=False,
+        )
+        adapter = _CancellableAdapter(pool_connections=1, pool_maxsize=cfg.pool_size, max_retries=retry)
+        sess = requests.Session()
+        sess.mount("http://", adapter)
+        sess.mount("https://", adapter)
+        if not cfg.keep_alive:
+            sess.headers["Connection"] = "close"
+        _sessions[key] = sess
+        return sess
+
+
+def session_stats() -> Dict[str, Dict[str, int]]:
+    """Per-endpoint request/connection counters from the urllib3 pools."""
+    stats: Dict[str, Dict[str, int]] = {}
+    with _sessions_lock:
+        items = list(_sessions.items())
+    for endpoint, sess in items:
+        requests_made = connections = 0
+        seen = set()
+        for adapter in sess.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+        stats[endpoint] = {
+            "requests": requests_made,
+            "connections": connections,
+            "reused": max(0, requests_made - connections),
+        }
+    return stats
+
+
+def format_session_stats(endpoint: Optional[str] = None) -> str:
+    stats = session_stats()
+    if endpoint is not None:
+        key = endpoint.rstrip('/')
+        stats = {key: stats[key]} if key in stats else {}
+    return ", ".join(
+        f"{ep}: {s['requests']} reqs over {s['connections']} conns ({s['reused']} reused)"
+        for ep, s in stats.items()
+    ) or "no connections yet"
+
+
+def error_kind(exc: BaseException) -> str:
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return f"http_{exc.response.status_code // 100}xx"
+    if isinstance(exc, requests.Timeout):
+        return "timeout"
+    if isinstance(exc, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError, ConnectionError)):
+        return "connection"
+    if isinstance(exc, (ValueError, KeyError)):
+        return "bad_response"
+    return type(exc).__name__
+
+
+class CancelToken:
+    """Aborts an in-flight request from another thread.
+
+    cancel() shuts down the response socket, which unblocks the reader and
+    makes LM Studio drop the generation instead of decoding to max_tokens.
+    Requests sent inside bind() are abortable before their headers arrive
+    too, which is all a non-streamed request ever waits on.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._resp: Optional[requests.Response] = None
+        self._sock: Optional[socket.socket] = None
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def attach(self, resp: requests.Response) -> None:
+        with self._lock:
+            self._resp = resp
+        if self.cancelled:
+            self._abort(resp)
+
+    def attach_socket(self, sock: Optional[socket.socket]) -> None:
+        with self._lock:
+            self._sock = sock
+        if self.cancelled and sock is not None:
+            self._shutdown(sock)
+
+    def detach(self) -> None:
+        with self._lock:
+            self._resp = None
+            self._sock = None
+
+    @contextmanager
+    def bind(self) -> Iterator["CancelToken"]:
+        """Let cancel() abort requests this thread sends inside the block."""
+        prev = getattr(_bound, "token", None)
+        _bound.token = self
+        try:
+            yield self
+        finally:
+            _bound.token = prev
+            self.detach()
+
+    def cancel(self, reason: str = "stopped") -> None:
+        if self.cancelled:
+            return
+        self.reason = reason
+        self._event.set()
+        with self._lock:
+            resp, sock = self._resp, self._sock
+        if resp is not None:
+            self._abort(resp)
+        elif sock is not None:
+            self._shutdown(sock)
+
+    @staticmethod
+    def _shutdown(sock: socket.socket) -> None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _abort(resp: requests.Response) -> None:
+        conn = getattr(resp.raw, "_connection", None)
+        sock = getattr(conn, "sock", None)
+        if sock is None:
+            resp.close()
+            return
+        CancelToken._shutdown(sock)
+
+
+def _iter_raw(resp: requests.Response) -> Iterator[bytes]:
+    raw = resp.raw
+    if getattr(raw, "chunked", False) or not hasattr(raw, "read1"):
+        # chunk_size=None yields each transfer chunk as soon as it arrives
+        yield from resp.iter_content(chunk_size=None)
+        return
+    while True:
+        # Map urllib3 errors the way iter_content does so callers only see requests exceptions.
+        try:
+            data = raw.read1(8192)
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e) from e
+        except _UrllibHTTPError as e:
+            raise requests.ConnectionError(e) from e
+        if not data:
+            return
+        yield data
+
+
+def iter_sse_data(resp: requests.Response) -> Iterator[str]:
+    """Yield the payload of each `data:` line until `[DONE]` or EOF."""
+    buf = b""
+    for chunk in _iter_raw(resp):
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip().decode("utf-8", errors="replace")
+            if data == "[DONE]":
+                return
+            yield data
+
+
+def stream_chat_completion(
+    params: RequestParams,
+    on_text: Optional[Callable[[str], None]] = None,
+    cancel: Optional[CancelToken] = None,
+    guard: Union[RunawayGuard, bool, None] = None,
+) -> Tuple[str, StreamMetrics]:
+    """POST a `stream: true` chat completion and time every content delta.
+
+    If `cancel` fires mid-stream the partial text is returned and
+    metrics.cancelled is set instead of raising. `guard` drops the stream
+    when the output loops or runs on; the kept text is returned and
+    metrics.runaway says which guard stopped it. None follows
+    RUNAWAY.enabled, True / False force a fresh guard on or off.
+    """
+    if guard is None:
+        guard = RUNAWAY.enabled
+    if guard is True:
+        guard = RunawayGuard()
+    url = f"{params.endpoint.rstrip('/')}/v1/chat/completions"
+    payload = build_payload(params, stream=True)
+    metrics = StreamMetrics()
+    parts: List[str] = []
+
+    usage: Optional[Dict[str, Any]] = None
+    t0 = time.perf_counter()
+    prev: Optional[float] = None
+    try:
+        session = get_session(params.endpoint)
+        with cancel.bind() if cancel else nullcontext(), \
+                session.post(url, json=payload, headers=build_headers(params.api_key), stream=True, timeout=300) as resp:
+            resp.raise_for_status()
+            metrics.ttfb = time.perf_counter() - t0
+            if cancel:
+                cancel.attach(resp)
+            try:
+                for data in iter_sse_data(resp):
+                    if cancel and cancel.cancelled:
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if chunk.get("usage"):
+                        usage = chunk["usage"]
+                    choices = chunk.get("choices") or [{}]
+                    if choices[0].get("finish_reason"):
+                        metrics.finish_reason = choices[0]["finish_reason"]
+                    text = (choices[0].get("delta") or {}).get("content") or ""
+                    if not text:
+                        continue
+                    now = time.perf_counter() - t0
+                    if prev is None:
+                        metrics.ttft = now
+                    else:
+                        metrics.itl.append(now - prev)
+                    prev = now
+                    metrics.last_token = now
+                    metrics.chunks += 1
+                    parts.append(text)
+                    if on_text:
+                        on_text(text)
+                    if guard and guard.feed(text):
+                        CancelToken._abort(resp)  # stop the server decoding the rest
+                        break
+            finally:
+                if cancel:
+                    cancel.detach()
+    except (requests.RequestException, OSError) as e:
+        if not (cancel and cancel.cancelled):
+            STATS.record_failure(error_kind(e))
+            raise
+    metrics.cancelled = bool(cancel and cancel.cancelled)
+    metrics.total = time.perf_counter() - t0
+    if prev is None:
+        metrics.ttft = metrics.last_token = metrics.total
+    content = "".join(parts)
+    if guard and guard.tripped:
+        content = content[:guard.keep]
+        metrics.runaway = f"{guard.reason}: {guard.detail}"
+        metrics.finish_reason = "runaway"
+    counts = resolve_usage(usage, payload, content)
+    metrics.tokens, metrics.prompt_tokens, metrics.token_source = (
+        counts.completion_tokens, counts.prompt_tokens, counts.source)
+    if counts.source == "estimate":
+        # One delta per token is closer than chars/4 for the completion.
+        metrics.tokens, metrics.token_source = metrics.chunks, "deltas"
+    if guard and guard.tripped:
+        # Tokens decoded, not kept: the usage block never arrives after the abort.
+        metrics.tokens, metrics.token_source = metrics.chunks, "deltas"
+        metrics.runaway_saved = metrics.savings(params.max_tokens)[0] if params.max_tokens > 0 else 0
+        STATS.record_runaway(guard.reason, metrics.runaway_saved)
+    if not metrics.cancelled:
+        STATS.record_success(metrics.total, metrics.tokens, metrics.ttft,
+                             metrics.decode_tps if metrics.tokens > 1 else None)
+    return content, metrics
+
+
+def fetch_models(endpoint: str, api_key: str = "", timeout: float = 10) -> List[str]:
+    url = f"{endpoint.rstrip('/')}/v1/models"
+    resp = get_session(endpoint).get(url, headers=build_headers(api_key), timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json() or {}
+    return [m.get("id", "") for m in data.get("data", []) if isinstance(m, dict)]
+
+
+def fetch_model_states(endpoint: str, api_key: str = "", timeout: float = 5) -> Dict[str, str]:
+    """Model id -> "loaded" / "not-loaded" from LM Studio's /api/v0/models, or {} if unsupported."""
+    try:
+        resp = get_session(endpoint).get(f"{endpoint.rstrip('/')}/api/v0/models",
+                                         headers=build_headers(api_key), timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json() or {}
+    except (requests.RequestException, ValueError):
+        return {}
+    return {m.get("id", ""): str(m.get("state", "")) for m in data.get("data", []) if isinstance(m, dict)}
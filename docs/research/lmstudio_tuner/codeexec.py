@@ -0,0 +1,274 @@
+"""
+Execution scoring for generated code.
+
+The Python blocks of a response - fences tagged python/py, and untagged
+fences that compile (not "Output:" or shell blocks) - are joined into
+one script (tests usually follow the code they exercise) and run in a
+fresh interpreter:
+
+- ``python -I`` in an empty temp directory, with stdin closed and a
+  minimal environment
+- POSIX rlimits on CPU seconds, address space, file size and open files,
+  set by the harness before it runs the script (no preexec_fn, which is
+  unsafe from the thread pools that call run_code), plus a wall-clock
+  timeout that kills the whole process group
+- a small harness runs the script as ``__main__`` (with unittest.main
+  disabled), then any ``test*`` functions and unittest.TestCase classes
+  it defined, and reports the counts
+
+This is damage control for well-meaning code, not a security boundary:
+there is no network or filesystem isolation beyond the working directory.
+
+CodeExecutor bounds how many interpreters run at once; code_executor() is
+the process-wide one used by exec_score (an autotune/best-of ScoreFn) and
+by sweeps with ``--exec``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .formatting import RequestParams
+from .metrics import StreamMetrics
+
+PYTHON_LANGS = {"python", "py", "python3"}
+_FENCE = re.compile(r"```[ \t]*([\w+-]*)[^\n]*\n(.*?)```", re.S)
+_RESULT_MARKER = "__LMSTUDIO_TUNER_EXEC__"
+
+_HARNESS = r'''
+import json, sys, traceback, unittest
+marker, path, cpu_s, memory_mb = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+try:
+    import resource
+except ImportError:
+    resource = None
+if resource is not None:
+    for limit, value in ((resource.RLIMIT_CPU, cpu_s), (resource.RLIMIT_AS, memory_mb * 1024 * 1024),
+                         (resource.RLIMIT_FSIZE, 8 * 1024 * 1024), (resource.RLIMIT_NOFILE, 64)):
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+out = sys.stdout
+res = {"tests": 0, "failed": 0, "error": "", "exit_code": None}
+ns = {"__name__": "__main__", "__file__": path}
+unittest.main = lambda *a, **k: None  # the harness runs the TestCases itself
+exited = False
+try:
+    with open(path, encoding="utf-8") as f:
+        exec(compile(f.read(), path, "exec"), ns)
+except SystemExit as e:
+    exited = True
+    res["exit_code"] = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    if res["exit_code"]:
+        res["error"] = "SystemExit(%r)" % (e.code,)
+except BaseException as e:
+    res["error"] = traceback.format_exception_only(type(e), e)[-1].strip()
+if not exited and not res["error"]:
+    for name, fn in list(ns.items()):
+        if name.startswith("test") and callable(fn) and not isinstance(fn, type):
+            res["tests"] += 1
+            try:
+                fn()
+            except BaseException as e:
+                res["failed"] += 1
+                if not res["error"]:
+                    res["error"] = "%s: %s" % (name, traceback.format_exception_only(type(e), e)[-1].strip())
+    cases = [v for v in ns.values() if isinstance(v, type) and issubclass(v, unittest.TestCase) and v is not unittest.TestCase]
+    if cases:
+        suite = unittest.TestSuite(unittest.defaultTestLoader.loadTestsFromTestCase(c) for c in cases)
+        import io
+        r = unittest.TextTestRunner(stream=io.StringIO(), verbosity=0).run(suite)
+        res["tests"] += r.testsRun
+        res["failed"] += len(r.failures) + len(r.errors)
+        if (r.failures or r.errors) and not res["error"]:
+            test, tb = (r.failures or r.errors)[0]
+            res["error"] = "%s: %s" % (test.id().split(".")[-1], tb.strip().splitlines()[-1])
+out.write("\n" + marker + json.dumps(res) + "\n")
+out.flush()
+'''
+
+
+@dataclass
+class CodeBlock:
+    lang: str
+    code: str
+
+
+def extract_code_blocks(text: str) -> List[CodeBlock]:
+    return [CodeBlock(m.group(1).lower(), m.group(2)) for m in _FENCE.finditer(text or "")]
+
+
+def _compiles(code: str) -> bool:
+    try:
+        compile(code, "<block>", "exec")
+    except (SyntaxError, ValueError):
+        return False
+    return True
+
+
+def python_source(text: str) -> str:
+    """The response's Python blocks joined into one script.
+
+    Untagged blocks count only if they compile on their own, so a sample
+    output or shell block after the code does not break the script.
+    """
+    blocks = [b.code for b in extract_code_blocks(text)
+              if b.lang in PYTHON_LANGS or (not b.lang and _compiles(b.code))]
+    return "\n\n".join(blocks)
+
+
+@dataclass
+class ExecResult:
+    ran: bool = False  # False when the response had no Python code
+    ok: bool = False  # ran to completion without errors and every test passed
+    tests: int = 0
+    failed: int = 0
+    runtime_s: float = 0.0
+    timed_out: bool = False
+    error: str = ""
+    blocks: int = 0
+
+    @property
+    def score(self) -> float:
+        """0..1: nothing runnable or crashed 0, ran clean without tests 0.6, with tests 0.3-1.0 by pass rate."""
+        if not self.ran or self.timed_out or (self.error and not self.tests):
+            return 0.0
+        if not self.tests:
+            return 0.6
+        return 0.3 + 0.7 * (self.tests - self.failed) / self.tests
+
+    def fields(self) -> Dict[str, Any]:
+        """Sweep / history columns."""
+        return {
+            "exec_ok": self.ok if self.ran else None,
+            "exec_tests": self.tests,
+            "exec_failed": self.failed,
+            "exec_runtime_s": round(self.runtime_s, 4),
+            "exec_error": self.error,
+            "score": round(self.score, 4),
+        }
+
+
+def run_code(source: str, timeout: float = 10.0, cpu_s: int = 10, memory_mb: int = 512) -> ExecResult:
+    """Run `source` with the harness in a sandboxed interpreter and parse its report."""
+    result = ExecResult(ran=bool(source.strip()))
+    if not result.ran:
+        return result
+    with tempfile.TemporaryDirectory(prefix="tuner-exec-") as tmp:
+        path = os.path.join(tmp, "solution.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        env = {"PATH": os.environ.get("PATH", ""), "PYTHONDONTWRITEBYTECODE": "1", "PYTHONHASHSEED": "0"}
+        t0 = time.perf_counter()
+        argv = [sys.executable, "-I", "-c", _HARNESS, _RESULT_MARKER, path, str(cpu_s), str(memory_mb)]
+        proc = subprocess.Popen(argv, cwd=tmp, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True, errors="replace", start_new_session=True)
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill(proc)
+            stdout, stderr = proc.communicate()
+            result.timed_out = True
+            result.error = f"timed out after {timeout:g}s"
+        result.runtime_s = time.perf_counter() - t0
+    report = _parse_report(stdout)
+    if report is not None:
+        result.tests, result.failed = int(report["tests"]), int(report["failed"])
+        result.error = result.error or report["error"]
+    elif not result.timed_out:
+        lines = (stderr or "").strip().splitlines()
+        result.error = lines[-1] if lines else f"exit code {proc.returncode}"
+        if proc.returncode and proc.returncode < 0:
+            result.error = f"killed by signal {-proc.returncode} ({result.error})"
+    result.ok = not result.error and not result.timed_out and result.failed == 0
+    return result
+
+
+def _kill(proc: subprocess.Popen) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _parse_report(stdout: str) -> Optional[Dict[str, Any]]:
+    for line in reversed((stdout or "").splitlines()):
+        if line.startswith(_RESULT_MARKER):
+            try:
+                return json.loads(line[len(_RESULT_MARKER):])
+            except ValueError:
+                return None
+    return None
+
+
+class CodeExecutor:
+    """Runs responses' code on at most `workers` sandboxed interpreters at once."""
+
+    def __init__(self, workers: int = 0, timeout: float = 10.0, cpu_s: int = 10, memory_mb: int = 512):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        self.cpu_s = cpu_s
+        self.memory_mb = memory_mb
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="code-exec")
+
+    def submit(self, text: str) -> "Future[ExecResult]":
+        return self._pool.submit(self._run, text)
+
+    def run(self, text: str) -> ExecResult:
+        return self.submit(text).result()
+
+    def _run(self, text: str) -> ExecResult:
+        blocks = extract_code_blocks(text)
+        result = run_code(python_source(text), self.timeout, self.cpu_s, self.memory_mb)
+        result.blocks = len(blocks)
+        return result
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_executor: Optional[CodeExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def code_executor() -> CodeExecutor:
+    """Process-wide CodeExecutor (one interpreter per spare CPU)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CodeExecutor()
+        return _executor
+
+
+def exec_score(text: str, params: RequestParams, metrics: StreamMetrics) -> float:
+    """ScoreFn: ExecResult.score of the response's Python code."""
+    return code_executor().run(text).score
+
+
+exec_score.partial = False  # type: ignore[attr-defined]  # best-of-N: finished candidates only
+
+
+def format_exec_result(result: ExecResult) -> str:
+    if not result.ran:
+        return "code: no Python block"
+    if result.timed_out:
+        return f"code: TIMEOUT ({result.error})"
+    tests = f"{result.tests - result.failed}/{result.tests} tests" if result.tests else "no tests"
+    verdict = "PASS" if result.ok else "FAIL"
+    detail = f" - {result.error}" if result.error else ""
+    return f"code: {verdict} {tests} in {result.runtime_s:.2f}s{detail}"
+
@@ -0,0 +1,115 @@
+"""
+Side-by-side A/B comparison of model/preset combinations.
+"""
+from __future__ import annotations
+
+import difflib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Callable, List, Optional
+
+from .client import stream_chat_completion
+from .formatting import RequestParams
+from .history import RunHistory, history_row
+from .metrics import StreamMetrics, percentile
+from .preset_store import PresetStore
+from .presets import resolve_preset
+
+
+SAMPLING_KEYS = ("temperature", "top_p", "presence_penalty", "frequency_penalty", "repetition_penalty", "max_tokens")
+CURRENT_SETTINGS = "(current)"
+
+
+@dataclass
+class CompareSlot:
+    label: str
+    params: RequestParams
+    preset: str = CURRENT_SETTINGS
+    runs: List[StreamMetrics] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ttft_p50(self) -> float:
+        return percentile([m.ttft for m in self.runs], 50)
+
+    @property
+    def tps_p50(self) -> float:
+        return percentile([m.decode_tps for m in self.runs], 50)
+
+    @property
+    def output(self) -> str:
+        return self.outputs[-1] if self.outputs else ""
+
+
+def slot_params(base: RequestParams, model: str, preset_name: str = CURRENT_SETTINGS,
+                store: Optional[PresetStore] = None) -> RequestParams:
+    """`base` with the model swapped and, unless CURRENT_SETTINGS, the preset's sampling values."""
+    if not preset_name or preset_name == CURRENT_SETTINGS:
+        return replace(base, model=model)
+    preset = resolve_preset(preset_name, store)
+    sampling = {k: (int(preset[k]) if k == "max_tokens" else float(preset[k])) for k in SAMPLING_KEYS if k in preset}
+    return replace(base, model=model, **sampling)
+
+
+def run_comparison(
+    slots: List[CompareSlot],
+    trials: int = 1,
+    concurrent: bool = True,
+    on_text: Optional[Callable[[int, str], None]] = None,
+    on_trial: Optional[Callable[[int, List[int]], None]] = None,
+    history: Optional[RunHistory] = None,
+) -> List[CompareSlot]:
+    """Run every slot `trials` times. Trial t starts the slots rotated by t
+    (A B C, B C A, ...), either all at once or one after another, so no
+    slot always gets the warm or the cold server."""
+    n = len(slots)
+
+    def run(i: int) -> None:
+        slot = slots[i]
+        try:
+            text, metrics = stream_chat_completion(
+                slot.params, (lambda chunk: on_text(i, chunk)) if on_text else None)
+        except Exception as e:
+            slot.errors.append(str(e))
+            if history is not None:
+                history.record(history_row(slot.params, slot.preset, "compare", error=str(e)))
+            return
+        slot.runs.append(metrics)
+        slot.outputs.append(text)
+        if history is not None:
+            history.record(history_row(slot.params, slot.preset, "compare", text, metrics))
+
+    for t in range(max(1, trials)):
+        order = [(k + t) % n for k in range(n)]
+        if on_trial:
+            on_trial(t, order)
+        if concurrent:
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                for fut in [pool.submit(run, i) for i in order]:
+                    fut.result()
+        else:
+            for i in order:
+                run(i)
+    return slots
+
+
+def similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def compare_diff(a: str, b: str, a_label: str, b_label: str, max_lines: int = 400) -> str:
+    lines = list(difflib.unified_diff(a.splitlines(), b.splitlines(), a_label, b_label, lineterm=""))
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + [f"... ({len(lines) - max_lines} more diff lines)"]
+    return "\n".join(lines) or "(identical)"
+
+
+def format_comparison(slots: List[CompareSlot]) -> str:
+    base = slots[0].output if slots else ""
+    lines = [f"{'slot':<40} {'runs':>4} {'err':>3} {'TTFT p50':>9} {'tok/s p50':>9} {'chars':>7} {'sim vs 1':>8}"]
+    for i, slot in enumerate(slots):
+        sim = "-" if i == 0 else f"{similarity(base, slot.output):.2f}"
+        lines.append(f"{slot.label[:40]:<40} {len(slot.runs):>4} {len(slot.errors):>3} {slot.ttft_p50:>8.2f}s "
+                     f"{slot.tps_p50:>9.1f} {len(slot.output):>7} {sim:>8}")
+    return "\n".join(lines)
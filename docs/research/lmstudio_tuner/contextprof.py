@@ -0,0 +1,259 @@
+"""
+Context-length profiler: how TTFT, prefill and decode speed degrade as the
+prompt grows, and where the server stops accepting it.
+
+Synthetic prompts of a target token length are built from pseudo-random
+words, sized with count_tokens, and start with a unique header so a
+server-side prefix cache cannot hide the prefill. The local count (chars/4
+without a tokenizer) can be far off the model's: filler of common words
+is ~0.65x that in real BPE tokens. So calibrate_scale() first sends an
+empty and a ``start``-sized context and rescales every target by the
+server's prompt tokens per local token. The context goes where
+the orchestrator puts it (a system message block), or is split into
+``turns`` user/assistant pairs and sent through the chosen prompt format.
+
+profile_context ramps the size (doubling from ``start``) until a point
+breaks a limit - TTFT over ``max_ttft``, decode tok/s under ``min_tps``,
+an error/rejection, or the server reporting far fewer prompt tokens than
+sent (silent truncation) - then binary-searches between the last good and
+first bad size down to ``resolution`` tokens. Every measured point is
+kept, so the result doubles as the TTFT / tok/s curve for the model.
+"""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from .client import stream_chat_completion
+from .formatting import RequestParams, build_payload, count_tokens, prompt_text
+from .metrics import percentile
+
+_WORDS = (
+    "graph node edge queue stack visit depth breadth path cycle tree root leaf weight cost frontier "
+    "search order level parent child distance adjacency matrix list set map key value index range "
+    "limit buffer stream token model prompt layer cache batch step plan task result output input "
+    "agent review commit branch merge test case assert check error retry timeout latency budget"
+).split()
+
+CONTEXT_QUESTION = "In one sentence, what is the context above about?"
+TRUNCATION_RATIO = 0.8  # reported prompt tokens below this share of the target count as truncated
+
+
+@dataclass
+class ContextPoint:
+    target_tokens: int
+    prompt_tokens: int = 0  # as reported by the server (or counted locally)
+    ttft: float = 0.0
+    prefill: float = 0.0
+    prefill_tps: float = 0.0
+    decode_tps: float = 0.0
+    total: float = 0.0
+    error: str = ""
+    violation: str = ""  # why this point is past the limit, "" if within
+
+    @property
+    def ok(self) -> bool:
+        return not self.violation
+
+
+@dataclass
+class ContextProfile:
+    model: str
+    format_type: str
+    turns: int
+    points: List[ContextPoint] = field(default_factory=list)
+    limit_tokens: Optional[int] = None  # largest size within the limits
+    first_violation: Optional[ContextPoint] = None
+    token_scale: float = 1.0  # server prompt tokens per locally counted token
+
+    @property
+    def curve(self) -> List[ContextPoint]:
+        return sorted(self.points, key=lambda p: p.target_tokens)
+
+
+def synthetic_text(tokens: int, model: str = "", seed: int = 0) -> str:
+    """About `tokens` tokens of filler (by count_tokens for `model`), unique per seed."""
+    rng = random.Random(seed)
+    header = f"[context block {seed:08x}]\n"
+    if tokens <= 0:
+        return header
+    words: List[str] = []
+    target = tokens
+    for _ in range(4):
+        while len(words) < max(1, int(target * 0.75)):
+            words.append(rng.choice(_WORDS))
+        text = header + " ".join(words)
+        counted, _ = count_tokens(text, model)
+        if counted <= 0 or abs(counted - tokens) <= max(8, tokens // 50):
+            return text
+        target = max(1, int(target * tokens / counted))
+        words = words[:max(1, int(target * 0.75))]
+    return header + " ".join(words)
+
+
+def context_params(base: RequestParams, tokens: int, turns: int = 0, seed: int = 0,
+                   gen_tokens: int = 32) -> RequestParams:
+    """`base` carrying ~`tokens` of context: a system block, or `turns` user/assistant pairs."""
+    if turns <= 0:
+        system = f"{base.system_prompt}\n\n{synthetic_text(tokens, base.model, seed)}".strip()
+        return replace(base, system_prompt=system, user_prompt=CONTEXT_QUESTION, turns=[], max_tokens=gen_tokens)
+    per_message = max(1, tokens // (2 * turns))
+    history: List[Dict[str, str]] = []
+    for t in range(turns):
+        history.append({"role": "user", "content": synthetic_text(per_message, base.model, seed * 1000 + 2 * t)})
+        history.append({"role": "assistant", "content": synthetic_text(per_message, base.model, seed * 1000 + 2 * t + 1)})
+    return replace(base, user_prompt=CONTEXT_QUESTION, turns=history, max_tokens=gen_tokens)
+
+
+def calibrate_scale(base: RequestParams, turns: int = 0, tokens: int = 512) -> float:
+    """Server-reported prompt tokens per local token of filler; 1.0 if the server reports no usage."""
+    counts = []
+    for size, seed in ((0, 1 << 30), (tokens, (1 << 30) + 1)):
+        params = context_params(base, size, turns, seed=seed, gen_tokens=1)
+        try:
+            _, m = stream_chat_completion(params)
+        except requests.RequestException:
+            return 1.0
+        if m.token_source != "usage":
+            return 1.0
+        local, _ = count_tokens(prompt_text(build_payload(params)), base.model)
+        counts.append((m.prompt_tokens, local))
+    (server0, local0), (server1, local1) = counts
+    if server1 <= server0 or local1 <= local0:
+        return 1.0
+    return (server1 - server0) / (local1 - local0)
+
+
+def _error_text(exc: Exception) -> str:
+    resp = getattr(exc, "response", None)
+    if resp is not None:
+        try:
+            body = resp.json()
+            message = (body.get("error") or {}).get("message") if isinstance(body.get("error"), dict) else body.get("error")
+            if message:
+                return f"HTTP {resp.status_code}: {message}"
+        except (ValueError, AttributeError, requests.RequestException):
+            pass
+        return f"HTTP {resp.status_code}"
+    return str(exc)
+
+
+def measure_point(base: RequestParams, tokens: int, turns: int = 0, repeats: int = 1, gen_tokens: int = 32,
+                  max_ttft: Optional[float] = None, min_tps: Optional[float] = None,
+                  seed: int = 0, scale: float = 1.0) -> ContextPoint:
+    """Median of `repeats` fresh-context requests at `tokens` (server tokens), with the limit check applied.
+
+    `scale` is calibrate_scale()'s ratio; the filler is sized to tokens / scale local tokens.
+    """
+    point = ContextPoint(tokens)
+    samples = []
+    local_tokens = max(1, int(tokens / scale)) if scale > 0 else tokens
+    for r in range(max(1, repeats)):
+        params = context_params(base, local_tokens, turns, seed=seed + r, gen_tokens=gen_tokens)
+        try:
+            _, m = stream_chat_completion(params)
+        except requests.RequestException as e:
+            point.error = _error_text(e)
+            point.violation = "rejected" if getattr(e, "response", None) is not None else "error"
+            return point
+        samples.append(m)
+    point.prompt_tokens = int(percentile([float(m.prompt_tokens) for m in samples], 50))
+    point.ttft = percentile([m.ttft for m in samples], 50)
+    point.prefill = percentile([m.prefill for m in samples], 50)
+    point.prefill_tps = percentile([m.prefill_tps for m in samples], 50)
+    point.decode_tps = percentile([m.decode_tps for m in samples], 50)
+    point.total = percentile([m.total for m in samples], 50)
+    if point.prompt_tokens and point.prompt_tokens < tokens * TRUNCATION_RATIO:
+        point.violation = f"truncated ({point.prompt_tokens} of ~{tokens} tokens used)"
+    elif max_ttft is not None and point.ttft > max_ttft:
+        point.violation = f"TTFT {point.ttft:.2f}s > {max_ttft:g}s"
+    elif min_tps is not None and 0 < point.decode_tps < min_tps:
+        point.violation = f"decode {point.decode_tps:.1f} tok/s < {min_tps:g}"
+    return point
+
+
+def profile_context(
+    base: RequestParams,
+    start: int = 512,
+    max_context: int = 32768,
+    turns: int = 0,
+    max_ttft: Optional[float] = None,
+    min_tps: Optional[float] = None,
+    resolution: int = 256,
+    repeats: int = 1,
+    gen_tokens: int = 32,
+    on_point: Optional[Callable[[ContextPoint], None]] = None,
+    calibrate: bool = True,
+) -> ContextProfile:
+    """Ramp then binary-search the prompt size for `base.model` / `base.format_type`."""
+    profile = ContextProfile(base.model, base.format_type, turns)
+    if calibrate:
+        profile.token_scale = calibrate_scale(base, turns, max(1, min(start, max_context)))
+    seed = 0
+
+    def measure(tokens: int) -> ContextPoint:
+        nonlocal seed
+        seed += max(1, repeats)
+        point = measure_point(base, tokens, turns, repeats, gen_tokens, max_ttft, min_tps, seed,
+                              profile.token_scale)
+        profile.points.append(point)
+        if on_point:
+            on_point(point)
+        return point
+
+    good, bad = 0, None
+    size = max(1, start)
+    while size <= max_context:
+        point = measure(size)
+        if not point.ok:
+            bad = point
+            break
+        good = size
+        if size == max_context:
+            break
+        size = min(size * 2, max_context)
+    if bad is not None:
+        lo, hi = good, bad.target_tokens
+        while hi - lo > max(1, resolution):
+            mid = (lo + hi) // 2
+            point = measure(mid)
+            if point.ok:
+                lo = mid
+            else:
+                hi, bad = mid, point
+        good = lo
+    profile.limit_tokens = good or None
+    profile.first_violation = bad
+    return profile
+
+
+def format_context_point(p: ContextPoint) -> str:
+    if p.error:
+        return f"{p.target_tokens:>7} toks: {p.violation.upper()} {p.error}"
+    flag = f"  <- {p.violation}" if p.violation else ""
+    return (f"{p.target_tokens:>7} toks (server {p.prompt_tokens:>6}): TTFT {p.ttft:6.2f}s "
+            f"prefill {p.prefill_tps:7.0f} tok/s  decode {p.decode_tps:6.1f} tok/s  total {p.total:6.2f}s{flag}")
+
+
+def format_context_profile(profile: ContextProfile, width: int = 40) -> str:
+    turns = f", {profile.turns} turns" if profile.turns else ""
+    scale = f", {profile.token_scale:.2f} server tokens per local token" if profile.token_scale != 1.0 else ""
+    lines = [f"{profile.model} | {profile.format_type}{turns}{scale}"]
+    curve = [p for p in profile.curve if not p.error]
+    top = max((p.ttft for p in curve), default=0.0) or 1.0
+    for p in profile.curve:
+        if p.error:
+            lines.append(f"{p.target_tokens:>7} | {p.violation}: {p.error}")
+            continue
+        bar = "#" * max(1, int(width * p.ttft / top))
+        lines.append(f"{p.target_tokens:>7} | {bar:<{width}} TTFT {p.ttft:5.2f}s  {p.decode_tps:6.1f} tok/s"
+                     f"{'  x ' + p.violation if p.violation else ''}")
+    if profile.limit_tokens:
+        why = f" (next: {profile.first_violation.violation})" if profile.first_violation else " (no limit hit)"
+        lines.append(f"usable context: ~{profile.limit_tokens} tokens{why}")
+    else:
+        lines.append("no size stayed within the limits")
+    return "\n".join(lines)
@@ -0,0 +1,422 @@
+"""
+Streaming evaluation of one model / preset over a large prompt dataset.
+
+The dataset (JSONL, or plain text with one prompt per line) is read lazily
+and each line is dispatched to a bounded pool: at most ``max_pending``
+requests are in flight or queued, and the reader only advances when one
+finishes, so memory stays flat whatever the file size. Results are
+appended to a JSONL file as they complete (in completion order, keyed by
+line ``index``).
+
+Progress is checkpointed to ``<results>.ckpt`` (written atomically every
+``checkpoint_every`` results and on exit) as a watermark - every line
+below it is done - plus the few done lines above it, the dataset byte
+offset of the watermark line and the results file length. Resuming seeks
+straight to the watermark, folds in results written after the last
+checkpoint, truncates a half-written last row, and skips what is done. A
+checkpoint from a different model / preset / prompt setup is refused
+rather than mixed in.
+
+Latency and TTFT quantiles come from fixed-bucket histograms, and the
+progress / ETA from the throughput measured in the current session.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from .autotune import ScoreFn
+from .cache import ResponseCache, cached_chat_completion
+from .formatting import RequestParams
+from .history import RunHistory, history_row
+from .metrics import LatencyHistogram, StreamMetrics
+
+PROMPT_FIELDS = ("prompt", "user_prompt", "input", "question", "body", "text")
+ID_FIELDS = ("id", "request_id", "task_id")
+CHECKPOINT_VERSION = 1
+
+
+class DatasetError(Exception):
+    pass
+
+
+def dataset_results_path(dataset: Path, model: str, preset: str) -> Path:
+    slug = "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{model}.{preset}")
+    return Path('.autodev') / 'datasets' / f"{Path(dataset).stem}.{slug}.jsonl"
+
+
+def checkpoint_path(results: Path) -> Path:
+    return Path(str(results) + ".ckpt")
+
+
+def count_lines(path: Path, chunk: int = 1 << 20) -> int:
+    """Non-empty-tail-aware line count, reading `chunk` bytes at a time."""
+    lines, last = 0, b"\n"
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk)
+            if not data:
+                break
+            lines += data.count(b"\n")
+            last = data[-1:]
+    return lines + (last != b"\n")
+
+
+class _Fields(dict):
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+def record_prompt(record: Any, prompt_field: Optional[str] = None,
+                  template: Optional[str] = None) -> Tuple[str, str, str]:
+    """(id, system, prompt) of one dataset record; prompt is "" when none is found."""
+    if not isinstance(record, dict):
+        return "", "", str(record)
+    rid = next((str(record[k]) for k in ID_FIELDS if record.get(k) not in (None, "")), "")
+    system = str(record.get("system") or record.get("system_prompt") or "")
+    if template:
+        prompt = template.format_map(_Fields({k: "" if v is None else v for k, v in record.items()}))
+    elif prompt_field:
+        prompt = str(record.get(prompt_field) or "")
+    else:
+        key = next((k for k in PROMPT_FIELDS if record.get(k)), None)
+        prompt = str(record[key]) if key else ""
+        if key == "body" and record.get("title"):  # issue / request style records
+            prompt = f"{record['title']}\n\n{prompt}"
+    return rid, system, prompt
+
+
+def iter_dataset(path: Path, start_offset: int = 0, start_index: int = 0) -> Iterator[Tuple[int, int, int, str]]:
+    """(index, byte offset, offset of the next line, line) from `start_offset`, one line at a time."""
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        index, offset = start_index, start_offset
+        for raw in f:
+            yield index, offset, offset + len(raw), raw.decode("utf-8", errors="replace").strip()
+            index += 1
+            offset += len(raw)
+
+
+class Watermark:
+    """Done-set of line indices stored as "all below `value`" plus the stragglers above it."""
+
+    def __init__(self, value: int = 0, done: Optional[Set[int]] = None):
+        self.value = value
+        self.done: Set[int] = set(done or ())
+        self._advance()
+
+    def add(self, index: int) -> None:
+        if index >= self.value:
+            self.done.add(index)
+            self._advance()
+
+    def _advance(self) -> None:
+        while self.value in self.done:
+            self.done.remove(self.value)
+            self.value += 1
+
+    def __contains__(self, index: int) -> bool:
+        return index < self.value or index in self.done
+
+
+@dataclass
+class DatasetProgress:
+    total: int
+    done: int = 0  # rows in the results file, including earlier sessions
+    ok: int = 0
+    failed: int = 0
+    skipped: int = 0  # lines without a prompt
+    tokens: int = 0
+    session_done: int = 0
+    session_tokens: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    ttft: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Rows per second measured in this session."""
+        return self.session_done / self.elapsed if self.session_done and self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        remaining = max(0, self.total - self.done)
+        if not remaining:
+            return 0.0
+        return remaining / self.rate if self.rate > 0 else None
+
+    def counters(self) -> Dict[str, int]:
+        return {"done": self.done, "ok": self.ok, "failed": self.failed, "skipped": self.skipped, "tokens": self.tokens}
+
+
+def _fingerprint(params: RequestParams, preset: str, prompt_field: Optional[str], template: Optional[str],
+                 dataset: Path) -> str:
+    settings = {k: v for k, v in asdict(params).items() if k not in ("api_key", "endpoint", "user_prompt", "turns")}
+    key = json.dumps([settings, preset, prompt_field, template, str(Path(dataset).resolve())], sort_keys=True)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        raise DatasetError(f"Unreadable checkpoint {path}: {e}") from e
+    if data.get("version") != CHECKPOINT_VERSION:
+        raise DatasetError(f"Checkpoint {path} has unsupported version {data.get('version')!r}")
+    return data
+
+
+def save_checkpoint(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _replay_results(results: Path, offset: int, marks: Watermark, progress: DatasetProgress) -> None:
+    """Fold rows written after `offset` into `marks` and `progress`; drop a torn last row."""
+    if not results.exists():
+        return
+    with open(results, 'r+b') as f:
+        f.seek(offset)
+        good = offset
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                row = json.loads(raw)
+            except ValueError:
+                break
+            good += len(raw)
+            marks.add(int(row["index"]))
+            progress.done += 1
+            if row.get("ok"):
+                progress.ok += 1
+                progress.tokens += int(row.get("tokens") or 0)
+            elif row.get("skipped"):
+                progress.skipped += 1
+            else:
+                progress.failed += 1
+        f.truncate(good)
+
+
+def _evaluate(params: RequestParams, index: int, rid: str, preset: str, cache: Optional[ResponseCache],
+              score_fn: Optional[ScoreFn], store_output: bool,
+              history: Optional[RunHistory]) -> Tuple[Dict[str, Any], Optional[StreamMetrics]]:
+    row: Dict[str, Any] = {"index": index, "id": rid, "ts": round(time.time(), 3)}
+    try:
+        content, metrics = cached_chat_completion(params, cache)
+    except Exception as e:
+        row.update({"ok": False, "error": str(e)})
+        if history is not None:
+            history.record(history_row(params, preset, "dataset", error=str(e)))
+        return row, None
+    row.update({
+        "ok": True, "error": "",
+        "latency_s": round(metrics.total, 4),
+        "ttft_s": round(metrics.ttft, 4),
+        "decode_tps": round(metrics.decode_tps, 2),
+        "prompt_tokens": metrics.prompt_tokens,
+        "tokens": metrics.tokens,
+        "cached": metrics.cached,
+        "finish_reason": metrics.finish_reason,
+        "runaway": metrics.runaway,
+        "output_chars": len(content),
+    })
+    extra: Dict[str, Any] = {}
+    if score_fn is not None:
+        row["score"] = extra["score"] = round(score_fn(content, params, metrics), 4)
+    if store_output:
+        row["output"] = content
+    if history is not None:
+        history.record(history_row(params, preset, "dataset", content, metrics, **extra))
+    return row, metrics
+
+
+def run_dataset(
+    dataset: Path,
+    base: RequestParams,
+    preset: str,
+    results: Path,
+    workers: int = 2,
+    max_pending: int = 0,
+    prompt_field: Optional[str] = None,
+    template: Optional[str] = None,
+    limit: Optional[int] = None,
+    score_fn: Optional[ScoreFn] = None,
+    store_output: bool = False,
+    restart: bool = False,
+    checkpoint_every: int = 50,
+    cache: Optional[ResponseCache] = None,
+    history: Optional[RunHistory] = None,
+    on_progress: Optional[Callable[[DatasetProgress], None]] = None,
+    progress_interval: float = 5.0,
+    stop: Optional[threading.Event] = None,
+) -> DatasetProgress:
+    """Evaluate every line of `dataset` not yet in `results`; safe to interrupt and call again.
+
+    `max_pending` (default 2 x workers) bounds queued plus running
+    requests; `limit` stops after that many lines of the dataset. Setting
+    `stop` (or KeyboardInterrupt) finishes the requests in flight, writes
+    the checkpoint and returns.
+    """
+    dataset, results = Path(dataset), Path(results)
+    ckpt_path = checkpoint_path(results)
+    fingerprint = _fingerprint(base, preset, prompt_field, template, dataset)
+    total = count_lines(dataset)
+    if limit is not None:
+        total = min(total, limit)
+    progress = DatasetProgress(total)
+    results.parent.mkdir(parents=True, exist_ok=True)
+    if restart:
+        for p in (results, ckpt_path):
+            if p.exists():
+                p.unlink()
+    ckpt = load_checkpoint(ckpt_path)  # written before the first result, so results never exist without one
+    if ckpt is None and results.exists() and results.stat().st_size:
+        raise DatasetError(f"{results} exists without a checkpoint; pass restart=True (--restart) to overwrite it")
+    if ckpt is not None and ckpt.get("fingerprint") != fingerprint:
+        raise DatasetError(f"{ckpt_path} belongs to a different model/preset/prompt setup; "
+                           f"use another results file or restart")
+    if ckpt is not None and ckpt.get("offset", 0) > dataset.stat().st_size:
+        raise DatasetError(f"{dataset} is shorter than when {ckpt_path} was written")
+    if ckpt is not None and int(ckpt.get("results_offset", 0)) > (results.stat().st_size if results.exists() else 0):
+        ckpt = None  # results were cut below the checkpoint: rebuild the state from the rows that remain
+
+    marks = Watermark(int(ckpt["watermark"]), set(ckpt.get("done") or [])) if ckpt else Watermark()
+    for key, value in (ckpt or {}).get("counters", {}).items():
+        setattr(progress, key, int(value))
+    _replay_results(results, int(ckpt["results_offset"]) if ckpt else 0, marks, progress)
+    # Read on from the checkpointed watermark line; rows folded in above are skipped as done.
+    start_index, start_offset = (int(ckpt["watermark"]), int(ckpt["offset"])) if ckpt else (0, 0)
+    offsets: Dict[int, int] = {}  # byte offset of each line read at or above the watermark
+    reader_pos = [start_index, start_offset]  # index and byte offset of the next line to read
+    max_pending = max_pending or 2 * max(1, workers)
+    stop = stop or threading.Event()
+
+    def checkpoint(out: Any) -> None:
+        out.flush()
+        w = marks.value
+        save_checkpoint(ckpt_path, {
+            "version": CHECKPOINT_VERSION, "fingerprint": fingerprint, "dataset": str(dataset),
+            "watermark": w, "offset": offsets.get(w, reader_pos[1]) if w < reader_pos[0] else reader_pos[1],
+            "done": sorted(marks.done), "results_offset": out.tell(), "counters": progress.counters(),
+            "updated": time.time(),
+        })
+
+    def finish(out: Any, row: Dict[str, Any], metrics: Optional[StreamMetrics]) -> None:
+        out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+        marks.add(row["index"])
+        for i in [i for i in offsets if i < marks.value]:
+            del offsets[i]
+        progress.done += 1
+        progress.session_done += 1
+        if row.get("skipped"):
+            progress.skipped += 1
+        elif row.get("ok"):
+            progress.ok += 1
+        else:
+            progress.failed += 1
+        if metrics is not None:
+            progress.tokens += metrics.tokens
+            progress.session_tokens += metrics.tokens
+            if not metrics.cached:  # a cache hit takes ~0s
+                progress.latency.observe(metrics.total)
+                progress.ttft.observe(metrics.ttft)
+
+    last_report = time.perf_counter()
+    since_checkpoint = 0
+    pending: Dict[Future, int] = {}
+    with open(results, 'ab') as out, ThreadPoolExecutor(max_workers=max(1, workers),
+                                                          thread_name_prefix="dataset") as pool:
+        checkpoint(out)
+        lines = iter_dataset(dataset, start_offset, start_index)
+        exhausted = False
+        try:
+            while not exhausted or pending:
+                while not exhausted and not stop.is_set() and len(pending) < max_pending:
+                    item = next(lines, None)
+                    if item is None or (limit is not None and item[0] >= limit):
+                        exhausted = True
+                        break
+                    index, offset, next_offset, line = item
+                    reader_pos[:] = [index + 1, next_offset]
+                    if index in marks:
+                        continue
+                    offsets[index] = offset
+                    try:
+                        record = json.loads(line) if line.startswith("{") else line
+                    except ValueError:
+                        record = None
+                    rid, system, prompt = record_prompt(record, prompt_field, template) if record is not None else ("", "", "")
+                    if not prompt.strip():
+                        finish(out, {"index": index, "id": rid, "ok": False, "skipped": True,
+                                     "error": "no prompt" if record is not None else "invalid JSON"}, None)
+                        continue
+                    params = replace(base, user_prompt=prompt, system_prompt=system or base.system_prompt)
+                    fut = pool.submit(_evaluate, params, index, rid, preset, cache, score_fn, store_output, history)
+                    pending[fut] = index
+                if stop.is_set():
+                    exhausted = True
+                if not pending:
+                    continue
+                done, _ = wait(list(pending), timeout=progress_interval, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    del pending[fut]
+                    row, metrics = fut.result()
+                    finish(out, row, metrics)
+                    since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    checkpoint(out)
+                    since_checkpoint = 0
+                if on_progress and time.perf_counter() - last_report >= progress_interval:
+                    on_progress(progress)
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            stop.set()
+            for fut in list(pending):
+                fut.cancel()
+            for fut in list(pending):
+                if not fut.cancelled():
+                    row, metrics = fut.result()
+                    finish(out, row, metrics)
+        finally:
+            checkpoint(out)
+    if on_progress:
+        on_progress(progress)
+    return progress
+
+
+def format_progress(p: DatasetProgress) -> str:
+    eta = p.eta
+    eta_text = "-" if eta is None else time.strftime("%H:%M:%S", time.gmtime(eta))
+    pct = 100.0 * p.done / p.total if p.total else 100.0
+    tps = p.session_tokens / p.elapsed if p.elapsed > 0 else 0.0
+    return (f"{p.done}/{p.total} ({pct:.1f}%) ok {p.ok} failed {p.failed} skipped {p.skipped} | "
+            f"{p.rate:.2f} rows/s {tps:.0f} tok/s | latency p50 {p.latency.quantile(0.5):.2f}s "
+            f"p95 {p.latency.quantile(0.95):.2f}s | ETA {eta_text}")
@@ -0,0 +1,184 @@
+"""
+Prompt formatting and request building for the LM Studio tuner.
+
+Token counting (the optional tiktoken / tokenizers packages are only
+imported when a tokenizer is first needed), the Llama 3 / ChatML / Mistral
+prompt templates, RequestParams and the OpenAI-compatible request body.
+Nothing here imports the HTTP stack or Tk.
+"""
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    # Rough heuristic: ~4 chars per token
+    return max(1, int(len(text) / 4.0))
+
+
+# Tokenizer spec per model id ("*" applies to every model), e.g.
+# "tiktoken:cl100k_base", "hf:Qwen/Qwen2.5-7B-Instruct" or a tokenizer.json path.
+# Only explicit specs are used; a model id is never looked up on its own.
+TOKENIZER_SPECS: Dict[str, str] = {}
+# "hf:" repos load from the local Hugging Face cache unless this is set
+# (--tokenizer-download): a download would block the request that needed it.
+ALLOW_TOKENIZER_DOWNLOAD = False
+
+
+@functools.lru_cache(maxsize=16)
+def load_tokenizer(spec: str, download: bool = False) -> Optional[Callable[[str], int]]:
+    """Return a token counter for `spec`, or None if it cannot be loaded.
+
+    Loaded once per spec; failures are memoized too so a missing optional
+    dependency or an uncached repo is not retried on every request.
+    """
+    try:
+        if spec.startswith("tiktoken:"):
+            import tiktoken
+            enc = tiktoken.get_encoding(spec.split(":", 1)[1])
+            return lambda text: len(enc.encode(text, disallowed_special=()))
+        from tokenizers import Tokenizer
+        name = spec[3:] if spec.startswith("hf:") else spec
+        path = Path(name) / "tokenizer.json" if Path(name).is_dir() else Path(name)
+        if not path.is_file():
+            from huggingface_hub import hf_hub_download  # installed with tokenizers
+            path = Path(hf_hub_download(name, "tokenizer.json", local_files_only=not download))
+        tok = Tokenizer.from_file(str(path))
+        return lambda text: len(tok.encode(text, add_special_tokens=False).ids)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "") -> Tuple[int, str]:
+    """Count tokens locally; returns (count, source) with source "tokenizer" or "estimate"."""
+    spec = TOKENIZER_SPECS.get(model) or TOKENIZER_SPECS.get("*")
+    counter = load_tokenizer(spec, ALLOW_TOKENIZER_DOWNLOAD) if spec else None
+    if counter is not None:
+        return counter(text), "tokenizer"
+    return estimate_tokens(text), "estimate"
+
+
+def apply_prompt_format(messages: List[Dict[str, str]], format_type: str = "None") -> List[Dict[str, str]]:
+    if not messages or not format_type or format_type.lower() == "none":
+        return messages
+
+    system_prompt = "You are a helpful assistant."
+    chat_messages = messages
+    if messages and messages[0].get("role") == "system":
+        system_prompt = messages[0].get("content", system_prompt)
+        chat_messages = messages[1:]
+
+    fmt = (format_type or "").strip().lower()
+
+    if fmt in ("llama 3", "llama3", "llama-3"):
+        prompt_str = f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n{system_prompt}<|eot_id|>"
+        for msg in chat_messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            prompt_str += f"<|start_header_id|>{role}<|end_header_id|>\n\n{content}<|eot_id|>"
+        prompt_str += "<|start_header_id|>assistant<|end_header_id|>\n\n"
+        return [{"role": "user", "content": prompt_str}]
+
+    if fmt == "chatml":
+        prompt_str = f"<|im_start|>system\n{system_prompt}<|im_end|>\n"
+        for msg in chat_messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            prompt_str += f"<|im_start|>{role}\n{content}<|im_end|>\n"
+        prompt_str += "<|im_start|>assistant\n"
+        return [{"role": "user", "content": prompt_str}]
+
+    if fmt in ("mistral", "mixtral"):
+        prompt_str = "<s>"
+        effective_messages = list(chat_messages)
+        if system_prompt and effective_messages:
+            if effective_messages[0].get('role') == 'user':
+                # copy: the caller's message dicts (e.g. RequestParams.turns) are reused
+                effective_messages[0] = dict(effective_messages[0], content=f"{system_prompt}\n\n{effective_messages[0].get('content','')}")
+        for m in effective_messages:
+            role = m.get('role')
+            if role == 'user':
+                prompt_str += f"[INST] {m.get('content','')} [/INST]"
+            elif role == 'assistant':
+                prompt_str += f"{m.get('content','')}</s>"
+        return [{"role": "user", "content": prompt_str}]
+
+    return messages
+
+
+@dataclass
+class RequestParams:
+    endpoint: str
+    api_key: str
+    model: str
+    temperature: float
+    top_p: float
+    presence_penalty: float
+    frequency_penalty: float
+    repetition_penalty: float
+    max_tokens: int
+    format_type: str
+    system_prompt: str
+    user_prompt: str
+    turns: List[Dict[str, str]] = field(default_factory=list)  # earlier user/assistant messages
+
+
+def build_messages(system_prompt: str, user_prompt: str,
+                   turns: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    messages: List[Dict[str, str]] = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.extend(turns or [])
+    messages.append({"role": "user", "content": user_prompt})
+    return messages
+
+
+def build_headers(api_key: str) -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    return headers
+
+
+def build_payload(params: RequestParams, stream: bool = False) -> Dict[str, Any]:
+    messages = build_messages(params.system_prompt, params.user_prompt, params.turns)
+    payload: Dict[str, Any] = {
+        "model": params.model,
+        "messages": apply_prompt_format(messages, params.format_type),
+        "temperature": params.temperature,
+        "top_p": params.top_p,
+        "presence_penalty": params.presence_penalty,
+        "frequency_penalty": params.frequency_penalty,
+        "repetition_penalty": params.repetition_penalty,
+        "max_tokens": params.max_tokens,
+    }
+    if stream:
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+
+def prompt_text(payload: Dict[str, Any]) -> str:
+    return "\n".join(m.get("content", "") for m in payload.get("messages", []))
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    source: str = "estimate"  # "usage", "tokenizer" or "estimate"
+
+
+def resolve_usage(usage: Optional[Dict[str, Any]], payload: Dict[str, Any], completion: str) -> TokenUsage:
+    """Prefer the server-reported usage block, else count locally."""
+    if usage and usage.get("completion_tokens") is not None:
+        return TokenUsage(int(usage.get("prompt_tokens") or 0), int(usage["completion_tokens"]), "usage")
+    model = payload.get("model", "")
+    prompt_toks, source = count_tokens(prompt_text(payload), model)
+    completion_toks, _ = count_tokens(completion, model)
+    return TokenUsage(prompt_toks, completion_toks, source)
@@ -0,0 +1,1102 @@
+"""
+Tk front-end for the LM Studio tuner.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import queue
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox
+from tkinter import simpledialog
+
+from .autotune import auto_tune, default_score, format_front, save_tuned_presets
+from .bestofn import Candidate, format_best_of_n, run_best_of_n
+from .cache import ResponseCache, cached_chat_completion
+from .client import CancelToken, error_kind, fetch_models, get_session, session_stats
+from .codeexec import code_executor, exec_score, format_exec_result
+from .compare import CURRENT_SETTINGS, CompareSlot, compare_diff, run_comparison, similarity, slot_params
+from .formatting import RequestParams, build_headers, build_payload, resolve_usage
+from .history import RunHistory, append_jsonl, history_row, run_history
+from .loadgen import LoadLevel, find_knee, format_load_level, format_load_report, ramp_levels, run_load_test
+from .metrics import STATS, StreamMetrics
+from .preset_store import PresetStoreError
+from .presets import DEFAULT_SYSTEM_PROMPT, DEFAULT_USER_PROMPT, PRESETS, preset_store
+from .profiling import format_load_profile, load_model_catalog, profile_model_load, save_model_catalog
+
+
+class UIUpdateQueue:
+    """Thread-safe funnel for UI changes made by worker threads.
+
+    Workers call append_text / clear_text / set_status / call from any
+    thread. A root.after tick, at most `fps` times a second, drains the
+    queue on the Tk thread: consecutive text chunks become one insert,
+    only the newest status is shown, and calls run in order. With
+    `max_chars` set, the oldest output is trimmed to keep the widget small.
+    Text and status tagged with a run id are dropped once `run_id` has moved
+    on, so a worker from an earlier run cannot overwrite the current one.
+    """
+
+    def __init__(self, root: tk.Misc, text: tk.Text, status_var: tk.StringVar,
+                 fps: int = 30, max_chars: Optional[int] = None):
+        self.root = root
+        self.text = text
+        self.status_var = status_var
+        self.interval_ms = max(1, int(1000 / max(1, fps)))
+        self.max_chars = max_chars
+        self._queue: "queue.SimpleQueue[Tuple[str, Any]]" = queue.SimpleQueue()
+        self._chars = 0
+        self.run_id = 0  # only touched on the Tk thread
+        self.root.after(self.interval_ms, self._tick)
+
+    def append_text(self, text: str, run_id: Optional[int] = None) -> None:
+        if text:
+            self._queue.put(("text", (run_id, text)))
+
+    def clear_text(self) -> None:
+        self._queue.put(("clear", None))
+
+    def set_status(self, message: str, run_id: Optional[int] = None) -> None:
+        self._queue.put(("status", (run_id, message)))
+
+    def call(self, fn: Callable[..., Any], *args: Any) -> None:
+        self._queue.put(("call", (fn, args)))
+
+    def _tick(self) -> None:
+        if not self.text.winfo_exists():
+            return  # owning window was closed
+        try:
+            self.flush()
+        finally:
+            self.root.after(self.interval_ms, self._tick)
+
+    def flush(self) -> None:
+        pending: List[str] = []
+        status: Optional[str] = None
+        while True:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "text":
+                if self._live(payload[0]):
+                    pending.append(payload[1])
+            elif kind == "clear":
+                pending.clear()
+                self.text.delete("1.0", "end")
+                self._chars = 0
+            elif kind == "status":
+                if self._live(payload[0]):
+                    status = payload[1]
+            elif kind == "call":
+                self._insert(pending)
+                pending = []
+                fn, args = payload
+                try:
+                    fn(*args)
+                except Exception:
+                    pass
+        self._insert(pending)
+        if status is not None:
+            self.status_var.set(status)
+
+    def _live(self, run_id: Optional[int]) -> bool:
+        return run_id is None or run_id == self.run_id
+
+    def _insert(self, chunks: List[str]) -> None:
+        if not chunks:
+            return
+        data = "".join(chunks)
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.insert("end", data)
+        self._chars += len(data)
+        if self.max_chars and self._chars > self.max_chars:
+            excess = self._chars - self.max_chars
+            self.text.delete("1.0", f"1.0 + {excess} chars")
+            self._chars -= excess
+        if at_bottom:
+            self.text.see("end")
+
+
+class LMStudioTunerGUI:
+    # Cap on characters kept in the output pane (None keeps everything)
+    OUTPUT_MAX_CHARS: Optional[int] = None
+    MODEL_REFRESH_MS = 5 * 60 * 1000
+
+    def __init__(self, root: tk.Tk):
+        self.root = root
+        self.root.title("LM Studio Tuner")
+        self.root.geometry("1000x700")
+
+        self._build_ui()
+        self._bind_events()
+
+        # Fill the dropdown from the cached catalog, then refresh in the background
+        models, _ = load_model_catalog(self.endpoint_var.get().strip())
+        if models:
+            self._set_models(models, "cached")
+        self.refresh_models(quiet=True)
+        self.root.after(self.MODEL_REFRESH_MS, self._periodic_model_refresh)
+
+    def _build_ui(self):
+        pad = {"padx": 6, "pady": 4}
+
+        # Connection frame
+        conn = ttk.LabelFrame(self.root, text="Connection")
+        conn.pack(fill="x", **pad)
+        ttk.Label(conn, text="Endpoint").grid(row=0, column=0, sticky="w", **pad)
+        self.endpoint_var = tk.StringVar(value="http://localhost:1234")
+        ttk.Entry(conn, textvariable=self.endpoint_var, width=50).grid(row=0, column=1, sticky="we", **pad, columnspan=3)
+        ttk.Label(conn, text="API Key").grid(row=0, column=4, sticky="e", **pad)
+        self.api_key_var = tk.StringVar(value="")
+        ttk.Entry(conn, textvariable=self.api_key_var, width=30, show="*").grid(row=0, column=5, sticky="we", **pad)
+        self.refresh_btn = ttk.Button(conn, text="Refresh Models", command=lambda: self.refresh_models())
+        self.refresh_btn.grid(row=0, column=6, **pad)
+        self.profile_btn = ttk.Button(conn, text="Profile load", command=self.start_load_profile)
+        self.profile_btn.grid(row=0, column=7, **pad)
+        conn.grid_columnconfigure(1, weight=1)
+
+        # Model + presets frame
+        mdl = ttk.LabelFrame(self.root, text="Model & Presets")
+        mdl.pack(fill="x", **pad)
+        ttk.Label(mdl, text="Model").grid(row=0, column=0, sticky="w", **pad)
+        self.model_var = tk.StringVar()
+        self.model_combo = ttk.Combobox(mdl, textvariable=self.model_var, values=[], width=50, state="readonly")
+        self.model_combo.grid(row=0, column=1, sticky="we", **pad, columnspan=3)
+
+        ttk.Label(mdl, text="Preset").grid(row=0, column=4, sticky="e", **pad)
+        self.preset_var = tk.StringVar(value="Coding")
+        self.preset_combo = ttk.Combobox(mdl, textvariable=self.preset_var, values=list(PRESETS.keys()), state="readonly", width=18)
+        self.preset_combo.grid(row=0, column=5, sticky="we", **pad)
+        self.apply_preset_btn = ttk.Button(mdl, text="Apply", command=self.apply_preset)
+        self.apply_preset_btn.grid(row=0, column=6, **pad)
+        self.save_preset_btn = ttk.Button(mdl, text="Save", command=self.save_preset_dialog)
+        self.save_preset_btn.grid(row=0, column=7, **pad)
+        self.load_preset_btn = ttk.Button(mdl, text="Load", command=self.load_preset_dialog)
+        self.load_preset_btn.grid(row=0, column=8, **pad)
+        self.manage_preset_btn = ttk.Button(mdl, text="Manage", command=self.open_preset_manager)
+        self.manage_preset_btn.grid(row=0, column=9, **pad)
+        self.autotune_btn = ttk.Button(mdl, text="Auto-tune", command=self.start_autotune)
+        self.autotune_btn.grid(row=0, column=10, **pad)
+        self.load_test_btn = ttk.Button(mdl, text="Load test", command=self.start_load_test)
+        self.load_test_btn.grid(row=0, column=11, **pad)
+        self.compare_btn = ttk.Button(mdl, text="Compare", command=self.open_compare)
+        self.compare_btn.grid(row=0, column=12, **pad)
+        self.history_btn = ttk.Button(mdl, text="History", command=self.open_history)
+        self.history_btn.grid(row=0, column=13, **pad)
+        mdl.grid_columnconfigure(1, weight=1)
+
+        # Parameters frame
+        prm = ttk.LabelFrame(self.root, text="Parameters")
+        prm.pack(fill="x", **pad)
+
+        def add_param(row: int, label: str, var: tk.DoubleVar, from_, to_, resolution, default):
+            ttk.Label(prm, text=label).grid(row=row, column=0, sticky="w", **pad)
+            scale = ttk.Scale(prm, variable=var, from_=from_, to=to_, orient="horizontal")
+            scale.grid(row=row, column=1, sticky="we", **pad)
+            entry = ttk.Entry(prm, textvariable=var, width=8)
+            entry.grid(row=row, column=2, sticky="w", **pad)
+            var.set(default)
+
+        self.temp_var = tk.DoubleVar()
+        self.top_p_var = tk.DoubleVar()
+        self.presence_var = tk.DoubleVar()
+        self.frequency_var = tk.DoubleVar()
+        self.repetition_var = tk.DoubleVar()
+        add_param(0, "temperature", self.temp_var, 0.0, 2.0, 0.01, 0.7)
+        add_param(1, "top_p", self.top_p_var, 0.0, 1.0, 0.01, 0.9)
+        add_param(2, "presence_penalty", self.presence_var, -2.0, 2.0, 0.01, 0.0)
+        add_param(3, "frequency_penalty", self.frequency_var, -2.0, 2.0, 0.01, 0.0)
+        add_param(4, "repetition_penalty", self.repetition_var, 0.5, 1.5, 0.01, 1.05)
+
+        ttk.Label(prm, text="max_tokens").grid(row=0, column=3, sticky="e", **pad)
+        self.max_tokens_var = tk.IntVar(value=800)
+        ttk.Spinbox(prm, from_=16, to=8192, textvariable=self.max_tokens_var, width=8).grid(row=0, column=4, sticky="w", **pad)
+
+        ttk.Label(prm, text="format").grid(row=1, column=3, sticky="e", **pad)
+        self.format_var = tk.StringVar(value="None")
+        self.format_combo = ttk.Combobox(prm, textvariable=self.format_var, values=["None", "Llama 3", "ChatML", "Mistral"], state="readonly", width=10)
+        self.format_combo.grid(row=1, column=4, sticky="w", **pad)
+
+        prm.grid_columnconfigure(1, weight=1)
+
+        # Prompts frame
+        pfrm = ttk.LabelFrame(self.root, text="Prompts")
+        pfrm.pack(fill="both", expand=True, **pad)
+        ttk.Label(pfrm, text="System prompt").grid(row=0, column=0, sticky="w", **pad)
+        self.system_txt = scrolledtext.ScrolledText(pfrm, height=4)
+        self.system_txt.grid(row=1, column=0, columnspan=3, sticky="nsew", **pad)
+        self.system_txt.insert("1.0", DEFAULT_SYSTEM_PROMPT)
+
+        ttk.Label(pfrm, text="User prompt").grid(row=2, column=0, sticky="w", **pad)
+        self.user_txt = scrolledtext.ScrolledText(pfrm, height=8)
+        self.user_txt.grid(row=3, column=0, columnspan=3, sticky="nsew", **pad)
+        self.user_txt.insert("1.0", DEFAULT_USER_PROMPT)
+
+        pfrm.grid_rowconfigure(1, weight=1)
+        pfrm.grid_rowconfigure(3, weight=1)
+        pfrm.grid_columnconfigure(0, weight=1)
+
+        # Actions
+        act = ttk.Frame(self.root)
+        act.pack(fill="x", **pad)
+        self.run_btn = ttk.Button(act, text="Generate", command=self.generate)
+        self.run_btn.pack(side="left")
+        self.stop_btn = ttk.Button(act, text="Stop", command=self.request_stop, state="disabled")
+        self.stop_btn.pack(side="left", padx=6)
+        self.stream_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(act, text="Stream", variable=self.stream_var).pack(side="left", padx=6)
+        self.cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(act, text="Cache (temp 0)", variable=self.cache_var).pack(side="left", padx=6)
+        self.exec_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(act, text="Run code", variable=self.exec_var).pack(side="left", padx=6)
+        ttk.Label(act, text="Best of").pack(side="left", padx=(12, 2))
+        self.best_of_var = tk.IntVar(value=1)
+        ttk.Spinbox(act, from_=1, to=16, textvariable=self.best_of_var, width=4).pack(side="left")
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(act, textvariable=self.status_var).pack(side="right")
+
+        # Output
+        out = ttk.LabelFrame(self.root, text="Output")
+        out.pack(fill="both", expand=True, **pad)
+        self.output_txt = scrolledtext.ScrolledText(out, height=12)
+        self.output_txt.pack(fill="both", expand=True)
+
+        # Internal state
+        self._cancel: Optional[CancelToken] = None
+        self._run_id = 0
+        self._response_cache = ResponseCache()
+        self.ui = UIUpdateQueue(self.root, self.output_txt, self.status_var, max_chars=self.OUTPUT_MAX_CHARS)
+        self._refreshing_models = False
+        # Apply initial preset
+        try:
+            self.apply_preset()
+        except Exception:
+            pass
+
+    def _bind_events(self):
+        self.preset_combo.bind("<<ComboboxSelected>>", lambda e: self.apply_preset())
+
+    def apply_preset(self):
+        preset = PRESETS.get(self.preset_var.get(), {})
+        if not preset:
+            return
+        self.temp_var.set(preset.get("temperature", 0.7))
+        self.top_p_var.set(preset.get("top_p", 0.9))
+        self.presence_var.set(preset.get("presence_penalty", 0.0))
+        self.frequency_var.set(preset.get("frequency_penalty", 0.0))
+        self.repetition_var.set(preset.get("repetition_penalty", 1.05))
+        self.status_var.set(f"Applied preset: {self.preset_var.get()}")
+
+    def _collect_params(self) -> Optional[RequestParams]:
+        endpoint = self.endpoint_var.get().strip()
+        api_key = self.api_key_var.get().strip()
+        model = self.model_var.get().strip()
+        if not endpoint:
+            messagebox.showerror("Validation", "Endpoint is required")
+            return None
+        if not model:
+            messagebox.showerror("Validation", "Model is required (click Refresh Models)")
+            return None
+        return RequestParams(
+            endpoint=endpoint,
+            api_key=api_key,
+            model=model,
+            temperature=float(self.temp_var.get()),
+            top_p=float(self.top_p_var.get()),
+            presence_penalty=float(self.presence_var.get()),
+            frequency_penalty=float(self.frequency_var.get()),
+            repetition_penalty=float(self.repetition_var.get()),
+            max_tokens=int(self.max_tokens_var.get()),
+            format_type=self.format_var.get(),
+            system_prompt=self.system_txt.get("1.0", "end").strip(),
+            user_prompt=self.user_txt.get("1.0", "end").strip(),
+        )
+
+    def _set_models(self, models: List[str], source: str) -> None:
+        self.model_combo.configure(values=models)
+        if models and not self.model_var.get():
+            self.model_var.set(models[0])
+        self.status_var.set(f"Loaded {len(models)} models ({source})")
+
+    def refresh_models(self, quiet: bool = False):
+        """Fetch /v1/models on a worker thread; `quiet` reports failures in the status bar only."""
+        endpoint = self.endpoint_var.get().strip()
+        if not endpoint or self._refreshing_models:
+            return
+        self._refreshing_models = True
+        if not quiet:
+            self.status_var.set("Fetching models...")
+        api_key = self.api_key_var.get().strip()
+        threading.Thread(target=self._do_refresh_models, args=(endpoint, api_key, quiet), daemon=True).start()
+
+    def _do_refresh_models(self, endpoint: str, api_key: str, quiet: bool):
+        ui = self.ui
+        try:
+            models = fetch_models(endpoint, api_key)
+            save_model_catalog(endpoint, models)
+            ui.call(self._set_models, models, "live")
+        except Exception as e:
+            ui.set_status("Model fetch failed")
+            if not quiet:
+                ui.call(messagebox.showerror, "Models", f"Failed to fetch models: {e}")
+        finally:
+            ui.call(setattr, self, "_refreshing_models", False)
+
+    def _periodic_model_refresh(self):
+        self.refresh_models(quiet=True)
+        self.root.after(self.MODEL_REFRESH_MS, self._periodic_model_refresh)
+
+    def start_load_profile(self):
+        endpoint = self.endpoint_var.get().strip()
+        models = list(self.model_combo.cget("values") or [])
+        if not endpoint or not models:
+            messagebox.showerror("Profile load", "Refresh models first")
+            return
+        if not messagebox.askyesno("Profile load", f"Profile all {len(models)} models?\n"
+                                   "No profiles only the selected model."):
+            selected = self.model_var.get().strip()
+            # Keep a second model around to swap away from the selected one
+            models = [selected] + [m for m in models if m != selected][:1]
+        self.profile_btn.configure(state="disabled")
+        self.ui.clear_text()
+        self.ui.set_status("Profiling model load times...")
+        args = (endpoint, self.api_key_var.get().strip(), models)
+        threading.Thread(target=self._do_load_profile, args=args, daemon=True).start()
+
+    def _do_load_profile(self, endpoint: str, api_key: str, models: List[str]):
+        ui = self.ui
+        try:
+            results = profile_model_load(endpoint, api_key, models,
+                                         on_result=lambda p: ui.append_text(format_load_profile(p) + "\n"))
+            ok = [p for p in results if not p.error]
+            failed = f", {len(results) - len(ok)} failed" if len(ok) < len(results) else ""
+            worst = max(ok, key=lambda p: p.swap_cost) if ok else None
+            ui.set_status(f"Profiled {len(ok)} models{failed}; worst swap cost {worst.swap_cost:.2f}s ({worst.model})"
+                          if worst else f"Nothing profiled{failed}")
+        except Exception as e:
+            ui.set_status("Profile failed")
+            ui.call(messagebox.showerror, "Profile load", f"Profile failed: {e}")
+        finally:
+            ui.call(self.profile_btn.configure, {"state": "normal"})
+
+    def request_stop(self):
+        token = self._cancel
+        if token is None:
+            return
+        token.cancel()
+        # The worker may take a moment to unwind; free the controls now. Its
+        # updates stay tagged with this run and are dropped once a new run
+        # starts, so its "Stopped after ..." status only shows until then.
+        self._cancel = None
+        self.run_btn.configure(state="normal")
+        self.stop_btn.configure(state="disabled")
+        self.status_var.set("Stopping...")
+
+    def _conn_reuse(self, endpoint: str) -> str:
+        stats = session_stats().get(endpoint.rstrip('/'))
+        if not stats:
+            return "conn -"
+        return f"conn {stats['reused']}/{stats['requests']} reused"
+
+    def _cache_summary(self, cache: Optional[ResponseCache]) -> str:
+        return f" | {cache.summary()}" if cache else ""
+
+    def _cancellations_path(self) -> Path:
+        return Path('.autodev') / 'cancellations.jsonl'
+
+    def _record_cancellation(self, params: RequestParams, partial: str, metrics: StreamMetrics) -> str:
+        saved_toks, saved_secs = metrics.savings(params.max_tokens)
+        try:
+            append_jsonl(self._cancellations_path(), {
+                "ts": time.time(),
+                "model": params.model,
+                "max_tokens": params.max_tokens,
+                "tokens": metrics.tokens,
+                "elapsed": round(metrics.total, 3),
+                "decode_tps": round(metrics.decode_tps, 2),
+                "saved_tokens": saved_toks,
+                "saved_seconds": round(saved_secs, 2),
+                "partial_output": partial,
+            })
+        except OSError:
+            pass
+        return f"Stopped after {metrics.tokens} toks / {metrics.total:.2f}s | saved ~{saved_toks} toks, ~{saved_secs:.1f}s of decode"
+
+    def _finish_run(self, run_id: int) -> None:
+        if run_id == self._run_id:
+            self._cancel = None
+            self.run_btn.configure(state="normal")
+            self.stop_btn.configure(state="disabled")
+
+    def _run_code(self, content: str) -> Tuple[Dict[str, Any], str]:
+        """Sandboxed execution of the response's code: (history fields, status suffix)."""
+        result = code_executor().run(content)
+        return result.fields(), f" | {format_exec_result(result)}"
+
+    def _do_generate(self, params: RequestParams, run_id: int, token: CancelToken,
+                     stream: bool, cache: Optional[ResponseCache], preset: str, run_code: bool = False):
+        """Worker thread: all UI changes go through self.ui."""
+        ui = self.ui
+        quality: Dict[str, Any] = {}
+        code_status = ""
+        history: Optional[RunHistory] = None
+
+        try:
+            history = run_history()
+            if stream:
+                def on_text(text: str) -> None:
+                    ui.append_text(text, run_id)
+
+                content, metrics = cached_chat_completion(params, cache, on_text, cancel=token)
+                if run_code and not metrics.cancelled:
+                    ui.set_status("Running code...", run_id)
+                    quality, code_status = self._run_code(content)
+                history.record(history_row(params, preset, "gui", content, metrics,
+                                           error="cancelled" if metrics.cancelled else "", **quality))
+                if metrics.cancelled:
+                    ui.set_status(self._record_cancellation(params, content, metrics), run_id)
+                else:
+                    ui.set_status(f"{metrics.summary()} | {self._conn_reuse(params.endpoint)}{self._cache_summary(cache)}{code_status}",
+                                  run_id)
+            else:
+                entry = cache.get(params) if cache and cache.cacheable(params) else None
+                if entry is not None:
+                    history.record(history_row(params, preset, "gui", entry.get("content", ""), cached=True,
+                                               tokens=entry.get("completion_tokens", 0)))
+                    ui.append_text(entry.get("content", ""), run_id)
+                    ui.set_status(f"Cache hit | {entry.get('completion_tokens', 0)} toks{self._cache_summary(cache)}", run_id)
+                    return
+                url = f"{params.endpoint.rstrip('/')}/v1/chat/completions"
+                payload = build_payload(params)
+
+                t0 = time.time()
+                try:
+                    # Headers only arrive with the finished completion; bind()
+                    # lets Stop shut the socket while the server is still decoding.
+                    with token.bind():
+                        resp = get_session(params.endpoint).post(url, json=payload, headers=build_headers(params.api_key), timeout=300)
+                    resp.raise_for_status()
+                    data = resp.json()
+                except Exception as e:
+                    if token.cancelled:
+                        history.record(history_row(params, preset, "gui", latency_s=time.time() - t0, error="cancelled"))
+                        ui.set_status(f"Stopped after {time.time() - t0:.2f}s; the server dropped the request", run_id)
+                        return
+                    STATS.record_failure(error_kind(e))
+                    raise
+                t1 = time.time()
+                content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+                elapsed = t1 - t0
+                counts = resolve_usage(data.get("usage"), payload, content)
+                tps = counts.completion_tokens / max(elapsed, 1e-6)
+                # tps includes prefill; the tokensPerSecond histogram is decode-only
+                STATS.record_success(elapsed, counts.completion_tokens)
+                if cache and cache.cacheable(params):
+                    cache.put(params, content, counts)
+                ui.append_text(content, run_id)
+                if run_code and not token.cancelled:
+                    ui.set_status("Running code...", run_id)
+                    quality, code_status = self._run_code(content)
+                history.record(history_row(
+                    params, preset, "gui", content, latency_s=elapsed, decode_tps=tps,
+                    prompt_tokens=counts.prompt_tokens, tokens=counts.completion_tokens,
+                    token_source=counts.source, cached=False, **quality))
+
+                ui.set_status(
+                    f"Done in {elapsed:.2f}s | prompt {counts.prompt_tokens} / completion {counts.completion_tokens} toks "
+                    f"[{counts.source}] | {tps:.1f} tok/s end-to-end | {self._conn_reuse(params.endpoint)}{self._cache_summary(cache)}"
+                    f"{code_status}", run_id
+                )
+
+        except Exception as e:
+            if history is not None:
+                try:
+                    history.record(history_row(params, preset, "gui", error=str(e)))
+                except Exception:
+                    pass
+            if run_id == self._run_id and not token.cancelled:
+                ui.set_status("Error", run_id)
+                ui.call(messagebox.showerror, "Generate", f"Request failed: {e}")
+        finally:
+            ui.call(self._finish_run, run_id)
+
+    def generate(self):
+        params = self._collect_params()
+        if not params:
+            return
+        self._run_id += 1
+        self.ui.run_id = self._run_id
+        token = CancelToken()
+        self._cancel = token
+        self.run_btn.configure(state="disabled")
+        self.stop_btn.configure(state="normal")
+        self.ui.clear_text()
+        self.ui.set_status("Generating...")
+        cache = self._response_cache if self.cache_var.get() else None
+        try:
+            best_of = int(self.best_of_var.get())
+        except (tk.TclError, ValueError):
+            best_of = 1
+        if best_of > 1:
+            threading.Thread(target=self._do_best_of_n, daemon=True,
+                             args=(params, self._run_id, token, best_of, self.preset_var.get(),
+                                   self.exec_var.get())).start()
+            return
+        # Run in a thread to keep UI responsive
+        threading.Thread(target=self._do_generate, daemon=True,
+                         args=(params, self._run_id, token, self.stream_var.get(), cache,
+                               self.preset_var.get(), self.exec_var.get())).start()
+
+    def _do_best_of_n(self, params: RequestParams, run_id: int, token: CancelToken, n: int, preset: str,
+                      run_code: bool = False):
+        """Worker thread: best-of-N always streams; only the winner is shown.
+        With Run code, candidates are scored by executing their code."""
+        ui = self.ui
+        done = 0
+
+        def on_update(c: Candidate) -> None:
+            nonlocal done
+            done += 1
+            ui.set_status(f"Best of {n}: {done}/{n} settled, #{c.index + 1} {c.status}", run_id)
+
+        try:
+            result = run_best_of_n(params, n, exec_score if run_code else default_score,
+                                   cancel=token, on_update=on_update,
+                                   history=run_history(), preset=preset)
+            best = result.best
+            if best is None:
+                ui.set_status(f"Best of {n}: no candidate finished", run_id)
+                ui.append_text(format_best_of_n(result), run_id)
+                return
+            ui.append_text(best.text + "\n\n" + "-" * 60 + "\n" + format_best_of_n(result), run_id)
+            added = f" | +{result.added_latency:.2f}s vs one sample" if result.added_latency is not None else ""
+            ui.set_status(f"Best of {n} ({result.mode}): #{best.index + 1} score {best.score:.2f}{added} | "
+                          f"GPU {result.gpu_time:.1f}s | {best.metrics.summary()}", run_id)
+        except Exception as e:
+            if run_id == self._run_id:
+                ui.set_status("Error", run_id)
+                ui.call(messagebox.showerror, "Best of N", f"Request failed: {e}")
+        finally:
+            ui.call(self._finish_run, run_id)
+
+    # ===== Auto-tune =====
+    def start_autotune(self):
+        params = self._collect_params()
+        if not params:
+            return
+        budget = simpledialog.askfloat("Auto-tune", "Latency budget per generation (seconds):",
+                                       initialvalue=30.0, minvalue=1.0)
+        if not budget:
+            return
+        self.autotune_btn.configure(state="disabled")
+        self.ui.clear_text()
+        threading.Thread(target=self._do_autotune, args=(params, budget), daemon=True).start()
+
+    def _do_autotune(self, params: RequestParams, budget: float):
+        ui = self.ui
+        try:
+            _, front = auto_tune(params, [params.user_prompt], latency_budget=budget,
+                                 on_progress=ui.set_status)
+            if not front:
+                ui.set_status("Auto-tune: no candidate met the latency budget")
+                return
+            names = save_tuned_presets(front, params.model)
+            ui.append_text(format_front(front) + "\n\nSaved presets: " + ", ".join(names))
+            ui.set_status(f"Auto-tune done: {len(front)} Pareto presets saved")
+        except Exception as e:
+            ui.set_status("Auto-tune failed")
+            ui.call(messagebox.showerror, "Auto-tune", f"Auto-tune failed: {e}")
+        finally:
+            ui.call(self.autotune_btn.configure, {"state": "normal"})
+
+    # ===== Load test =====
+    def start_load_test(self):
+        params = self._collect_params()
+        if not params:
+            return
+        max_conc = simpledialog.askinteger("Load test", "Ramp up to how many concurrent sessions?",
+                                           initialvalue=8, minvalue=1, maxvalue=256)
+        if not max_conc:
+            return
+        self.load_test_btn.configure(state="disabled")
+        self.ui.clear_text()
+        threading.Thread(target=self._do_load_test, args=(params, max_conc), daemon=True).start()
+
+    def _do_load_test(self, params: RequestParams, max_conc: int):
+        ui = self.ui
+
+        def on_level(level: LoadLevel) -> None:
+            ui.append_text(format_load_level(level) + "\n")
+            ui.set_status(f"Load test: finished concurrency {level.concurrency}")
+
+        try:
+            levels = asyncio.run(run_load_test(params, ramp_levels(max_conc), on_level=on_level))
+            ui.clear_text()
+            ui.append_text(format_load_report(levels))
+            knee = find_knee(levels)
+            ui.set_status(f"Load test done; knee at concurrency {knee.concurrency}" if knee else "Load test: no successful requests")
+        except Exception as e:
+            ui.set_status("Load test failed")
+            ui.call(messagebox.showerror, "Load test", f"Load test failed: {e}")
+        finally:
+            ui.call(self.load_test_btn.configure, {"state": "normal"})
+
+    # ===== A/B comparison =====
+    def open_compare(self):
+        base = self._collect_params()
+        if not base:
+            return
+        models = list(self.model_combo.cget("values") or []) or [base.model]
+        preset_names = [CURRENT_SETTINGS] + list(PRESETS) + preset_store().names()[:500]
+
+        win = tk.Toplevel(self.root)
+        win.title("Compare")
+        win.geometry("1200x760")
+        pad = {"padx": 4, "pady": 2}
+
+        setup = ttk.Frame(win, padding=(8, 8))
+        setup.pack(fill="x")
+        slot_vars: List[Tuple[tk.StringVar, tk.StringVar, tk.BooleanVar]] = []
+        for i in range(4):
+            enabled = tk.BooleanVar(value=i < 2)
+            model_var = tk.StringVar(value=models[min(i, len(models) - 1)])
+            preset_var = tk.StringVar(value=CURRENT_SETTINGS)
+            ttk.Checkbutton(setup, text=f"Slot {i + 1}", variable=enabled).grid(row=i, column=0, sticky="w", **pad)
+            ttk.Combobox(setup, textvariable=model_var, values=models, width=40, state="readonly").grid(row=i, column=1, **pad)
+            ttk.Combobox(setup, textvariable=preset_var, values=preset_names, width=28, state="readonly").grid(row=i, column=2, **pad)
+            slot_vars.append((model_var, preset_var, enabled))
+        ttk.Label(setup, text="Trials").grid(row=0, column=3, sticky="e", **pad)
+        trials_var = tk.IntVar(value=1)
+        ttk.Spinbox(setup, from_=1, to=20, textvariable=trials_var, width=5).grid(row=0, column=4, sticky="w", **pad)
+        sequential_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(setup, text="Sequential (rotating order)", variable=sequential_var).grid(row=1, column=3, columnspan=2, sticky="w", **pad)
+        run_btn = ttk.Button(setup, text="Run")
+        run_btn.grid(row=2, column=3, columnspan=2, sticky="we", **pad)
+        status_var = tk.StringVar(value="Pick 2-4 slots and press Run")
+        ttk.Label(setup, textvariable=status_var).grid(row=3, column=3, columnspan=3, sticky="w", **pad)
+
+        panes = ttk.Frame(win)
+        panes.pack(fill="both", expand=True, padx=8)
+        bottom = ttk.Frame(win)
+        bottom.pack(fill="both", expand=True, padx=8, pady=(4, 8))
+        table = ttk.Treeview(bottom, columns=("runs", "ttft", "tps", "chars", "sim"), height=4)
+        for col, title, width in (("#0", "Slot", 380), ("runs", "Runs", 60), ("ttft", "TTFT p50", 90),
+                                  ("tps", "tok/s p50", 90), ("chars", "Chars", 80), ("sim", "Sim vs 1", 80)):
+            table.heading(col, text=title)
+            table.column(col, width=width, stretch=(col == "#0"))
+        table.pack(fill="x")
+        diff_txt = scrolledtext.ScrolledText(bottom, height=10)
+        diff_txt.pack(fill="both", expand=True, pady=(4, 0))
+
+        def run():
+            chosen = [(m.get(), p.get()) for m, p, on in slot_vars if on.get() and m.get()]
+            if not 2 <= len(chosen) <= 4:
+                messagebox.showerror("Compare", "Enable 2-4 slots", parent=win)
+                return
+            try:
+                slots = [CompareSlot(f"{i + 1}. {m} | {p}", slot_params(base, m, p), p) for i, (m, p) in enumerate(chosen)]
+            except KeyError as e:
+                messagebox.showerror("Compare", str(e), parent=win)
+                return
+            for child in panes.winfo_children():
+                child.destroy()
+            queues = []
+            for i, slot in enumerate(slots):
+                box = ttk.LabelFrame(panes, text=slot.label)
+                box.grid(row=0, column=i, sticky="nsew", padx=2)
+                panes.grid_columnconfigure(i, weight=1, uniform="pane")
+                txt = scrolledtext.ScrolledText(box, height=14, wrap="word")
+                txt.pack(fill="both", expand=True)
+                queues.append(UIUpdateQueue(win, txt, status_var))
+            panes.grid_rowconfigure(0, weight=1)
+            table.delete(*table.get_children())
+            diff_txt.delete("1.0", "end")
+            run_btn.configure(state="disabled")
+            threading.Thread(target=worker, args=(slots, queues, trials_var.get(), sequential_var.get()), daemon=True).start()
+
+        def worker(slots: List[CompareSlot], queues: List[UIUpdateQueue], trials: int, sequential: bool):
+            ui = queues[0]
+
+            def on_trial(t: int, order: List[int]) -> None:
+                for q in queues:
+                    q.clear_text()
+                ui.set_status(f"Trial {t + 1}/{trials}, start order {[o + 1 for o in order]}")
+
+            try:
+                run_comparison(slots, trials=trials, concurrent=not sequential,
+                               on_text=lambda i, chunk: queues[i].append_text(chunk), on_trial=on_trial,
+                               history=run_history())
+                ui.call(show_results, slots)
+                ui.set_status("Done")
+            except Exception as e:
+                ui.set_status(f"Compare failed: {e}")
+            finally:
+                ui.call(run_btn.configure, {"state": "normal"})
+
+        def show_results(slots: List[CompareSlot]):
+            base_out = slots[0].output
+            for i, slot in enumerate(slots):
+                sim = "-" if i == 0 else f"{similarity(base_out, slot.output):.2f}"
+                table.insert("", "end", text=slot.label, values=(
+                    f"{len(slot.runs)} ({len(slot.errors)} err)", f"{slot.ttft_p50:.2f}s",
+                    f"{slot.tps_p50:.1f}", len(slot.output), sim))
+            diff_txt.insert("end", "\n\n".join(
+                compare_diff(base_out, slot.output, slots[0].label, slot.label) for slot in slots[1:]))
+
+        run_btn.configure(command=run)
+
+    # ===== Run history =====
+    HISTORY_BUCKETS = {"Hour": 3600, "Day": 86400, "Week": 7 * 86400}
+    HISTORY_METRICS = {"TTFT p50 (s)": "ttft_s", "Latency p50 (s)": "latency_s", "Decode tok/s p50": "decode_tps"}
+
+    def open_history(self):
+        history = run_history()
+        win = tk.Toplevel(self.root)
+        win.title("Run history")
+        win.geometry("1100x760")
+        pad = {"padx": 4, "pady": 2}
+
+        bar = ttk.Frame(win, padding=(8, 8))
+        bar.pack(fill="x")
+        model_var = tk.StringVar(value="")
+        preset_var = tk.StringVar(value="")
+        source_var = tk.StringVar(value="")
+        days_var = tk.IntVar(value=30)
+        bucket_var = tk.StringVar(value="Day")
+        metric_var = tk.StringVar(value="TTFT p50 (s)")
+        ttk.Label(bar, text="Model").pack(side="left", **pad)
+        model_combo = ttk.Combobox(bar, textvariable=model_var, width=32, state="readonly")
+        model_combo.pack(side="left", **pad)
+        ttk.Label(bar, text="Preset").pack(side="left", **pad)
+        preset_combo = ttk.Combobox(bar, textvariable=preset_var, width=18, state="readonly")
+        preset_combo.pack(side="left", **pad)
+        ttk.Label(bar, text="Source").pack(side="left", **pad)
+        ttk.Combobox(bar, textvariable=source_var, values=["", "gui", "sweep", "compare", "bestofn", "replay", "dataset"], width=8,
+                     state="readonly").pack(side="left", **pad)
+        ttk.Label(bar, text="Days").pack(side="left", **pad)
+        ttk.Spinbox(bar, from_=1, to=3650, textvariable=days_var, width=5).pack(side="left", **pad)
+        ttk.Combobox(bar, textvariable=bucket_var, values=list(self.HISTORY_BUCKETS), width=6,
+                     state="readonly").pack(side="left", **pad)
+        ttk.Combobox(bar, textvariable=metric_var, values=list(self.HISTORY_METRICS), width=16,
+                     state="readonly").pack(side="left", **pad)
+
+        chart = tk.Canvas(win, height=260, background="white")
+        chart.pack(fill="x", padx=8)
+        runs = ttk.Treeview(win, columns=("ts", "source", "preset", "latency", "ttft", "tps", "tokens"), height=10)
+        for col, title, width in (("#0", "Model", 260), ("ts", "When", 140), ("source", "Source", 70),
+                                  ("preset", "Preset", 120), ("latency", "Latency", 80), ("ttft", "TTFT", 70),
+                                  ("tps", "tok/s", 70), ("tokens", "Tokens", 70)):
+            runs.heading(col, text=title)
+            runs.column(col, width=width, stretch=(col == "#0"))
+        runs.pack(fill="both", expand=True, padx=8, pady=(6, 0))
+        detail = scrolledtext.ScrolledText(win, height=8, wrap="word")
+        detail.pack(fill="both", padx=8, pady=(4, 8))
+
+        def draw(trend: List[Dict[str, Any]], key: str, title: str):
+            chart.delete("all")
+            w, h = max(chart.winfo_width(), 400), int(chart.cget("height"))
+            left, right, top, bottom = 60, 20, 20, 30
+            points = [(b["bucket"], b[key]) for b in trend if b.get(key) is not None]
+            if not points:
+                chart.create_text(w / 2, h / 2, text="No successful runs in range")
+                return
+            xs, ys = [p[0] for p in points], [p[1] for p in points]
+            x0, x1 = min(xs), max(xs) if max(xs) > min(xs) else min(xs) + 1
+            y0, y1 = 0.0, max(ys) * 1.1 or 1.0
+
+            def sx(x: float) -> float:
+                return left + (x - x0) / (x1 - x0) * (w - left - right)
+
+            def sy(y: float) -> float:
+                return h - bottom - (y - y0) / (y1 - y0) * (h - top - bottom)
+
+            chart.create_line(left, top, left, h - bottom, w - right, h - bottom)
+            for frac in (0, 0.5, 1):
+                y = y0 + frac * (y1 - y0)
+                chart.create_text(left - 6, sy(y), text=f"{y:.2f}", anchor="e")
+            for x in sorted({x0, xs[-1]}):
+                chart.create_text(sx(x), h - bottom + 12, text=time.strftime("%Y-%m-%d %H:%M", time.localtime(x)))
+            coords = [c for x, y in points for c in (sx(x), sy(y))]
+            if len(points) > 1:
+                chart.create_line(*coords, fill="#1f77b4", width=2)
+            for x, y in points:
+                chart.create_oval(sx(x) - 3, sy(y) - 3, sx(x) + 3, sy(y) + 3, fill="#1f77b4", outline="")
+            chart.create_text(left + 4, top - 8, text=title, anchor="w")
+
+        def refresh(*_):
+            model_combo.configure(values=[""] + history.models())
+            preset_combo.configure(values=[""] + history.presets())
+            since = time.time() - days_var.get() * 86400
+            filters = dict(model=model_var.get() or None, preset=preset_var.get() or None,
+                           source=source_var.get() or None, since=since)
+            key = self.HISTORY_METRICS[metric_var.get()]
+            draw(history.trend(bucket_s=self.HISTORY_BUCKETS[bucket_var.get()], **filters), key, metric_var.get())
+            runs.delete(*runs.get_children())
+            for r in history.query(limit=500, **filters):
+                when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["ts"]))
+                if r["ok"]:
+                    values = (when, r["source"], r["preset"], f"{r['latency_s'] or 0:.2f}s",
+                              f"{r['ttft_s']:.2f}s" if r["ttft_s"] is not None else "-",
+                              f"{r['decode_tps'] or 0:.1f}", r["tokens"] or 0)
+                else:
+                    values = (when, r["source"], r["preset"], r["error"][:40], "", "", "")
+                runs.insert("", "end", iid=str(r["id"]), text=r["model"], values=values)
+
+        def show_run(_event=None):
+            sel = runs.selection()
+            if not sel:
+                return
+            rec = history.output(int(sel[0]))
+            detail.delete("1.0", "end")
+            detail.insert("end", json.dumps(rec.get("params", {}), indent=2) + "\n\n" + rec.get("output", ""))
+
+        for var in (model_var, preset_var, source_var, bucket_var, metric_var):
+            var.trace_add("write", refresh)
+        ttk.Button(bar, text="Refresh", command=refresh).pack(side="left", **pad)
+        runs.bind("<<TreeviewSelect>>", show_run)
+        chart.bind("<Configure>", refresh)
+        refresh()
+
+    # ===== Preset Save/Load =====
+    def _gather_current_settings(self) -> Dict[str, Any]:
+        return {
+            "temperature": float(self.temp_var.get()),
+            "top_p": float(self.top_p_var.get()),
+            "presence_penalty": float(self.presence_var.get()),
+            "frequency_penalty": float(self.frequency_var.get()),
+            "repetition_penalty": float(self.repetition_var.get()),
+            "max_tokens": int(self.max_tokens_var.get()),
+            "format_type": self.format_var.get(),
+            "system_prompt": self.system_txt.get("1.0", "end").strip(),
+            "user_prompt": self.user_txt.get("1.0", "end").strip(),
+        }
+
+    def _apply_settings(self, data: Dict[str, Any]) -> None:
+        try:
+            if "temperature" in data: self.temp_var.set(float(data["temperature"]))
+            if "top_p" in data: self.top_p_var.set(float(data["top_p"]))
+            if "presence_penalty" in data: self.presence_var.set(float(data["presence_penalty"]))
+            if "frequency_penalty" in data: self.frequency_var.set(float(data["frequency_penalty"]))
+            if "repetition_penalty" in data: self.repetition_var.set(float(data["repetition_penalty"]))
+            if "max_tokens" in data: self.max_tokens_var.set(int(data["max_tokens"]))
+            if "format_type" in data: self.format_var.set(str(data["format_type"]))
+            if "system_prompt" in data: self.system_txt.delete("1.0", "end"); self.system_txt.insert("1.0", str(data["system_prompt"]))
+            if "user_prompt" in data: self.user_txt.delete("1.0", "end"); self.user_txt.insert("1.0", str(data["user_prompt"]))
+            self.status_var.set("Preset applied")
+        except Exception as e:
+            messagebox.showerror("Preset", f"Failed to apply preset: {e}")
+
+    def save_preset_dialog(self):
+        name = simpledialog.askstring("Save Preset", "Preset name:")
+        if not name:
+            return
+        try:
+            store = preset_store()
+            settings = self._gather_current_settings()
+            model = self.model_var.get().strip()
+            if model:
+                settings["model"] = model
+            previous = store.get(name) or {}
+            if previous.get("tags"):
+                settings["tags"] = previous["tags"]
+            store.put(name, settings)
+            self.status_var.set(f"Saved preset: {name}")
+        except Exception as e:
+            messagebox.showerror("Save Preset", f"Failed to save preset: {e}")
+
+    def load_preset_dialog(self):
+        try:
+            store = preset_store()
+            if not len(store):
+                messagebox.showinfo("Load Preset", "No presets found.")
+                return
+            names = store.names()
+            shown = ", ".join(names[:50]) + (f", ... ({len(names) - 50} more, see Manage)" if len(names) > 50 else "")
+            name = simpledialog.askstring("Load Preset", f"Enter preset name to load:\nAvailable: {shown}")
+            if not name:
+                return
+            settings = store.get(name)
+            if settings is None:
+                messagebox.showerror("Load Preset", f"Preset not found: {name}")
+                return
+            self._apply_settings(settings)
+        except Exception as e:
+            messagebox.showerror("Load Preset", f"Failed to load preset: {e}")
+
+    # ===== Preset Manager (search/apply/rename/delete/tags/history) =====
+    MANAGER_LIST_LIMIT = 2000
+
+    def open_preset_manager(self):
+        try:
+            store = preset_store()
+        except Exception as e:
+            messagebox.showerror("Preset Manager", f"Failed to load presets: {e}")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("Preset Manager")
+        win.geometry("620x420")
+
+        frame = ttk.Frame(win, padding=(8, 8))
+        frame.pack(fill="both", expand=True)
+
+        filters = ttk.Frame(frame)
+        filters.pack(fill="x")
+        ttk.Label(filters, text="Search").pack(side="left")
+        query_var = tk.StringVar()
+        ttk.Entry(filters, textvariable=query_var, width=24).pack(side="left", padx=4)
+        ttk.Label(filters, text="Tag").pack(side="left")
+        tag_var = tk.StringVar()
+        tag_combo = ttk.Combobox(filters, textvariable=tag_var, width=12, state="readonly")
+        tag_combo.pack(side="left", padx=4)
+        ttk.Label(filters, text="Model").pack(side="left")
+        model_var = tk.StringVar()
+        model_combo = ttk.Combobox(filters, textvariable=model_var, width=18, state="readonly")
+        model_combo.pack(side="left", padx=4)
+
+        count_var = tk.StringVar()
+        ttk.Label(frame, textvariable=count_var).pack(anchor="w")
+        listbox = tk.Listbox(frame, height=10)
+        listbox.pack(fill="both", expand=True)
+
+        btns = ttk.Frame(frame)
+        btns.pack(fill="x", pady=6)
+
+        def refresh_list():
+            tag_combo.configure(values=[""] + store.tags())
+            model_combo.configure(values=[""] + store.models())
+            matches = store.search(query_var.get(), tag=tag_var.get() or None, model=model_var.get() or None)
+            listbox.delete(0, "end")
+            shown = matches[:self.MANAGER_LIST_LIMIT]
+            if shown:
+                listbox.insert("end", *shown)
+            more = f" (showing first {len(shown)})" if len(matches) > len(shown) else ""
+            count_var.set(f"{len(matches)} of {len(store)} presets{more}")
+
+        def poll_external_changes():
+            if not win.winfo_exists():
+                return
+            try:
+                if store.reload_if_changed():
+                    refresh_list()
+            except Exception:
+                pass
+            win.after(2000, poll_external_changes)
+
+        query_var.trace_add("write", lambda *_: refresh_list())
+        tag_combo.bind("<<ComboboxSelected>>", lambda e: refresh_list())
+        model_combo.bind("<<ComboboxSelected>>", lambda e: refresh_list())
+
+        def get_selected_name() -> Optional[str]:
+            try:
+                idx = listbox.curselection()
+                if not idx:
+                    return None
+                return listbox.get(idx[0])
+            except Exception:
+                return None
+
+        def apply_selected():
+            name = get_selected_name()
+            if not name:
+                return
+            self._apply_settings(store.get(name) or {})
+
+        def rename_selected():
+            name = get_selected_name()
+            if not name:
+                return
+            new_name = simpledialog.askstring("Rename Preset", f"Rename '{name}' to:", parent=win)
+            if not new_name or new_name == name:
+                return
+            try:
+                store.rename(name, new_name)
+                refresh_list()
+            except PresetStoreError as e:
+                messagebox.showerror("Preset Manager", str(e))
+            except Exception as e:
+                messagebox.showerror("Preset Manager", f"Failed to rename: {e}")
+
+        def delete_selected():
+            name = get_selected_name()
+            if not name:
+                return
+            if not messagebox.askyesno("Delete Preset", f"Delete preset '{name}'?"):
+                return
+            try:
+                store.delete(name)
+                refresh_list()
+            except Exception as e:
+                messagebox.showerror("Preset Manager", f"Failed to delete: {e}")
+
+        def tag_selected():
+            name = get_selected_name()
+            if not name:
+                return
+            current = ", ".join((store.get(name) or {}).get("tags") or [])
+            value = simpledialog.askstring("Tags", f"Comma-separated tags for '{name}':", initialvalue=current, parent=win)
+            if value is None:
+                return
+            try:
+                store.set_tags(name, value.split(","))
+                refresh_list()
+            except Exception as e:
+                messagebox.showerror("Preset Manager", f"Failed to tag: {e}")
+
+        def show_history():
+            name = get_selected_name()
+            if not name:
+                return
+            versions = store.history(name)
+            if not versions:
+                messagebox.showinfo("History", f"No recorded history for '{name}'.")
+                return
+            hwin = tk.Toplevel(win)
+            hwin.title(f"History: {name}")
+            hwin.geometry("520x300")
+            hlist = tk.Listbox(hwin)
+            hlist.pack(fill="both", expand=True, padx=8, pady=8)
+            for v in versions:
+                when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(v.get("ts", 0)))
+                hlist.insert("end", f"{when}  {v.get('action')}  {v.get('name')}")
+
+            def restore():
+                idx = hlist.curselection()
+                if not idx:
+                    return
+                try:
+                    store.restore(name, versions[idx[0]])
+                    refresh_list()
+                    hwin.destroy()
+                except Exception as e:
+                    messagebox.showerror("History", f"Failed to restore: {e}")
+
+            ttk.Button(hwin, text="Restore", command=restore).pack(side="left", padx=8, pady=(0, 8))
+            ttk.Button(hwin, text="Close", command=hwin.destroy).pack(side="right", padx=8, pady=(0, 8))
+
+        ttk.Button(btns, text="Apply", command=apply_selected).pack(side="left")
+        ttk.Button(btns, text="Rename", command=rename_selected).pack(side="left", padx=6)
+        ttk.Button(btns, text="Delete", command=delete_selected).pack(side="left")
+        ttk.Button(btns, text="Tags", command=tag_selected).pack(side="left", padx=6)
+        ttk.Button(btns, text="History", command=show_history).pack(side="left")
+        ttk.Button(btns, text="Close", command=win.destroy).pack(side="right")
+
+        refresh_list()
+        poll_external_changes()
+
+
+def run_gui():
+    root = tk.Tk()
+    style = ttk.Style(root)
+    try:
+        style.theme_use("clam")
+    except Exception:
+        pass
+    LMStudioTunerGUI(root)
+    root.mainloop()
@@ -0,0 +1,280 @@
+"""
+Run history for the LM Studio tuner.
+
+Every generation (GUI runs and sweep rows) is appended to a SQLite file
+(``.autodev/history.sqlite``) so latency and throughput can be compared
+across LM Studio upgrades or driver changes without re-benchmarking:
+
+- rows are only ever inserted; the oldest are dropped once the table
+  exceeds ``max_rows`` so the file stays bounded
+- indexed by timestamp, model and preset, so filtered queries and trend
+  buckets do not scan the whole table
+- outputs are stored zlib-compressed and only loaded on request
+
+Row keys follow the sweep JSONL/CSV columns (``latency_s``, ``ttft_s``,
+``decode_tps``, ``tokens``, ``score``, ``exec_ok``, ``runaway``, ...) plus
+``source``, ``prompt_hash``, ``params`` (dict) and ``output``;
+history_row() builds one from a request and its StreamMetrics. Columns added later are created on
+open, so older files keep working.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .formatting import RequestParams, build_payload, prompt_text
+from .metrics import StreamMetrics, percentile
+
+COLUMNS = [
+    "ts", "source", "model", "preset", "format", "prompt_hash", "ok", "error",
+    "latency_s", "ttft_s", "prefill_s", "decode_tps", "prompt_tokens", "tokens",
+    "token_source", "cached", "output_chars", "score", "exec_ok", "exec_runtime_s",
+    "finish_reason", "runaway", "runaway_saved",
+]
+TREND_METRICS = ("ttft_s", "latency_s", "decode_tps")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    source TEXT,
+    model TEXT,
+    preset TEXT,
+    format TEXT,
+    prompt_hash TEXT,
+    ok INTEGER,
+    error TEXT,
+    latency_s REAL,
+    ttft_s REAL,
+    prefill_s REAL,
+    decode_tps REAL,
+    prompt_tokens INTEGER,
+    tokens INTEGER,
+    token_source TEXT,
+    cached INTEGER,
+    output_chars INTEGER,
+    score REAL,
+    exec_ok INTEGER,
+    exec_runtime_s REAL,
+    finish_reason TEXT,
+    runaway TEXT,
+    runaway_saved INTEGER,
+    params TEXT,
+    output BLOB
+);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE INDEX IF NOT EXISTS runs_model_ts ON runs (model, ts);
+CREATE INDEX IF NOT EXISTS runs_preset_ts ON runs (preset, ts);
+"""
+
+_ADDED_COLUMNS = (("score", "REAL"), ("exec_ok", "INTEGER"), ("exec_runtime_s", "REAL"),
+                  ("finish_reason", "TEXT"), ("runaway", "TEXT"), ("runaway_saved", "INTEGER"))
+
+
+class RunHistory:
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: Path, max_rows: int = 100_000):
+        self.path = Path(path)
+        self.max_rows = max_rows
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._since_prune = 0
+        self._prune()
+
+    def _migrate(self) -> None:
+        """Add columns introduced after a database file was created."""
+        existing = {r[1] for r in self._conn.execute("PRAGMA table_info(runs)")}
+        for col, kind in _ADDED_COLUMNS:
+            if col not in existing:
+                self._conn.execute(f"ALTER TABLE runs ADD COLUMN {col} {kind}")
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ----- writing -----
+
+    def record(self, row: Dict[str, Any]) -> int:
+        return self.record_many([row])[-1]
+
+    def record_many(self, rows: Iterable[Dict[str, Any]]) -> List[int]:
+        ids = []
+        cols = COLUMNS + ["params", "output"]
+        sql = f"INSERT INTO runs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        with self._lock, self._conn:
+            for row in rows:
+                values = [row.get(c) for c in COLUMNS]
+                params = row.get("params")
+                output = row.get("output")
+                values.append(json.dumps(params, sort_keys=True) if params is not None else None)
+                values.append(zlib.compress(output.encode("utf-8")) if output else None)
+                ids.append(self._conn.execute(sql, values).lastrowid)
+            self._since_prune += len(ids)
+        if self._since_prune >= self.PRUNE_EVERY:
+            self._prune()
+        return ids
+
+    def _prune(self) -> None:
+        with self._lock, self._conn:
+            self._since_prune = 0
+            self._conn.execute(
+                "DELETE FROM runs WHERE id <= (SELECT MAX(id) FROM runs) - ?", (self.max_rows,))
+
+    # ----- reading -----
+
+    @staticmethod
+    def _where(model: Optional[str], preset: Optional[str], source: Optional[str],
+               since: Optional[float], until: Optional[float]):
+        clauses, args = [], []
+        for col, value in (("model", model), ("preset", preset), ("source", source)):
+            if value:
+                clauses.append(f"{col} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def query(self, model: Optional[str] = None, preset: Optional[str] = None,
+              source: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: Optional[int] = 500) -> List[Dict[str, Any]]:
+        """Matching runs, newest first, without params/output (see output())."""
+        where, args = self._where(model, preset, source, since, until)
+        sql = f"SELECT id, {', '.join(COLUMNS)} FROM runs{where} ORDER BY ts DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, args)]
+
+    def output(self, run_id: int) -> Dict[str, Any]:
+        """Params and decompressed output of one run."""
+        with self._lock:
+            r = self._conn.execute("SELECT params, output FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if r is None:
+            return {}
+        return {
+            "params": json.loads(r["params"]) if r["params"] else {},
+            "output": zlib.decompress(r["output"]).decode("utf-8") if r["output"] else "",
+        }
+
+    def _distinct(self, col: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT DISTINCT {col} FROM runs WHERE {col} IS NOT NULL ORDER BY {col}")
+            return [r[0] for r in rows]
+
+    def models(self) -> List[str]:
+        return self._distinct("model")
+
+    def presets(self) -> List[str]:
+        return self._distinct("preset")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def trend(self, model: Optional[str] = None, preset: Optional[str] = None,
+              source: Optional[str] = None, since: Optional[float] = None,
+              bucket_s: float = 86400.0) -> List[Dict[str, Any]]:
+        """Medians of TREND_METRICS per time bucket for successful, uncached runs."""
+        where, args = self._where(model, preset, source, since, None)
+        where += (" AND " if where else " WHERE ") + "ok = 1 AND NOT cached"
+        sql = f"SELECT ts, {', '.join(TREND_METRICS)} FROM runs{where} ORDER BY ts"
+        buckets: Dict[float, Dict[str, List[float]]] = {}
+        with self._lock:
+            for r in self._conn.execute(sql, args):
+                start = r["ts"] - r["ts"] % bucket_s
+                b = buckets.setdefault(start, {m: [] for m in TREND_METRICS})
+                for m in TREND_METRICS:
+                    if r[m] is not None:
+                        b[m].append(r[m])
+        out = []
+        for start, values in buckets.items():
+            entry: Dict[str, Any] = {"bucket": start, "runs": max(len(v) for v in values.values())}
+            for m, v in values.items():
+                entry[m] = percentile(v, 50) if v else None
+            out.append(entry)
+        return out
+
+
+def history_path() -> Path:
+    return Path('.autodev') / 'history.sqlite'
+
+
+_run_history: Optional[RunHistory] = None
+
+
+def run_history() -> RunHistory:
+    """Process-wide RunHistory for history_path()."""
+    global _run_history
+    if _run_history is None or _run_history.path != history_path():
+        _run_history = RunHistory(history_path())
+    return _run_history
+
+
+def history_row(params: RequestParams, preset: str, source: str, content: str = "",
+                metrics: Optional[StreamMetrics] = None, error: str = "", **extra: Any) -> Dict[str, Any]:
+    """A RunHistory row for one generation; `extra` overrides the metric columns."""
+    settings = {k: v for k, v in asdict(params).items() if k not in ("api_key", "system_prompt", "user_prompt", "turns")}
+    row: Dict[str, Any] = {
+        "ts": time.time(),
+        "source": source,
+        "model": params.model,
+        "preset": preset,
+        "format": params.format_type,
+        "prompt_hash": hashlib.sha256(prompt_text(build_payload(params)).encode("utf-8")).hexdigest()[:16],
+        "ok": not error,
+        "error": error,
+        "params": settings,
+        "output": content,
+        "output_chars": len(content),
+    }
+    if metrics is not None:
+        row.update({
+            "latency_s": metrics.total,
+            "ttft_s": metrics.ttft,
+            "prefill_s": metrics.prefill,
+            "decode_tps": metrics.decode_tps,
+            "prompt_tokens": metrics.prompt_tokens,
+            "tokens": metrics.tokens,
+            "token_source": metrics.token_source,
+            "cached": metrics.cached,
+            "finish_reason": metrics.finish_reason,
+            "runaway": metrics.runaway,
+            "runaway_saved": metrics.runaway_saved,
+        })
+    row.update(extra)
+    return row
+
+
+def format_trend(trend: List[Dict[str, Any]]) -> str:
+    lines = [f"{'bucket':<17} {'runs':>5} {'TTFT p50':>9} {'latency p50':>12} {'tok/s p50':>9}"]
+    for b in trend:
+        def fmt(v: Optional[float], spec: str) -> str:
+            return format(v, spec) if v is not None else "-"
+        lines.append(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(b['bucket'])):<17} {b['runs']:>5} "
+                     f"{fmt(b['ttft_s'], '.2f'):>9} {fmt(b['latency_s'], '.2f'):>12} {fmt(b['decode_tps'], '.1f'):>9}")
+    return "\n".join(lines)
+
+
+def append_jsonl(path: Path, row: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('a', encoding='utf-8') as f:
+        f.write(json.dumps(row, ensure_ascii=False) + "\n")
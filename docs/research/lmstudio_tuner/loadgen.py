@@ -0,0 +1,291 @@
+"""
+Concurrency ramp to find where LM Studio stops scaling.
+
+Sessions run on a small asyncio HTTP/1.1 client (stdlib only) rather than
+the shared requests pool, so every session is one coroutine on its own
+keep-alive connection: no worker threads, and the pool settings the rest of
+the tuner uses are left alone. Requests are not retried (a failure counts
+as an error at that level) and run without the runaway guard, so timings
+cover full generations.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import ssl
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .formatting import RequestParams, build_headers, build_payload, resolve_usage
+from .metrics import STATS, LatencyHistogram, StreamMetrics, percentile
+
+REQUEST_TIMEOUT = 300.0
+
+
+@dataclass
+class LoadLevel:
+    concurrency: int
+    requests: int = 0
+    errors: int = 0
+    wall: float = 0.0
+    completion_tokens: int = 0
+    ttfts: List[float] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+    ttft_hist: LatencyHistogram = field(default_factory=LatencyHistogram)
+    latency_hist: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def throughput(self) -> float:
+        """Aggregate completion tokens/s across all sessions."""
+        return self.completion_tokens / self.wall if self.wall > 0 else 0.0
+
+    @property
+    def rps(self) -> float:
+        return (self.requests - self.errors) / self.wall if self.wall > 0 else 0.0
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def _error_kind(exc: BaseException) -> str:
+    """client.error_kind for the asyncio client's exceptions."""
+    if isinstance(exc, HTTPStatusError):
+        return f"http_{exc.status // 100}xx"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, (ConnectionError, asyncio.IncompleteReadError, OSError)):
+        return "connection"
+    if isinstance(exc, (ValueError, KeyError)):
+        return "bad_response"
+    return type(exc).__name__
+
+
+class AsyncConnection:
+    """One keep-alive HTTP/1.1 connection that streams chat completions."""
+
+    def __init__(self, endpoint: str) -> None:
+        url = urlsplit(endpoint)
+        self.https = url.scheme == "https"
+        self.host = url.hostname or "localhost"
+        self.port = url.port or (443 if self.https else 80)
+        self.base = url.path.rstrip('/')
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def close(self) -> None:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _request(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict[str, str]]:
+        if self._writer is None or self._writer.is_closing():
+            self._reader, self._writer = await asyncio.open_connection(
+                self.host, self.port, ssl=ssl.create_default_context() if self.https else None)
+        lines = [f"POST {self.base}/v1/chat/completions HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}", "Accept: text/event-stream", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await self._writer.drain()
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        resp_headers: Dict[str, str] = {}
+        while True:
+            line = (await self._reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            resp_headers[name.strip().lower()] = value.strip()
+        return status, resp_headers
+
+    async def _body(self, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        """Yield the response body; reading it to the end frees the connection for reuse."""
+        reader = self._reader
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await reader.readline()
+                if not size_line:
+                    raise ConnectionError("stream cut off mid-response")
+                size = int(size_line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()).strip():  # trailers
+                        pass
+                    return
+                data = await reader.readexactly(size)
+                await reader.readexactly(2)
+                yield data
+        elif "content-length" in headers:
+            yield await reader.readexactly(int(headers["content-length"]))
+        else:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                yield data
+            await self.close()
+
+    async def stream(self, params: RequestParams) -> StreamMetrics:
+        """Stream one completion, timed the way client.stream_chat_completion times it."""
+        payload = build_payload(params, stream=True)
+        metrics = StreamMetrics()
+        parts: List[str] = []
+        usage: Optional[Dict[str, Any]] = None
+        t0 = time.perf_counter()
+        prev: Optional[float] = None
+        status, headers = await self._request(json.dumps(payload).encode('utf-8'), build_headers(params.api_key))
+        metrics.ttfb = time.perf_counter() - t0
+        buf = b""
+        async for data in self._body(headers):
+            if status != 200:
+                continue  # drain the error body so the connection stays usable
+            buf += data
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                text_data = line[5:].strip()
+                if text_data == b"[DONE]":
+                    continue
+                try:
+                    chunk = json.loads(text_data)
+                except ValueError:
+                    continue
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                choices = chunk.get("choices") or [{}]
+                if choices[0].get("finish_reason"):
+                    metrics.finish_reason = choices[0]["finish_reason"]
+                text = (choices[0].get("delta") or {}).get("content") or ""
+                if not text:
+                    continue
+                now = time.perf_counter() - t0
+                if prev is None:
+                    metrics.ttft = now
+                else:
+                    metrics.itl.append(now - prev)
+                prev = now
+                metrics.last_token = now
+                metrics.chunks += 1
+                parts.append(text)
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        if status != 200:
+            raise HTTPStatusError(status)
+        metrics.total = time.perf_counter() - t0
+        if prev is None:
+            metrics.ttft = metrics.last_token = metrics.total
+        counts = resolve_usage(usage, payload, "".join(parts))
+        metrics.tokens, metrics.prompt_tokens, metrics.token_source = (
+            counts.completion_tokens, counts.prompt_tokens, counts.source)
+        if counts.source == "estimate":
+            metrics.tokens, metrics.token_source = metrics.chunks, "deltas"
+        return metrics
+
+
+async def _run_level(params: RequestParams, concurrency: int, per_session: int) -> LoadLevel:
+    """`concurrency` closed-loop sessions, each sending `per_session` requests back to back."""
+    level = LoadLevel(concurrency)
+
+    async def session() -> None:
+        conn = AsyncConnection(params.endpoint)
+        try:
+            for _ in range(per_session):
+                level.requests += 1
+                try:
+                    metrics = await asyncio.wait_for(conn.stream(params), REQUEST_TIMEOUT)
+                except Exception as e:
+                    STATS.record_failure(_error_kind(e))
+                    level.errors += 1
+                    await conn.close()  # the stream may be half read
+                    continue
+                STATS.record_success(metrics.total, metrics.tokens, metrics.ttft,
+                                     metrics.decode_tps if metrics.tokens > 1 else None)
+                level.completion_tokens += metrics.tokens
+                level.ttfts.append(metrics.ttft)
+                level.latencies.append(metrics.total)
+                level.ttft_hist.observe(metrics.ttft)
+                level.latency_hist.observe(metrics.total)
+        finally:
+            await conn.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+    level.wall = time.perf_counter() - t0
+    return level
+
+
+def ramp_levels(max_concurrency: int) -> List[int]:
+    """1, 2, 4, ... up to and including max_concurrency."""
+    levels, n = [], 1
+    while n < max_concurrency:
+        levels.append(n)
+        n *= 2
+    levels.append(max(1, max_concurrency))
+    return levels
+
+
+async def run_load_test(
+    params: RequestParams,
+    levels: List[int],
+    per_session: int = 3,
+    on_level: Optional[Callable[[LoadLevel], None]] = None,
+) -> List[LoadLevel]:
+    results = []
+    for concurrency in levels:
+        level = await _run_level(params, concurrency, per_session)
+        results.append(level)
+        if on_level:
+            on_level(level)
+    return results
+
+
+def find_knee(levels: List[LoadLevel], min_gain: float = 0.10, latency_factor: float = 3.0) -> Optional[LoadLevel]:
+    """Last level before throughput gains drop under `min_gain` or p95 latency
+    exceeds `latency_factor` x the single-session p95."""
+    ok = [lv for lv in levels if lv.latencies]
+    if not ok:
+        return None
+    base_p95 = percentile(ok[0].latencies, 95)
+    knee = ok[0]
+    for prev, cur in zip(ok, ok[1:]):
+        gain = (cur.throughput - prev.throughput) / prev.throughput if prev.throughput > 0 else 0.0
+        if gain < min_gain or percentile(cur.latencies, 95) > latency_factor * base_p95:
+            break
+        knee = cur
+    return knee
+
+
+def format_load_level(level: LoadLevel) -> str:
+    return (
+        f"c={level.concurrency:<3} reqs {level.requests:<4} err {level.errors:<3} "
+        f"{level.throughput:>7.1f} tok/s {level.rps:>6.2f} req/s | "
+        f"TTFT p50/p95 {percentile(level.ttfts, 50):.2f}/{percentile(level.ttfts, 95):.2f}s | "
+        f"latency p50/p95 {percentile(level.latencies, 50):.2f}/{percentile(level.latencies, 95):.2f}s"
+    )
+
+
+def format_load_report(levels: List[LoadLevel]) -> str:
+    lines = [format_load_level(lv) for lv in levels]
+    knee = find_knee(levels)
+    if knee is not None:
+        lines.append("")
+        if knee is levels[-1]:
+            lines.append(f"No knee up to concurrency {knee.concurrency}; throughput was still scaling.")
+        else:
+            lines.append(f"Knee at concurrency {knee.concurrency}: {knee.throughput:.1f} tok/s, {knee.rps:.2f} req/s")
+        lines.append(f"Suggested LMStudioConfig.rateLimit: {max(1, math.floor(knee.rps))}")
+        lines.append("Latency histogram at the knee:")
+        lines.append(knee.latency_hist.render())
+    return "\n".join(lines)
@@ -0,0 +1,357 @@
+"""
+Request metrics for the LM Studio tuner.
+
+``TunerStats`` keeps the counters of ``LMStudioStats`` from
+src/providers/lmstudio.ts under the same field names (``totalRequests``,
+``successfulRequests``, ``failedRequests``, ``retryCount``, ``totalTokens``,
+``averageLatency`` in milliseconds) so tuner probes can be overlaid with
+orchestrator traffic, plus what an average hides:
+
+- histograms of TTFT, total latency and decode tokens/s
+- failures counted by kind (timeout, connection, http_5xx, ...)
+
+Unlike the provider, ``totalRequests`` counts failed requests too.
+
+Exposed either as OpenMetrics text over HTTP (``serve_metrics``: ``/metrics``
+plus ``/stats.json``) or as a JSON file rewritten periodically
+(``SnapshotWriter``).
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0..100); 0.0 for no samples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * (pct / 100.0)
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class LatencyHistogram:
+    """Cumulative-style latency histogram over fixed bucket bounds (seconds)."""
+
+    BOUNDS: Tuple[float, ...] = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+    def __init__(self, bounds: Optional[Tuple[float, ...]] = None):
+        self.bounds = tuple(bounds or self.BOUNDS)
+        self.counts = [0] * (len(self.bounds) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket (like histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else lo
+                return lo + (hi - lo) * ((rank - seen) / n)
+            seen += n
+        return self.bounds[-1]
+
+    def render(self, width: int = 30) -> str:
+        peak = max(self.counts) or 1
+        lines = []
+        for i, n in enumerate(self.counts):
+            if not n:
+                continue
+            label = f"<= {self.bounds[i]:g}s" if i < len(self.bounds) else f" > {self.bounds[-1]:g}s"
+            lines.append(f"  {label:>9} {'#' * max(1, round(width * n / peak)):<{width}} {n}")
+        return "\n".join(lines)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "bounds": list(self.bounds),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TunerStats:
+    COUNTERS = ("totalRequests", "successfulRequests", "failedRequests", "retryCount", "totalTokens")
+    TPS_BOUNDS: Tuple[float, ...] = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+    def __init__(self, prefix: str = "lmstudio", labels: Optional[Dict[str, str]] = None):
+        self.prefix = prefix
+        self.labels = dict(labels if labels is not None else {"source": "tuner"})
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.totalRequests = 0
+            self.successfulRequests = 0
+            self.failedRequests = 0
+            self.retryCount = 0
+            self.totalTokens = 0
+            self._latency_ms_sum = 0.0
+            self.errors: Dict[str, int] = {}
+            self.runaway_stops: Dict[str, int] = {}
+            self.runaway_saved: Dict[str, int] = {}
+            self.ttft = LatencyHistogram()
+            self.latency = LatencyHistogram()
+            self.tokens_per_second = LatencyHistogram(self.TPS_BOUNDS)
+
+    @property
+    def averageLatency(self) -> float:
+        """Mean latency of successful requests in milliseconds, as in LMStudioStats."""
+        return self._latency_ms_sum / self.successfulRequests if self.successfulRequests else 0.0
+
+    # ----- recording -----
+
+    def record_success(self, latency: float, tokens: int = 0, ttft: Optional[float] = None,
+                       tokens_per_second: Optional[float] = None) -> None:
+        with self._lock:
+            self.totalRequests += 1
+            self.successfulRequests += 1
+            self.totalTokens += tokens
+            self._latency_ms_sum += latency * 1000.0
+            self.latency.observe(latency)
+            if ttft is not None:
+                self.ttft.observe(ttft)
+            if tokens_per_second is not None and tokens_per_second > 0:
+                self.tokens_per_second.observe(tokens_per_second)
+
+    def record_failure(self, kind: str) -> None:
+        with self._lock:
+            self.totalRequests += 1
+            self.failedRequests += 1
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retryCount += 1
+
+    def record_runaway(self, guard: str, tokens_saved: int) -> None:
+        with self._lock:
+            self.runaway_stops[guard] = self.runaway_stops.get(guard, 0) + 1
+            self.runaway_saved[guard] = self.runaway_saved.get(guard, 0) + tokens_saved
+
+    # ----- export -----
+
+    def snapshot(self) -> Dict[str, Any]:
+        """LMStudioStats fields plus errorsByKind and histograms, JSON-ready."""
+        with self._lock:
+            snap: Dict[str, Any] = {name: getattr(self, name) for name in self.COUNTERS}
+            snap["averageLatency"] = round(self.averageLatency, 3)
+            snap["errorsByKind"] = dict(self.errors)
+            snap["runawayByGuard"] = {g: {"stops": n, "tokensSaved": self.runaway_saved.get(g, 0)}
+                                      for g, n in self.runaway_stops.items()}
+            snap["histograms"] = {
+                "ttftSeconds": self.ttft.snapshot(),
+                "latencySeconds": self.latency.snapshot(),
+                "tokensPerSecond": self.tokens_per_second.snapshot(),
+            }
+            snap["timestamp"] = time.time()
+            return snap
+
+    def _labels(self, extra: Optional[Dict[str, str]] = None) -> str:
+        labels = dict(self.labels, **(extra or {}))
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+    def openmetrics(self) -> str:
+        p = self.prefix
+        lines = []
+        with self._lock:
+            for name in self.COUNTERS:
+                lines += [f"# TYPE {p}_{name} counter", f"{p}_{name}_total{self._labels()} {getattr(self, name)}"]
+            lines += [f"# TYPE {p}_averageLatency gauge", f"# HELP {p}_averageLatency Mean latency of successful requests in ms",
+                      f"{p}_averageLatency{self._labels()} {self.averageLatency:.3f}"]
+            lines.append(f"# TYPE {p}_errors counter")
+            for kind, n in sorted(self.errors.items()):
+                lines.append(f"{p}_errors_total{self._labels({'kind': kind})} {n}")
+            for name, counts in (("runaway_stops", self.runaway_stops), ("runaway_tokens_saved", self.runaway_saved)):
+                lines.append(f"# TYPE {p}_{name} counter")
+                for guard, n in sorted(counts.items()):
+                    lines.append(f"{p}_{name}_total{self._labels({'guard': guard})} {n}")
+            for name, hist, unit in (("ttft_seconds", self.ttft, "seconds"),
+                                     ("latency_seconds", self.latency, "seconds"),
+                                     ("tokens_per_second", self.tokens_per_second, "")):
+                metric = f"{p}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                if unit:
+                    lines.append(f"# UNIT {metric} {unit}")
+                cumulative = 0
+                for bound, n in zip(list(hist.bounds) + [float("inf")], hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{metric}_bucket{self._labels({'le': le})} {cumulative}")
+                lines.append(f"{metric}_count{self._labels()} {hist.count}")
+                lines.append(f"{metric}_sum{self._labels()} {hist.sum:.6f}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+# Counters/histograms for every request the tuner sends (LMStudioStats field
+# names); exported with --metrics-port / --metrics-json.
+STATS = TunerStats()
+
+
+@dataclass
+class StreamMetrics:
+    """Client-side timings for one streamed completion (seconds).
+
+    ttfb is the time until response headers arrive, ttft the time until the
+    first content token. prefill is ttft - ttfb, i.e. the time the server
+    spent on the prompt after accepting the request, or all of ttft when the
+    server withholds headers until it has a token. chunks counts SSE
+    content deltas; tokens / prompt_tokens come from the server usage block
+    when present (see token_source). Decode figures cover the tokens after
+    the first one.
+    """
+    ttfb: float = 0.0
+    ttft: float = 0.0
+    total: float = 0.0
+    last_token: float = 0.0
+    chunks: int = 0
+    tokens: int = 0
+    prompt_tokens: int = 0
+    token_source: str = "deltas"
+    itl: List[float] = field(default_factory=list)
+    cancelled: bool = False
+    cached: bool = False
+    finish_reason: str = ""  # "stop", "length", or "runaway" when a RunawayGuard cut it
+    runaway: str = ""  # "<guard>: <detail>"
+    runaway_saved: int = 0  # max_tokens not decoded because of the guard
+
+    @property
+    def prefill(self) -> float:
+        after_headers = max(0.0, self.ttft - self.ttfb)
+        # Servers that hold the headers back until the first token hide the
+        # prefill inside ttfb; fall back to the whole ttft then.
+        return after_headers if after_headers >= self.ttfb else self.ttft
+
+    @property
+    def prefill_tps(self) -> float:
+        return self.prompt_tokens / self.prefill if self.prefill > 0 else 0.0
+
+    @property
+    def decode_time(self) -> float:
+        return max(0.0, self.last_token - self.ttft)
+
+    @property
+    def decode_tps(self) -> float:
+        if self.tokens < 2 or self.decode_time <= 0:
+            return 0.0
+        return (self.tokens - 1) / self.decode_time
+
+    def itl_percentiles(self) -> Tuple[float, float, float]:
+        return (percentile(self.itl, 50), percentile(self.itl, 95), percentile(self.itl, 99))
+
+    def savings(self, max_tokens: int) -> Tuple[int, float]:
+        """Tokens not decoded because of a cancel, and the decode time that saved."""
+        saved = max(0, max_tokens - self.tokens)
+        seconds = saved / self.decode_tps if self.decode_tps > 0 else 0.0
+        return saved, seconds
+
+    def summary(self) -> str:
+        if self.cached:
+            return f"Cache hit in {self.total * 1000:.1f} ms | {self.tokens} toks [{self.token_source}]"
+        p50, p95, p99 = self.itl_percentiles()
+        stopped = f" | stopped ({self.runaway}), ~{self.runaway_saved} toks saved" if self.runaway else ""
+        return (
+            f"TTFT {self.ttft:.2f}s | prefill {self.prompt_tokens} toks in {self.prefill:.2f}s "
+            f"({self.prefill_tps:.0f} tok/s) | decode {self.tokens} toks @ {self.decode_tps:.1f} tok/s "
+            f"[{self.token_source}] | ITL p50/p95/p99 {p50 * 1000:.0f}/{p95 * 1000:.0f}/{p99 * 1000:.0f} ms | "
+            f"total {self.total:.2f}s{stopped}"
+        )
+
+
+def serve_metrics(stats: TunerStats, host: str = "127.0.0.1", port: int = 9464) -> ThreadingHTTPServer:
+    """Serve /metrics (OpenMetrics) and /stats.json from a daemon thread; call shutdown() to stop."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.split("?", 1)[0]
+            if path in ("/", "/metrics"):
+                body, ctype = stats.openmetrics().encode("utf-8"), OPENMETRICS_CONTENT_TYPE
+            elif path == "/stats.json":
+                body, ctype = json.dumps(stats.snapshot()).encode("utf-8"), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class SnapshotWriter:
+    """Rewrites `path` with stats.snapshot() every `interval` seconds (atomically) until stop()."""
+
+    def __init__(self, stats: TunerStats, path: Path, interval: float = 10.0):
+        self.stats = stats
+        self.path = Path(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+
+    def start(self) -> "SnapshotWriter":
+        self._thread.start()
+        return self
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump(self.stats.snapshot(), f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        """Stop the thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.interval + 1)
+        self.write()
@@ -0,0 +1,285 @@
+"""
+Offline stand-in for LM Studio's OpenAI-compatible server.
+
+Implements ``GET /v1/models``, ``GET /api/v0/models`` and
+``POST /v1/chat/completions`` (blocking and SSE streaming, with the
+``stream_options.include_usage`` usage chunk) with synthetic timing:
+
+- ``ttft`` seconds before the first token, plus ``prefill_per_token`` per
+  prompt token; ``token_delay`` seconds per generated token
+- ``context_limit`` prompt tokens before requests are rejected with 400,
+  and ``decode_slowdown`` extra seconds per token per 1k prompt tokens;
+  prompts are counted at ``chars_per_token`` (4 matches the client's
+  estimate; real BPE on plain prose is closer to 6)
+- ``swap_delay`` added when a request names a model other than the one
+  last used, so cold/warm profiling has something to find
+- ``error_rate`` of requests answered with ``error_status``;
+  ``drop_rate`` of streams cut off mid-generation
+- at most ``max_concurrency`` generations at once; extra requests queue
+  (like a single GPU slot) or get 503 with ``reject_over_limit``
+- ``supports_n`` honours the OpenAI ``n`` parameter (LM Studio ignores it
+  and answers with one choice); with ``vary`` each sample at temperature
+  > 0 ends at a random point past halfway, so candidates differ
+- ``runaway_rate`` of answers repeat their last sentence until
+  ``max_tokens`` (or 2000 tokens), for the runaway guards to catch
+
+``GET /mock/stats`` reports request/error/abort counts and the peak number
+of generations in flight. Stdlib only, like scripts/mock-desktop-server.js
+for the desktop driver.
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+ANSWER = (
+    "Here is a breadth-first search over an adjacency list.\n\n"
+    "```python\nfrom collections import deque\n\n\ndef bfs(graph, start):\n"
+    "    seen, order, queue = {start}, [], deque([start])\n    while queue:\n"
+    "        node = queue.popleft()\n        order.append(node)\n"
+    "        for nxt in graph.get(node, []):\n            if nxt not in seen:\n"
+    "                seen.add(nxt)\n                queue.append(nxt)\n    return order\n```\n\n"
+    "It visits every vertex and edge once, so it runs in O(V + E) time and O(V) space."
+)
+
+
+@dataclass
+class MockConfig:
+    models: List[str] = field(default_factory=lambda: ["mock-small", "mock-large"])
+    ttft: float = 0.2
+    prefill_per_token: float = 0.0
+    token_delay: float = 0.01
+    swap_delay: float = 0.0
+    context_limit: int = 0  # 0 = unlimited
+    chars_per_token: float = 4.0
+    decode_slowdown: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    drop_rate: float = 0.0
+    max_concurrency: int = 0  # 0 = unlimited
+    reject_over_limit: bool = False
+    supports_n: bool = False
+    vary: bool = False
+    runaway_rate: float = 0.0
+    answer: str = ANSWER
+    seed: Optional[int] = None
+
+
+class MockState:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.slots = threading.BoundedSemaphore(config.max_concurrency) if config.max_concurrency > 0 else None
+        self.lock = threading.Lock()
+        self.loaded_model = ""
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.aborted = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests, "errors": self.errors, "rejected": self.rejected,
+                "aborted": self.aborted, "dropped": self.dropped, "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight, "loaded_model": self.loaded_model,
+                "config": asdict(self.config),
+            }
+
+
+def _tokens(text: str) -> List[str]:
+    """Split into word-ish tokens that concatenate back to `text`."""
+    out, start = [], 0
+    for i in range(1, len(text) + 1):
+        if i == len(text) or (text[i] in " \n" and text[i - 1] not in " \n"):
+            out.append(text[start:i])
+            start = i
+    return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    server: "MockServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        state = self.server.state
+        path = self.path.split("?", 1)[0]
+        if path == "/v1/models":
+            self._json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in state.config.models]})
+        elif path == "/api/v0/models":
+            self._json(200, {"data": [{"id": m, "state": "loaded" if m == state.loaded_model else "not-loaded"}
+                                      for m in state.config.models]})
+        elif path == "/mock/stats":
+            self._json(200, state.stats())
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path.split("?", 1)[0] != "/v1/chat/completions":
+            self._json(404, {"error": "not found"})
+            return
+        state = self.server.state
+        cfg = state.config
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            self._json(400, {"error": {"message": "bad json"}})
+            return
+        with state.lock:
+            state.requests += 1
+        model = payload.get("model") or ""
+        if cfg.models and model not in cfg.models:
+            self._json(404, {"error": {"message": f"model {model!r} not found"}})
+            return
+        if state.roll(cfg.error_rate):
+            with state.lock:
+                state.errors += 1
+            self._json(cfg.error_status, {"error": {"message": "injected error"}})
+            return
+        if state.slots is not None and not state.slots.acquire(blocking=not cfg.reject_over_limit):
+            with state.lock:
+                state.rejected += 1
+            self._json(503, {"error": {"message": "too many concurrent requests"}})
+            return
+        with state.lock:
+            state.in_flight += 1
+            state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+            swap = bool(state.loaded_model) and state.loaded_model != model
+            state.loaded_model = model
+        try:
+            self._generate(payload, swap)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+            if state.slots is not None:
+                state.slots.release()
+
+    def _sample(self, payload: Dict[str, Any]) -> Tuple[List[str], str]:
+        state = self.server.state
+        tokens = _tokens(state.config.answer)
+        if state.config.vary and float(payload.get("temperature") or 0) > 0:
+            with state.lock:
+                tokens = tokens[:state.rng.randint(len(tokens) // 2, len(tokens))]
+        max_tokens = int(payload.get("max_tokens") or 0)
+        if state.roll(state.config.runaway_rate):
+            last = _tokens(" " + state.config.answer.rstrip().rsplit("\n", 1)[-1].strip())
+            limit = max_tokens if max_tokens > 0 else 2000
+            tokens = list(tokens)
+            while len(tokens) < limit:
+                tokens.extend(last)
+        if 0 < max_tokens < len(tokens):
+            return tokens[:max_tokens], "length"
+        return tokens, "stop"
+
+    def _generate(self, payload: Dict[str, Any], swap: bool) -> None:
+        state = self.server.state
+        cfg = state.config
+        prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages") or [])
+        prompt_tokens = max(1, int(len(prompt) / cfg.chars_per_token)) if prompt else 0
+        if cfg.context_limit and prompt_tokens > cfg.context_limit:
+            self._json(400, {"error": {"message": f"Context length exceeded: {prompt_tokens} tokens > "
+                                                  f"n_ctx {cfg.context_limit}"}})
+            return
+        token_delay = cfg.token_delay + cfg.decode_slowdown * prompt_tokens / 1000.0
+        n = max(1, int(payload.get("n") or 1)) if cfg.supports_n else 1
+        samples = [self._sample(payload) for _ in range(n)]
+        completion_tokens = sum(len(toks) for toks, _ in samples)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        time.sleep(cfg.ttft + cfg.prefill_per_token * prompt_tokens + (cfg.swap_delay if swap else 0.0))
+        model = payload.get("model", "")
+        steps = max(len(toks) for toks, _ in samples)
+
+        if not payload.get("stream"):
+            time.sleep(token_delay * steps)
+            self._json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "model": model,
+                "choices": [{"index": i, "message": {"role": "assistant", "content": "".join(toks)},
+                             "finish_reason": finish} for i, (toks, finish) in enumerate(samples)],
+                "usage": usage,
+            })
+            return
+
+        drop_at = state.rng.randrange(steps) if steps and state.roll(cfg.drop_rate) else -1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(obj: Any) -> None:
+            data = ("data: " + (obj if isinstance(obj, str) else json.dumps(obj)) + "\n\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def chunk(index: int, delta: Dict[str, Any], finish: Optional[str]) -> Dict[str, Any]:
+            return {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": index, "delta": delta, "finish_reason": finish}]}
+
+        try:
+            for i in range(steps + 1):
+                if i == drop_at:
+                    with state.lock:
+                        state.dropped += 1
+                    self.close_connection = True
+                    return
+                if 0 < i < steps:
+                    time.sleep(token_delay)
+                for index, (toks, finish) in enumerate(samples):
+                    if i < len(toks):
+                        send(chunk(index, {"content": toks[i]}, None))
+                    elif i == len(toks):
+                        send(chunk(index, {}, finish))
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                send({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                      "choices": [], "usage": usage})
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            with state.lock:
+                state.aborted += 1
+            self.close_connection = True
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.state = MockState(config)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_mock(config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> MockServer:
+    """Start a MockServer on a daemon thread (port 0 picks a free port); call shutdown() to stop."""
+    server = MockServer(config or MockConfig(), host, port)
+    threading.Thread(target=server.serve_forever, name="mock-lmstudio", daemon=True).start()
+    return server
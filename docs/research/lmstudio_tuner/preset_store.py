@@ -0,0 +1,268 @@
+"""
+Preset store for the LM Studio tuner.
+
+Presets stay in the same hand-editable JSON file as before
+(``{name: settings}`` in ``.autodev/presets.json``), but all access goes
+through ``PresetStore``:
+
+- an in-memory index (names, tags, models) so listing and search do not
+  touch the disk
+- writes go to a temp file that is fsynced and renamed over the original,
+  under a lock file, after re-reading the file if another process changed
+  it (mtime/size check), so concurrent tuner instances merge instead of
+  clobbering each other
+- every change is appended to ``presets.history.jsonl`` so earlier
+  versions of a preset can be listed and restored
+
+Optional per-preset keys: ``tags`` (list of strings) and ``model``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+class PresetStoreError(Exception):
+    pass
+
+
+class PresetStore:
+    def __init__(self, path: Path, history_path: Optional[Path] = None,
+                 lock_timeout: float = 5.0, stale_lock_after: float = 30.0):
+        self.path = Path(path)
+        self.history_path = Path(history_path) if history_path else self.path.with_name(
+            self.path.stem + ".history.jsonl")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.lock_timeout = lock_timeout
+        self.stale_lock_after = stale_lock_after
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._names: List[str] = []
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._by_model: Dict[str, Set[str]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._mutex = threading.RLock()
+        self.reload_if_changed()
+
+    # ----- reading -----
+
+    def _stat_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def reload_if_changed(self) -> bool:
+        """Re-read the file if its mtime/size changed; True when it did."""
+        with self._mutex:
+            sig = self._stat_signature()
+            if sig == self._signature:
+                return False
+            data: Dict[str, Dict[str, Any]] = {}
+            if sig is not None:
+                with self.path.open('r', encoding='utf-8') as f:
+                    data = json.load(f) or {}
+            self._data = data
+            self._signature = sig
+            self._reindex()
+            return True
+
+    def _reindex(self) -> None:
+        self._names = sorted(self._data)
+        self._by_tag = {}
+        self._by_model = {}
+        for name, settings in self._data.items():
+            self._index(name, settings)
+
+    def _index(self, name: str, settings: Dict[str, Any]) -> None:
+        for tag in settings.get("tags") or []:
+            self._by_tag.setdefault(str(tag), set()).add(name)
+        model = settings.get("model")
+        if model:
+            self._by_model.setdefault(str(model), set()).add(name)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._data
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        settings = self._data.get(name)
+        return dict(settings) if settings is not None else None
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(settings) for name, settings in self._data.items()}
+
+    def tags(self) -> List[str]:
+        return sorted(self._by_tag)
+
+    def models(self) -> List[str]:
+        return sorted(self._by_model)
+
+    def search(self, query: str = "", tag: Optional[str] = None, model: Optional[str] = None,
+               limit: Optional[int] = None) -> List[str]:
+        """Names containing `query` (case-insensitive), optionally restricted to a tag and/or model."""
+        with self._mutex:
+            names: List[str] = self._names
+            if tag:
+                allowed = self._by_tag.get(tag, set())
+                names = [n for n in names if n in allowed]
+            if model:
+                allowed = self._by_model.get(model, set())
+                names = [n for n in names if n in allowed]
+            q = query.strip().lower()
+            if q:
+                names = [n for n in names if q in n.lower()]
+            return names[:limit] if limit is not None else list(names)
+
+    # ----- writing -----
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - self.lock_path.stat().st_mtime > self.stale_lock_after:
+                        self.lock_path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise PresetStoreError(f"Timed out waiting for {self.lock_path}")
+                time.sleep(0.05)
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            yield
+        finally:
+            try:
+                self.lock_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _write_atomic(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=self.path.name + ".", suffix=".tmp", dir=str(self.path.parent))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self._signature = self._stat_signature()
+
+    def _append_history(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        with self.history_path.open('a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _mutate(self, change: Callable[[Dict[str, Dict[str, Any]]], List[Dict[str, Any]]]) -> None:
+        """Run `change` on the freshest data under the lock and persist it.
+
+        `change` edits a shallow copy of the mapping (replacing values, not
+        mutating them) and returns history rows; raising aborts without
+        writing.
+        """
+        with self._mutex, self._file_lock():
+            self.reload_if_changed()
+            data = dict(self._data)
+            rows = change(data)
+            previous = self._data
+            self._data = data
+            try:
+                self._write_atomic()
+            except BaseException:
+                self._data = previous
+                raise
+            self._reindex()
+            self._append_history(rows)
+
+    def put(self, name: str, settings: Dict[str, Any]) -> None:
+        self.put_many({name: settings})
+
+    def put_many(self, presets: Dict[str, Dict[str, Any]]) -> None:
+        """Insert or replace several presets with a single write."""
+        def change(data: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+            ts = time.time()
+            for name, settings in presets.items():
+                data[name] = dict(settings)
+            return [{"ts": ts, "action": "put", "name": n, "settings": s} for n, s in presets.items()]
+        self._mutate(change)
+
+    def rename(self, old: str, new: str) -> None:
+        def change(data: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+            if old not in data:
+                raise PresetStoreError(f"Preset not found: {old}")
+            if new in data:
+                raise PresetStoreError("A preset with that name already exists")
+            data[new] = data.pop(old)
+            return [{"ts": time.time(), "action": "rename", "name": new, "from": old, "settings": data[new]}]
+        self._mutate(change)
+
+    def delete(self, name: str) -> None:
+        def change(data: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+            settings = data.pop(name, None)
+            if settings is None:
+                return []
+            return [{"ts": time.time(), "action": "delete", "name": name, "settings": settings}]
+        self._mutate(change)
+
+    def set_tags(self, name: str, tags: List[str]) -> None:
+        def change(data: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+            if name not in data:
+                raise PresetStoreError(f"Preset not found: {name}")
+            clean = sorted({t.strip() for t in tags if t.strip()})
+            settings = {k: v for k, v in data[name].items() if k != "tags"}
+            if clean:
+                settings["tags"] = clean
+            data[name] = settings
+            return [{"ts": time.time(), "action": "tag", "name": name, "settings": data[name]}]
+        self._mutate(change)
+
+    # ----- history -----
+
+    def history(self, name: str) -> List[Dict[str, Any]]:
+        """Recorded versions of `name`, newest first (renames follow the old name)."""
+        if not self.history_path.exists():
+            return []
+        names = {name}
+        rows: List[Dict[str, Any]] = []
+        with self.history_path.open('r', encoding='utf-8') as f:
+            lines = f.readlines()
+        for line in reversed(lines):
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("name") in names:
+                rows.append(row)
+                if row.get("action") == "rename" and row.get("from"):
+                    names.add(row["from"])
+        return rows
+
+    def restore(self, name: str, version: Dict[str, Any]) -> None:
+        """Make a version returned by history() current again."""
+        self.put(name, version.get("settings") or {})
@@ -0,0 +1,80 @@
+"""
+Built-in sampling presets, default prompts and access to saved presets.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .formatting import RequestParams
+from .preset_store import PresetStore
+
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "Creative": {"temperature": 1.1, "top_p": 0.95, "presence_penalty": 0.1, "frequency_penalty": 0.0, "repetition_penalty": 1.0},
+    "Balanced": {"temperature": 0.7, "top_p": 0.9, "presence_penalty": 0.0, "frequency_penalty": 0.0, "repetition_penalty": 1.05},
+    "Precise": {"temperature": 0.3, "top_p": 0.85, "presence_penalty": 0.0, "frequency_penalty": 0.0, "repetition_penalty": 1.1},
+    "Deterministic": {"temperature": 0.0, "top_p": 1.0, "presence_penalty": 0.0, "frequency_penalty": 0.0, "repetition_penalty": 1.0},
+    "Coding": {"temperature": 0.15, "top_p": 0.9, "presence_penalty": -0.1, "frequency_penalty": 0.1, "repetition_penalty": 1.15},
+}
+
+
+DEFAULT_MAX_TOKENS = 800
+DEFAULT_SYSTEM_PROMPT = "You are an expert programming assistant. Provide correct, runnable code with proper complexity analysis and clear explanations. Always include working examples and unit tests when relevant."
+DEFAULT_USER_PROMPT = "Implement breadth-first search (BFS) and depth-first search (DFS) algorithms for graph traversal. Include:\n1. Complete Python implementations for both recursive and iterative versions\n2. Correct time and space complexity analysis\n3. Working example with a sample graph\n4. Clear comments explaining the algorithms"
+
+
+def presets_path() -> Path:
+    return Path('.autodev') / 'presets.json'
+
+
+_preset_store: Optional[PresetStore] = None
+
+
+def preset_store() -> PresetStore:
+    """Process-wide store for presets_path(), picking up external edits on each call."""
+    global _preset_store
+    if _preset_store is None or _preset_store.path != presets_path():
+        _preset_store = PresetStore(presets_path())
+    else:
+        _preset_store.reload_if_changed()
+    return _preset_store
+
+
+def resolve_preset(name: str, store: Optional[PresetStore] = None) -> Dict[str, Any]:
+    """Built-in PRESETS first, then presets saved from the GUI."""
+    if name in PRESETS:
+        return dict(PRESETS[name])
+    settings = (store or preset_store()).get(name)
+    if settings is None:
+        raise KeyError(f"Unknown preset: {name}")
+    return settings
+
+
+def make_params(
+    endpoint: str,
+    api_key: str,
+    model: str,
+    preset: Dict[str, Any],
+    format_type: str,
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: Optional[int],
+) -> RequestParams:
+    """Request parameters for `preset`; an explicit `max_tokens` wins over the preset's (None defers to it)."""
+    if max_tokens is None:
+        max_tokens = int(preset.get("max_tokens", DEFAULT_MAX_TOKENS))
+    return RequestParams(
+        endpoint=endpoint,
+        api_key=api_key,
+        model=model,
+        temperature=float(preset.get("temperature", 0.7)),
+        top_p=float(preset.get("top_p", 0.9)),
+        presence_penalty=float(preset.get("presence_penalty", 0.0)),
+        frequency_penalty=float(preset.get("frequency_penalty", 0.0)),
+        repetition_penalty=float(preset.get("repetition_penalty", 1.05)),
+        max_tokens=int(max_tokens),
+        format_type=format_type,
+        system_prompt=system_prompt,
+        user_prompt=user_prompt,
+    )
@@ -0,0 +1,140 @@
+"""
+Model catalog cache and cold/warm model load profiling.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .client import fetch_model_states, stream_chat_completion
+from .metrics import StreamMetrics, percentile
+from .presets import PRESETS, make_params
+
+
+def model_catalog_path() -> Path:
+    return Path('.autodev') / 'models_cache.json'
+
+
+def _read_model_catalog() -> Dict[str, Any]:
+    try:
+        with model_catalog_path().open('r', encoding='utf-8') as f:
+            return json.load(f) or {}
+    except (OSError, ValueError):
+        return {}
+
+
+def load_model_catalog(endpoint: str) -> Tuple[List[str], float]:
+    """Cached (models, fetched_at) for `endpoint`; ([], 0.0) when unknown."""
+    entry = _read_model_catalog().get(endpoint.rstrip('/')) or {}
+    return list(entry.get("models") or []), float(entry.get("ts") or 0.0)
+
+
+def save_model_catalog(endpoint: str, models: List[str]) -> None:
+    catalog = _read_model_catalog()
+    catalog[endpoint.rstrip('/')] = {"models": models, "ts": round(time.time(), 3)}
+    path = model_catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A temp file per writer: the GUI refresh and a CLI profile-load may save at once.
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+PROBE_PROMPT = "Reply with the single word OK."
+
+
+@dataclass
+class LoadProfile:
+    model: str
+    was_loaded: Optional[bool]
+    cold_ttft: float
+    cold_total: float
+    warm_ttft: float
+    warm_total: float
+    swapped_from: str = ""
+    error: str = ""  # set when the model could not be probed; the timings are then 0
+
+    @property
+    def swap_cost(self) -> float:
+        """Extra time to first token attributable to loading the model."""
+        return max(0.0, self.cold_ttft - self.warm_ttft)
+
+
+def _probe(endpoint: str, api_key: str, model: str) -> StreamMetrics:
+    params = make_params(endpoint, api_key, model, PRESETS["Deterministic"], "None", "", PROBE_PROMPT, 8)
+    _, metrics = stream_chat_completion(params)
+    return metrics
+
+
+def profile_model_load(
+    endpoint: str,
+    api_key: str,
+    models: List[str],
+    warm_runs: int = 3,
+    on_result: Optional[Callable[[LoadProfile], None]] = None,
+) -> List[LoadProfile]:
+    """For each model: probe a different model first (forcing a swap when the
+    server keeps one model resident), then time the first request (cold) and
+    `warm_runs` follow-ups (warm, p50). /api/v0/models state, when available,
+    records whether the "cold" request really found the model unloaded.
+    A model that fails to load gets a profile with `error` set, and the
+    rest are still profiled.
+    """
+    results = []
+    for i, model in enumerate(models):
+        other = models[(i + 1) % len(models)] if len(models) > 1 else ""
+        if other and other != model:
+            try:
+                _probe(endpoint, api_key, other)
+            except requests.RequestException:
+                other = ""
+        state = fetch_model_states(endpoint, api_key).get(model)
+        try:
+            cold = _probe(endpoint, api_key, model)
+            warm = [_probe(endpoint, api_key, model) for _ in range(max(1, warm_runs))]
+        except requests.RequestException as e:
+            profile = LoadProfile(model, None if not state else state == "loaded", 0.0, 0.0, 0.0, 0.0,
+                                  swapped_from=other, error=str(e))
+            results.append(profile)
+            if on_result:
+                on_result(profile)
+            continue
+        profile = LoadProfile(
+            model=model,
+            was_loaded=None if not state else state == "loaded",
+            cold_ttft=cold.ttft,
+            cold_total=cold.total,
+            warm_ttft=percentile([m.ttft for m in warm], 50),
+            warm_total=percentile([m.total for m in warm], 50),
+            swapped_from=other,
+        )
+        results.append(profile)
+        if on_result:
+            on_result(profile)
+    return results
+
+
+def format_load_profile(p: LoadProfile) -> str:
+    if p.error:
+        return f"{p.model}: failed ({p.error})"
+    loaded = {True: "was loaded", False: "was unloaded", None: "state unknown"}[p.was_loaded]
+    return (
+        f"{p.model}: cold TTFT {p.cold_ttft:.2f}s (total {p.cold_total:.2f}s) vs warm {p.warm_ttft:.2f}s "
+        f"(total {p.warm_total:.2f}s) -> swap cost {p.swap_cost:.2f}s [{loaded}"
+        f"{', after ' + p.swapped_from if p.swapped_from else ''}]"
+    )
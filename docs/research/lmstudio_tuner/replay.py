@@ -0,0 +1,458 @@
+"""
+Replay the orchestrator's ``reason`` steps as a benchmark corpus.
+
+LMStudioExecutor.executeReasoningStep sends each ``type: reason`` step of
+a template (templates/*.yaml) as a system message (the step's
+``context``) plus a user message (its ``prompt``). This module loads those
+steps and replays every template's chain under each model / preset /
+format, the way the executor would:
+
+- ``${name}`` placeholders come from the given values (``requirements``
+  falls back to SAMPLE_PARAMS), ``${previous_step_output}`` and
+  ``${steps.<id>.output}`` from earlier steps of the same chain, so later
+  steps see realistic, config-specific context sizes
+- each step is timed (TTFT, latency, decode tok/s) and scored with a
+  ScoreFn (reasoning_score by default); a failed step ends its chain
+- recommend_presets() picks, per template and model, the fastest
+  preset/format whose every step meets the quality threshold
+
+Templates are read with PyYAML when it is installed, otherwise with a
+small parser for the subset the templates use (mappings, lists of
+mappings, plain and ``|`` block scalars).
+"""
+from __future__ import annotations
+
+import itertools
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .autotune import ScoreFn
+from .cache import ResponseCache, cached_chat_completion
+from .formatting import RequestParams
+from .history import RunHistory, history_row
+from .metrics import StreamMetrics, percentile
+from .presets import make_params, preset_store, resolve_preset
+from .sweep import SweepConfig
+
+_PLACEHOLDER = re.compile(r"\$\{\s*([^{}]+?)\s*\}")
+_STEP_OUTPUT = re.compile(r"steps\.([\w-]+)\.output")
+_STRUCTURE = re.compile(r"^\s*([-*+]|\d+[.)]|#{1,6})\s+\S", re.M)
+_TERM = re.compile(r"[a-z][a-z0-9_]{4,}")
+
+SAMPLE_PARAMS = {
+    "requirements": (
+        "Add per-request timeouts and a retry budget to the LM Studio provider. Requests that exceed "
+        "the timeout must be cancelled, retried with exponential backoff up to the budget, and counted "
+        "in the provider stats. Expose the settings through the existing config module and cover the "
+        "retry and timeout paths with unit tests."
+    ),
+}
+REPLAY_FIELDS = [
+    "ts", "template", "step", "step_index", "model", "preset", "format", "repeat", "ok", "error",
+    "latency_s", "ttft_s", "decode_tps", "prompt_tokens", "tokens", "token_source", "cached",
+    "finish_reason", "runaway", "output_chars", "score",
+]
+
+
+def template_dir() -> Path:
+    return Path('templates')
+
+
+class TemplateError(Exception):
+    pass
+
+
+@dataclass
+class ReasonStep:
+    id: str
+    prompt: str
+    context: str = ""
+
+
+@dataclass
+class ReasonTemplate:
+    name: str
+    path: Path
+    steps: List[ReasonStep] = field(default_factory=list)
+    description: str = ""
+
+    @property
+    def params(self) -> List[str]:
+        """Placeholders the caller has to supply (not filled from earlier steps)."""
+        names = set()
+        for step in self.steps:
+            for text in (step.prompt, step.context):
+                for key in _PLACEHOLDER.findall(text):
+                    if key != "previous_step_output" and not _STEP_OUTPUT.fullmatch(key):
+                        names.add(key)
+        return sorted(names)
+
+
+# ===== Loading =====
+
+def _scalar(value: str) -> Any:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    return {"true": True, "false": False, "null": None, "~": None}.get(value, value)
+
+
+def _parse_simple_yaml(text: str) -> Any:
+    """Mappings, lists of mappings, plain and ``|`` block scalars - enough for templates/*.yaml."""
+    lines = [ln.rstrip("\n") for ln in text.splitlines()]
+    pos = 0
+
+    def indent_of(line: str) -> int:
+        return len(line) - len(line.lstrip(" "))
+
+    def skip_blank() -> None:
+        nonlocal pos
+        while pos < len(lines) and (not lines[pos].strip() or lines[pos].lstrip().startswith("#")):
+            pos += 1
+
+    def block_scalar(parent: int) -> str:
+        nonlocal pos
+        body: List[str] = []
+        newline = "\n"
+        indent = None
+        while pos < len(lines):
+            line = lines[pos]
+            if line.strip():
+                if indent_of(line) <= parent:
+                    break
+                indent = indent if indent is not None else indent_of(line)
+                body.append(line[indent:])
+            else:
+                body.append("")
+            pos += 1
+        if pos >= len(lines) and not text.endswith("\n"):
+            newline = ""  # clipped like YAML: no line break after the last line of the file
+        while body and not body[-1]:
+            body.pop()
+        return "\n".join(body) + newline if body else ""
+
+    def value_after(rest: str, indent: int) -> Any:
+        if rest in ("|", "|-", ">"):
+            text = block_scalar(indent)
+            return text.rstrip("\n") if rest == "|-" else text
+        if rest:
+            return _scalar(rest)
+        skip_blank()
+        if pos < len(lines) and indent_of(lines[pos]) >= indent and lines[pos].lstrip().startswith("- "):
+            return node(indent_of(lines[pos]))
+        if pos < len(lines) and indent_of(lines[pos]) > indent:
+            return node(indent_of(lines[pos]))
+        return None
+
+    def mapping(indent: int, first: Optional[str] = None) -> Dict[str, Any]:
+        nonlocal pos
+        out: Dict[str, Any] = {}
+        while True:
+            if first is None:
+                skip_blank()
+                if pos >= len(lines) or indent_of(lines[pos]) != indent or lines[pos].lstrip().startswith("- "):
+                    return out
+                first = lines[pos].strip()
+                pos += 1
+            key, sep, rest = first.partition(":")
+            if not sep:
+                raise TemplateError(f"Expected 'key: value', got {first!r}")
+            out[key.strip()] = value_after(rest.strip(), indent)
+            first = None
+
+    def node(indent: int) -> Any:
+        nonlocal pos
+        skip_blank()
+        if pos < len(lines) and lines[pos].lstrip().startswith("- "):
+            items = []
+            while True:
+                skip_blank()
+                if pos >= len(lines) or indent_of(lines[pos]) != indent or not lines[pos].lstrip().startswith("- "):
+                    return items
+                item = lines[pos].strip()[2:].strip()
+                pos += 1
+                if ":" in item and not item.startswith(("'", '"')):
+                    items.append(mapping(indent + 2, item))
+                else:
+                    items.append(_scalar(item))
+        return mapping(indent)
+
+    return node(0)
+
+
+def _load_yaml(text: str) -> Any:
+    try:
+        import yaml
+    except ImportError:
+        return _parse_simple_yaml(text)
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ValueError(str(e)) from e
+
+
+def load_reason_template(path: Path) -> ReasonTemplate:
+    """The ``type: reason`` steps of one template file, in order (none for command-only templates)."""
+    path = Path(path)
+    try:
+        spec = _load_yaml(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise TemplateError(f"Cannot read template {path}: {e}") from e
+    if not isinstance(spec, dict):
+        raise TemplateError(f"Template {path} is empty or not an object")
+    if not isinstance(spec.get("steps"), list):
+        return ReasonTemplate(str(spec.get("name") or path.stem), path, [], str(spec.get("description") or ""))
+    steps = []
+    for i, step in enumerate(spec["steps"]):
+        if isinstance(step, dict) and step.get("type") == "reason" and step.get("prompt"):
+            steps.append(ReasonStep(str(step.get("id") or f"step{i + 1}"), str(step["prompt"]),
+                                    str(step.get("context") or "")))
+    return ReasonTemplate(str(spec.get("name") or path.stem), path, steps, str(spec.get("description") or ""))
+
+
+def load_reason_templates(paths: Optional[List[str]] = None) -> List[ReasonTemplate]:
+    """Templates with at least one reason step, from files/directories (default template_dir())."""
+    files: List[Path] = []
+    for p in [Path(x) for x in paths] if paths else [template_dir()]:
+        if p.is_dir():
+            files.extend(sorted(f for f in p.iterdir() if f.suffix in (".yaml", ".yml")))
+        elif p.exists():
+            files.append(p)
+        else:
+            raise TemplateError(f"Template {p} not found")
+    templates = [load_reason_template(f) for f in files]
+    return [t for t in templates if t.steps]
+
+
+def render_step(step: ReasonStep, values: Dict[str, str], outputs: Dict[str, str],
+                previous: str = "") -> Tuple[str, str]:
+    """(prompt, context) with placeholders filled; unknown names raise TemplateError."""
+    def sub(m: "re.Match[str]") -> str:
+        key = m.group(1)
+        if key == "previous_step_output":
+            return previous
+        ref = _STEP_OUTPUT.fullmatch(key)
+        if ref:
+            if ref.group(1) not in outputs:
+                raise TemplateError(f"Step {step.id} refers to {key} before that step ran")
+            return outputs[ref.group(1)]
+        if key in values:
+            return values[key]
+        if key in SAMPLE_PARAMS:
+            return SAMPLE_PARAMS[key]
+        raise TemplateError(f"Missing value for ${{{key}}} in step {step.id}")
+    return _PLACEHOLDER.sub(sub, step.prompt), _PLACEHOLDER.sub(sub, step.context)
+
+
+# ===== Scoring =====
+
+def reasoning_score(text: str, params: RequestParams, metrics: StreamMetrics) -> float:
+    """Cheap quality proxy for planning/review answers (0..1).
+
+    Rewards an answer that ended on its own, list/heading structure,
+    coverage of the prompt's longer terms and low word-level repetition.
+    """
+    if not text.strip():
+        return 0.0
+    score = 0.0
+    if metrics.finish_reason not in ("length", "runaway") and (params.max_tokens <= 0 or metrics.tokens < params.max_tokens):
+        score += 0.3
+    if _STRUCTURE.search(text):
+        score += 0.2
+    terms = set(_TERM.findall(params.user_prompt.lower()))
+    if terms:
+        covered = len(terms & set(_TERM.findall(text.lower()))) / len(terms)
+        score += 0.3 * min(1.0, covered / 0.5)
+    words = text.split()
+    score += 0.2 * (len(set(words)) / len(words) if words else 0.0)
+    return score
+
+
+# ===== Replay =====
+
+def replay_chain(template: ReasonTemplate, base: RequestParams, config: SweepConfig, repeat: int,
+                 values: Dict[str, str], score_fn: ScoreFn = reasoning_score,
+                 cache: Optional[ResponseCache] = None,
+                 history: Optional[RunHistory] = None) -> List[Dict[str, Any]]:
+    """Run the template's reason steps in order under one config; one row per step."""
+    rows: List[Dict[str, Any]] = []
+    outputs: Dict[str, str] = {}
+    previous = ""
+    for index, step in enumerate(template.steps):
+        row: Dict[str, Any] = {
+            "ts": round(time.time(), 3), "template": template.name, "step": step.id, "step_index": index,
+            "model": config.model, "preset": config.preset, "format": config.format_type, "repeat": repeat,
+        }
+        rows.append(row)
+        try:
+            prompt, context = render_step(step, values, outputs, previous)
+        except TemplateError as e:
+            row.update({"ok": False, "error": str(e)})
+            break
+        params = replace(base, system_prompt=context.strip(), user_prompt=prompt.strip())
+        try:
+            content, metrics = cached_chat_completion(params, cache)
+        except Exception as e:
+            row.update({"ok": False, "error": str(e)})
+            if history is not None:
+                history.record(history_row(params, config.preset, "replay", error=str(e)))
+            break
+        score = score_fn(content, params, metrics)
+        row.update({
+            "ok": True, "error": "",
+            "latency_s": round(metrics.total, 4),
+            "ttft_s": round(metrics.ttft, 4),
+            "decode_tps": round(metrics.decode_tps, 2),
+            "prompt_tokens": metrics.prompt_tokens,
+            "tokens": metrics.tokens,
+            "token_source": metrics.token_source,
+            "cached": metrics.cached,
+            "finish_reason": metrics.finish_reason,
+            "runaway": metrics.runaway,
+            "output_chars": len(content),
+            "score": round(score, 4),
+        })
+        if history is not None:
+            history.record(history_row(params, config.preset, "replay", content, metrics, score=row["score"]))
+        outputs[step.id] = previous = content
+    return rows
+
+
+def run_replay(
+    endpoint: str,
+    api_key: str,
+    templates: List[ReasonTemplate],
+    configs: List[SweepConfig],
+    values: Optional[Dict[str, str]] = None,
+    max_tokens: Optional[int] = None,
+    repeats: int = 1,
+    workers: int = 1,
+    score_fn: ScoreFn = reasoning_score,
+    on_row: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cache: Optional[ResponseCache] = None,
+    history: Optional[RunHistory] = None,
+) -> List[Dict[str, Any]]:
+    """Every template x config x repeat chain through a pool of `workers` (steps of a chain run in order)."""
+    store = preset_store()
+    jobs = []
+    for template, config, rep in itertools.product(templates, configs, range(repeats)):
+        base = make_params(endpoint, api_key, config.model, resolve_preset(config.preset, store),
+                           config.format_type, "", "", max_tokens)
+        jobs.append((template, base, config, rep))
+    rows: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(replay_chain, *job, values=values or {}, score_fn=score_fn,
+                               cache=cache, history=history) for job in jobs]
+        for fut in as_completed(futures):
+            for row in fut.result():
+                rows.append(row)
+                if on_row:
+                    on_row(row)
+    return rows
+
+
+# ===== Reporting =====
+
+def summarize_replay(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per template / step / config: latency, TTFT and tok/s percentiles (cache hits excluded) and the mean score."""
+    groups: Dict[Tuple[str, int, str, str, str, str], List[Dict[str, Any]]] = {}
+    for r in rows:
+        groups.setdefault((r["template"], r["step_index"], r["step"], r["model"], r["preset"], r["format"]), []).append(r)
+    summary = []
+    for (template, index, step, model, preset, fmt), items in sorted(groups.items()):
+        ok = [r for r in items if r.get("ok")]
+        timed = [r for r in ok if not r.get("cached")]
+        entry: Dict[str, Any] = {"template": template, "step_index": index, "step": step, "model": model,
+                                 "preset": preset, "format": fmt, "runs": len(items), "errors": len(items) - len(ok),
+                                 "cached": len(ok) - len(timed)}
+        for key in ("latency_s", "ttft_s", "decode_tps", "tokens"):
+            values = [float(r[key]) for r in (ok if key == "tokens" else timed)]
+            entry[f"{key}_p50"] = round(percentile(values, 50), 4)
+            entry[f"{key}_p95"] = round(percentile(values, 95), 4)
+        entry["score_mean"] = round(sum(float(r["score"]) for r in ok) / len(ok), 4) if ok else 0.0
+        summary.append(entry)
+    return summary
+
+
+def recommend_presets(rows: List[Dict[str, Any]], threshold: float = 0.7) -> List[Dict[str, Any]]:
+    """Per template and model, the fastest preset/format whose every step averages >= `threshold`.
+
+    Speed is the median latency of complete chains (sum of the step
+    latencies of one repeat) with no cached step; a config with only
+    cached chains has ``chain_latency_p50`` None and ranks after timed
+    ones. Entries without a qualifying config carry the best-scoring one
+    instead, with ``meets_threshold`` False.
+    """
+    chains: Dict[Tuple[str, str, str, str], Dict[int, List[Dict[str, Any]]]] = {}
+    for r in rows:
+        chains.setdefault((r["template"], r["model"], r["preset"], r["format"]), {}).setdefault(r["repeat"], []).append(r)
+    candidates: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for (template, model, preset, fmt), by_repeat in chains.items():
+        steps = max(len(v) for v in by_repeat.values())
+        complete = [v for v in by_repeat.values() if len(v) == steps and all(r.get("ok") for r in v)]
+        step_scores: Dict[str, List[float]] = {}
+        for chain in complete:
+            for r in chain:
+                step_scores.setdefault(r["step"], []).append(float(r["score"]))
+        means = {s: sum(v) / len(v) for s, v in step_scores.items()}
+        timed = [c for c in complete if not any(r.get("cached") for r in c)]
+        candidates.setdefault((template, model), []).append({
+            "template": template, "model": model, "preset": preset, "format": fmt,
+            "chains": len(complete), "failed_chains": len(by_repeat) - len(complete),
+            "cached_chains": len(complete) - len(timed),
+            "chain_latency_p50": (round(percentile([sum(float(r["latency_s"]) for r in c) for c in timed], 50), 4)
+                                  if timed else None),
+            "min_step_score": round(min(means.values()), 4) if means else 0.0,
+            "step_scores": {s: round(v, 4) for s, v in means.items()},
+        })
+    recommendations = []
+    for (template, model), options in sorted(candidates.items()):
+        passing = [o for o in options if o["chains"] and o["min_step_score"] >= threshold]
+        if passing:
+            best = dict(min(passing, key=lambda o: (o["chain_latency_p50"] is None, o["chain_latency_p50"] or 0.0,
+                                                    -o["min_step_score"])), meets_threshold=True)
+        else:
+            best = dict(max(options, key=lambda o: o["min_step_score"]), meets_threshold=False)
+        best["threshold"] = threshold
+        best["considered"] = len(options)
+        recommendations.append(best)
+    return recommendations
+
+
+def format_replay_summary(summary: List[Dict[str, Any]]) -> str:
+    lines = [f"{'template / step':<32} {'configuration':<40} {'runs':>4} {'err':>3}  "
+             f"{'latency p50/p95':>15}  {'TTFT p50':>8}  {'tok/s p50':>9}  {'toks p50':>8}  {'score':>5}"]
+    for e in summary:
+        label = f"{e['template']} / {e['step']}"
+        config = f"{e['model']} | {e['preset']} | {e['format']}"
+        if e["runs"] - e["errors"] - e.get("cached", 0) > 0:
+            timings = (f"{e['latency_s_p50']:>7.2f}/{e['latency_s_p95']:>7.2f}  {e['ttft_s_p50']:>8.2f}  "
+                       f"{e['decode_tps_p50']:>9.1f}")
+        else:
+            timings = f"{'-':>15}  {'-':>8}  {'-':>9}"
+        lines.append(f"{label[:32]:<32} {config[:40]:<40} {e['runs']:>4} {e['errors']:>3}  {timings}  "
+                     f"{e['tokens_p50']:>8.0f}  {e['score_mean']:>5.2f}"
+                     + (f"  cached {e['cached']} (not timed)" if e.get("cached") else ""))
+    return "\n".join(lines)
+
+
+def format_recommendations(recommendations: List[Dict[str, Any]]) -> str:
+    lines = []
+    for r in recommendations:
+        head = f"{r['template']} on {r['model']}: "
+        if r["meets_threshold"]:
+            latency = (f"chain {r['chain_latency_p50']:.2f}s p50" if r["chain_latency_p50"] is not None
+                       else "chain latency not measured (all cached)")
+            lines.append(f"{head}{r['preset']} ({r['format']}) - {latency}, "
+                         f"min step score {r['min_step_score']:.2f} >= {r['threshold']:g} "
+                         f"({r['considered']} configs tried)")
+        else:
+            lines.append(f"{head}no config reaches {r['threshold']:g}; best is {r['preset']} ({r['format']}) "
+                         f"with min step score {r['min_step_score']:.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,292 @@
+"""
+Runaway detection for streamed generations.
+
+A RunawayGuard watches the deltas of one stream and trips when the output
+stops being useful, so stream_chat_completion can drop the connection
+instead of letting LM Studio decode to ``max_tokens``:
+
+- loop: the tail is the same block of words repeated (a period of up to
+  ``loop_max_period`` words, at least ``loop_min_repeats`` times and
+  ``loop_min_words`` words in total); the first copy is kept
+- stale: the output grows without new content - under ``stale_min_novel``
+  of the last ``stale_window`` word n-grams are new, or ``blank_deltas``
+  deltas in a row carry no letters or digits
+- filler: the answer is complete and the model keeps going - a leaked
+  special token (``<|im_end|>`` ...) or a line opening a new turn
+  (``User:``, ``[INST]`` ...), cut before it, or more than
+  ``filler_grace`` words of prose after a sign-off like "hope this helps"
+  (a code block opened after the sign-off resets it)
+
+Inside a fenced code block only the blank-delta check applies: grids,
+tables and quoted chat templates repeat or contain markers legitimately.
+
+Loop detection keeps one counter per period (words equal to the word that
+many positions back), so each word costs O(loop_max_period). RUNAWAY is
+the process-wide default for interactive runs (``--no-runaway-guard``
+turns it off); sweep, bench and autotune measure full generations unless
+given ``--runaway-guard``.
+
+recommend_limits() reads the run history and suggests, per preset, a
+``max_tokens`` from the lengths of completions that ended on their own
+and the stop sequences the guards saw leaking.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .metrics import percentile
+
+SPECIAL_TOKENS = ("<|im_end|>", "<|im_start|>", "<|eot_id|>", "<|start_header_id|>", "<|endoftext|>")
+TURN_MARKERS = ("[INST]", "\nUser:", "\nHuman:", "\n### Instruction", "\n### User")  # only at the start of a line
+LEAK_MARKERS = SPECIAL_TOKENS + TURN_MARKERS
+_SIGN_OFF = re.compile(r"\b(hope (this|that|it) helps|let me know if you|happy coding|feel free to (ask|reach out))\b",
+                       re.I)
+_WORD = re.compile(r"\S+")
+_TAIL = max(len(m) for m in SPECIAL_TOKENS) - 1
+
+
+@dataclass
+class RunawayConfig:
+    enabled: bool = True
+    loop_max_period: int = 64
+    loop_min_repeats: int = 3
+    loop_min_words: int = 40
+    stale_ngram: int = 4
+    stale_window: int = 160
+    stale_min_novel: float = 0.15
+    blank_deltas: int = 64
+    filler_grace: int = 60
+
+
+RUNAWAY = RunawayConfig()
+
+
+class RunawayGuard:
+    """Feed it each streamed delta; feed() returns the guard that tripped, or ""."""
+
+    def __init__(self, config: Optional[RunawayConfig] = None):
+        self.config = config or RUNAWAY
+        self.reason = ""  # "loop", "stale" or "filler" once tripped
+        self.detail = ""
+        self.keep = 0  # characters of the output worth keeping
+        self._chars = 0
+        self._words: List[str] = []
+        self._word_ends: List[int] = []
+        self._partial = ""  # trailing word that may continue in the next delta
+        self._match = [0] * (self.config.loop_max_period + 1)
+        self._seen: Set[int] = set()
+        self._novel: Deque[int] = deque()
+        self._novel_sum = 0
+        self._blank = 0
+        self._tail = ""
+        self._line = ""
+        self._in_code = False
+        self._sign_off_at = -1  # word count when the sign-off line ended
+        self._sign_off_end = 0
+
+    @property
+    def tripped(self) -> bool:
+        return bool(self.reason)
+
+    def feed(self, text: str) -> str:
+        if self.reason or not text:
+            return self.reason
+        start = self._chars
+        self._chars += len(text)
+        self.keep = self._chars
+        if not any(ch.isalnum() for ch in text):
+            self._blank += 1
+            if self._blank >= self.config.blank_deltas:
+                return self._trip("stale", f"{self._blank} deltas without text", self._chars)
+        else:
+            self._blank = 0
+        lines = self._split_lines(text, start)
+        if self._check_leak(text, start, lines):
+            return self.reason
+        buf = self._partial + text
+        offset = start - len(self._partial)
+        matches = list(_WORD.finditer(buf))
+        self._partial = ""
+        if matches and matches[-1].end() == len(buf):
+            self._partial = matches[-1].group()  # may be cut mid-word
+            matches.pop()
+        for m in matches:
+            end = offset + m.end()
+            while lines and lines[0][0] <= end:  # lines that ended before this word
+                if self._end_line(*lines.pop(0)):
+                    return self.reason
+            if self._add_word(m.group(), end):
+                return self.reason
+        for end, line in lines:
+            if self._end_line(end, line):
+                break
+        return self.reason
+
+    def _trip(self, reason: str, detail: str, keep: int) -> str:
+        self.reason, self.detail, self.keep = reason, detail, max(0, keep)
+        return reason
+
+    def _split_lines(self, text: str, start: int) -> List[Tuple[int, str]]:
+        """Lines completed by `text`, as (offset just past the newline, line)."""
+        parts = (self._line + text).split("\n")
+        pos = start - len(self._line)
+        self._line = parts.pop()
+        out = []
+        for line in parts:
+            pos += len(line) + 1
+            out.append((pos, line))
+        return out
+
+    def _code_at(self, lines: List[Tuple[int, str]], pos: int) -> bool:
+        in_code = self._in_code
+        for end, line in lines:
+            if end > pos:
+                break
+            if _is_fence(line):
+                in_code = not in_code
+        return in_code
+
+    def _check_leak(self, text: str, start: int, lines: List[Tuple[int, str]]) -> bool:
+        window = self._tail + text
+        base = start - len(self._tail)
+        self._tail = window[-_TAIL:]
+        # Only markers ending in this delta; ones inside the tail were judged last time.
+        hits = sorted((window.find(m, max(0, start - base - len(m) + 1)), m) for m in SPECIAL_TOKENS)
+        for pos, marker in hits:
+            if pos >= 0 and not self._code_at(lines, base + pos):  # code may quote a chat template
+                self._trip("filler", f"leaked {marker!r}", base + pos)
+                return True
+        return False
+
+    def _add_word(self, word: str, end: int) -> bool:
+        cfg = self.config
+        words = self._words
+        words.append(word)
+        self._word_ends.append(end)
+        n = len(words)
+        if self._in_code:
+            return False  # grids, tables and literals repeat legitimately; max_tokens still bounds the block
+        for p in range(1, min(cfg.loop_max_period, n - 1) + 1):
+            self._match[p] = self._match[p] + 1 if words[-1] == words[-1 - p] else 0
+            run = self._match[p]
+            if run >= p * (cfg.loop_min_repeats - 1) and run + p >= cfg.loop_min_words:
+                first = n - run - p  # index of the first word of the first copy
+                repeats = (run + p) / p
+                return bool(self._trip("loop", f"{repeats:.0f}x a {p}-word block",
+                                       self._word_ends[first + p - 1]))
+        if n >= cfg.stale_ngram:
+            novel = hash(tuple(words[-cfg.stale_ngram:]))
+            is_new = int(novel not in self._seen)
+            self._seen.add(novel)
+            self._novel.append(is_new)
+            self._novel_sum += is_new
+            if len(self._novel) > cfg.stale_window:
+                self._novel_sum -= self._novel.popleft()
+                share = self._novel_sum / cfg.stale_window
+                if share < cfg.stale_min_novel:
+                    return bool(self._trip("stale", f"{share:.0%} new {cfg.stale_ngram}-grams "
+                                                    f"in the last {cfg.stale_window} words", self._chars))
+        if self._sign_off_at >= 0 and n - self._sign_off_at > self.config.filler_grace:
+            return bool(self._trip("filler", f"{n - self._sign_off_at} words after a sign-off",
+                                   self._sign_off_end))
+        return False
+
+    def _end_line(self, end: int, line: str) -> bool:
+        if _is_fence(line):
+            self._in_code = not self._in_code
+            self._match = [0] * len(self._match)  # no loop spans a fence
+            if self._in_code:
+                self._sign_off_at = -1  # more code after the sign-off: not filler yet
+            return False
+        if self._in_code:
+            return False
+        start = end - len(line) - 1
+        marker = _turn_marker(line)
+        if marker and start > 0:
+            return bool(self._trip("filler", f"leaked {marker!r}", start))
+        if self._sign_off_at < 0 and _SIGN_OFF.search(line):
+            self._sign_off_at = len(self._words)
+            self._sign_off_end = end
+        return False
+
+
+def _is_fence(line: str) -> bool:
+    return line.strip().startswith("```")
+
+
+def _turn_marker(line: str) -> str:
+    head = line.lstrip()
+    return next((m for m in TURN_MARKERS if head.startswith(m.lstrip("\n"))), "")
+
+
+@dataclass
+class LimitAdvice:
+    preset: str
+    runs: int
+    natural: int  # ended on their own: not capped by max_tokens, not stopped by a guard
+    capped: int
+    tokens_p50: float = 0.0
+    tokens_p95: float = 0.0
+    max_tokens: Optional[int] = None
+    stop: List[str] = field(default_factory=list)
+    stops_by_guard: Dict[str, int] = field(default_factory=dict)
+    saved_by_guard: Dict[str, int] = field(default_factory=dict)
+    note: str = ""
+
+
+def recommend_limits(rows: List[Dict[str, Any]], headroom: float = 1.25, round_to: int = 64,
+                     min_runs: int = 5) -> List[LimitAdvice]:
+    """max_tokens (p95 of natural completion lengths x headroom) and stop sequences per preset.
+
+    `rows` are RunHistory.query() rows; cached and failed runs are ignored.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        if r.get("ok") and not r.get("cached"):
+            groups.setdefault(r.get("preset") or "", []).append(r)
+    advice = []
+    for preset, items in sorted(groups.items()):
+        natural = [float(r["tokens"]) for r in items
+                   if r.get("tokens") and not r.get("runaway") and r.get("finish_reason") != "length"]
+        a = LimitAdvice(preset, len(items), len(natural),
+                        sum(1 for r in items if r.get("finish_reason") == "length" and not r.get("runaway")))
+        leaks: Dict[str, int] = {}
+        for r in items:
+            if not r.get("runaway"):
+                continue
+            guard = str(r["runaway"]).split(":", 1)[0]
+            a.stops_by_guard[guard] = a.stops_by_guard.get(guard, 0) + 1
+            a.saved_by_guard[guard] = a.saved_by_guard.get(guard, 0) + int(r.get("runaway_saved") or 0)
+            for marker in LEAK_MARKERS:
+                if repr(marker) in str(r["runaway"]):
+                    leaks[marker] = leaks.get(marker, 0) + 1
+        a.stop = sorted(leaks, key=lambda m: -leaks[m])
+        if natural:
+            a.tokens_p50, a.tokens_p95 = percentile(natural, 50), percentile(natural, 95)
+        if len(natural) >= min_runs:
+            a.max_tokens = max(round_to, int(math.ceil(a.tokens_p95 * headroom / round_to)) * round_to)
+        else:
+            a.note = f"only {len(natural)} natural completions; need {min_runs}"
+        if a.capped > len(items) * 0.2:
+            a.note = f"{a.capped}/{len(items)} runs hit max_tokens without a guard tripping; lengths are censored"
+        elif a.stops_by_guard.get("loop", 0) + a.stops_by_guard.get("stale", 0) > len(items) * 0.2:
+            a.note = "frequent loops; consider a higher repetition_penalty"
+        advice.append(a)
+    return advice
+
+
+def format_limit_advice(advice: List[LimitAdvice]) -> str:
+    lines = [f"{'preset':<20} {'runs':>5} {'natural':>7} {'p50':>6} {'p95':>6} {'max_tokens':>10}  "
+             f"{'guard stops (tokens saved)':<32} stop"]
+    for a in advice:
+        guards = ", ".join(f"{g} {n} ({a.saved_by_guard.get(g, 0)})" for g, n in sorted(a.stops_by_guard.items()))
+        rec = str(a.max_tokens) if a.max_tokens else "-"
+        lines.append(f"{a.preset[:20]:<20} {a.runs:>5} {a.natural:>7} {a.tokens_p50:>6.0f} {a.tokens_p95:>6.0f} "
+                     f"{rec:>10}  {guards or '-':<32} {', '.join(repr(s) for s in a.stop) or '-'}")
+        if a.note:
+            lines.append(f"{'':<20} note: {a.note}")
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+"""
+Headless benchmark sweep: models x presets x prompt formats x prompts.
+"""
+from __future__ import annotations
+
+import hashlib
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import ResponseCache, cached_chat_completion
+from .codeexec import CodeExecutor
+from .formatting import RequestParams
+from .history import RunHistory, history_row
+from .metrics import percentile
+from .presets import DEFAULT_SYSTEM_PROMPT, make_params, preset_store, resolve_preset
+
+
+@dataclass
+class SweepConfig:
+    model: str
+    preset: str
+    format_type: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.model} | {self.preset} | {self.format_type}"
+
+
+def output_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+SWEEP_FIELDS = [
+    "ts", "model", "preset", "format", "prompt_index", "repeat", "ok", "error",
+    "latency_s", "ttft_s", "prefill_s", "prefill_tps", "decode_tps", "prompt_tokens", "tokens",
+    "token_source", "cached", "output_chars", "output_hash", "finish_reason", "runaway", "runaway_saved",
+    "score", "exec_ok", "exec_tests", "exec_failed", "exec_runtime_s", "exec_error",
+]
+
+
+def run_one(params: RequestParams, config: SweepConfig, prompt_index: int, repeat: int,
+            cache: Optional[ResponseCache] = None, history: Optional[RunHistory] = None,
+            executor: Optional[CodeExecutor] = None, runaway_guard: bool = False) -> Dict[str, Any]:
+    row: Dict[str, Any] = {
+        "ts": round(time.time(), 3),
+        "model": config.model,
+        "preset": config.preset,
+        "format": config.format_type,
+        "prompt_index": prompt_index,
+        "repeat": repeat,
+    }
+    try:
+        content, metrics = cached_chat_completion(params, cache, guard=runaway_guard)
+    except Exception as e:
+        row.update({"ok": False, "error": str(e)})
+        if history is not None:
+            history.record(history_row(params, config.preset, "sweep", error=str(e)))
+        return row
+    row.update({
+        "ok": True,
+        "error": "",
+        "latency_s": round(metrics.total, 4),
+        "ttft_s": round(metrics.ttft, 4),
+        "prefill_s": round(metrics.prefill, 4),
+        "prefill_tps": round(metrics.prefill_tps, 1),
+        "decode_tps": round(metrics.decode_tps, 2),
+        "prompt_tokens": metrics.prompt_tokens,
+        "tokens": metrics.tokens,
+        "token_source": metrics.token_source,
+        "cached": metrics.cached,
+        "output_chars": len(content),
+        "output_hash": output_hash(content),
+        "finish_reason": metrics.finish_reason,
+        "runaway": metrics.runaway,
+        "runaway_saved": metrics.runaway_saved,
+    })
+    quality: Dict[str, Any] = {}
+    if executor is not None:
+        quality = executor.run(content).fields()
+        row.update(quality)
+    if history is not None:
+        history.record(history_row(params, config.preset, "sweep", content, metrics, **quality))
+    return row
+
+
+def run_sweep(
+    endpoint: str,
+    api_key: str,
+    configs: List[SweepConfig],
+    prompts: List[str],
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+    max_tokens: Optional[int] = None,
+    workers: int = 1,
+    repeats: int = 1,
+    on_row: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cache: Optional[ResponseCache] = None,
+    history: Optional[RunHistory] = None,
+    executor: Optional[CodeExecutor] = None,
+    runaway_guard: bool = False,
+) -> List[Dict[str, Any]]:
+    """Run every config x prompt x repeat through a thread pool of `workers`.
+
+    With `executor`, each response's code is run and scored as well.
+    Generations run to completion unless `runaway_guard` is set, so the
+    timings measure the settings rather than the guard.
+    """
+    store = preset_store()
+    jobs = []
+    for config, (pi, prompt), rep in itertools.product(configs, enumerate(prompts), range(repeats)):
+        preset = resolve_preset(config.preset, store)
+        params = make_params(endpoint, api_key, config.model, preset, config.format_type,
+                             system_prompt, prompt, max_tokens)
+        jobs.append((params, config, pi, rep))
+
+    rows: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(run_one, *job, cache=cache, history=history, executor=executor,
+                               runaway_guard=runaway_guard) for job in jobs]
+        for fut in as_completed(futures):
+            row = fut.result()
+            rows.append(row)
+            if on_row:
+                on_row(row)
+    return rows
+
+
+def summarize_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault((row["model"], row["preset"], row["format"]), []).append(row)
+    summary = []
+    for (model, preset, fmt), items in groups.items():
+        ok = [r for r in items if r.get("ok")]
+        timed = [r for r in ok if not r.get("cached")]  # cache hits take ~0s and would drag the percentiles down
+        entry: Dict[str, Any] = {"model": model, "preset": preset, "format": fmt,
+                                 "runs": len(items), "errors": len(items) - len(ok), "cached": len(ok) - len(timed)}
+        for key in ("latency_s", "ttft_s", "decode_tps"):
+            values = [float(r[key]) for r in timed]
+            for pct in (50, 95, 99):
+                entry[f"{key}_p{pct}"] = round(percentile(values, pct), 4)
+        executed = [r for r in ok if r.get("exec_ok") is not None]
+        if any("score" in r for r in ok):
+            entry["score_p50"] = round(percentile([float(r.get("score") or 0) for r in ok], 50), 4)
+            entry["exec_pass_rate"] = round(sum(bool(r["exec_ok"]) for r in executed) / len(ok), 4)
+        stopped = [r for r in ok if r.get("runaway")]
+        if stopped:
+            entry["runaway_stops"] = len(stopped)
+            entry["runaway_saved"] = sum(int(r.get("runaway_saved") or 0) for r in stopped)
+        summary.append(entry)
+    return summary
+
+
+def format_summary(summary: List[Dict[str, Any]]) -> str:
+    lines = [
+        f"{'configuration':<48} {'runs':>4} {'err':>3}  "
+        f"{'latency p50/p95/p99 (s)':>24}  {'TTFT p50/p95/p99 (s)':>21}  {'tok/s p50/p95/p99':>19}"
+    ]
+    scored = any("exec_pass_rate" in e for e in summary)
+    if scored:
+        lines[0] += f"  {'pass':>5} {'score':>5}"
+    for e in summary:
+        label = f"{e['model']} | {e['preset']} | {e['format']}"
+        if e["runs"] - e["errors"] - e.get("cached", 0) > 0:
+            timings = (f"{e['latency_s_p50']:>7.2f}/{e['latency_s_p95']:>7.2f}/{e['latency_s_p99']:>7.2f}  "
+                       f"{e['ttft_s_p50']:>6.2f}/{e['ttft_s_p95']:>6.2f}/{e['ttft_s_p99']:>6.2f}  "
+                       f"{e['decode_tps_p50']:>5.1f}/{e['decode_tps_p95']:>5.1f}/{e['decode_tps_p99']:>5.1f}")
+        else:
+            timings = f"{'-':>24}  {'-':>21}  {'-':>19}"
+        lines.append(f"{label[:48]:<48} {e['runs']:>4} {e['errors']:>3}  {timings}")
+        if scored:
+            lines[-1] += f"  {e.get('exec_pass_rate', 0) * 100:>4.0f}% {e.get('score_p50', 0):>5.2f}"
+        if e.get("runaway_stops"):
+            lines[-1] += f"  stopped {e['runaway_stops']} (~{e['runaway_saved']} toks saved)"
+        if e.get("cached"):
+            lines[-1] += f"  cached {e['cached']} (not timed)"
+    return "\n".join(lines)
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lmstudio_tuner.formatting import RequestParams  # noqa: E402
+
+
+@pytest.fixture
+def make_params():
+    def make(**overrides: Any) -> RequestParams:
+        values: dict = dict(endpoint="http://127.0.0.1:1234", api_key="", model="mock-small", temperature=0.0,
+                            top_p=1.0, presence_penalty=0.0, frequency_penalty=0.0, repetition_penalty=1.0,
+                            max_tokens=200, format_type="None", system_prompt="You are terse.", user_prompt="Hi")
+        values.update(overrides)
+        return RequestParams(**values)
+    return make
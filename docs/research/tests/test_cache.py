@@ -0,0 +1,54 @@
+import threading
+
+from lmstudio_tuner.cache import ResponseCache
+from lmstudio_tuner.formatting import TokenUsage
+
+
+def test_put_then_get_round_trips(tmp_path, make_params):
+    cache = ResponseCache(tmp_path)
+    params = make_params()
+    assert cache.get(params) is None
+    cache.put(params, "hello", TokenUsage(12, 3, "usage"))
+    entry = cache.get(params)
+    assert entry["content"] == "hello"
+    assert (entry["prompt_tokens"], entry["completion_tokens"], entry["token_source"]) == (12, 3, "usage")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_any_parameter_change_is_a_miss(tmp_path, make_params):
+    cache = ResponseCache(tmp_path)
+    cache.put(make_params(), "hello", TokenUsage(1, 1, "usage"))
+    assert cache.get(make_params(max_tokens=201)) is None
+    assert cache.get(make_params(user_prompt="Hi!")) is None
+
+
+def test_entries_survive_a_new_instance(tmp_path, make_params):
+    ResponseCache(tmp_path).put(make_params(), "from disk", TokenUsage(1, 2, "usage"))
+    assert ResponseCache(tmp_path).get(make_params())["content"] == "from disk"
+
+
+def test_only_deterministic_requests_are_cacheable(tmp_path, make_params):
+    assert ResponseCache(tmp_path).cacheable(make_params(temperature=0.0))
+    assert not ResponseCache(tmp_path).cacheable(make_params(temperature=0.7))
+    assert ResponseCache(tmp_path, deterministic_only=False).cacheable(make_params(temperature=0.7))
+
+
+def test_concurrent_puts_of_one_key_leave_no_temp_files(tmp_path, make_params):
+    cache = ResponseCache(tmp_path)
+    params = make_params()
+    errors = []
+
+    def put(i):
+        try:
+            cache.put(params, f"writer {i}", TokenUsage(1, 1, "usage"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert list(tmp_path.rglob("*.tmp")) == []
+    assert ResponseCache(tmp_path).get(params)["content"].startswith("writer ")
@@ -0,0 +1,36 @@
+import socket
+import threading
+
+import pytest
+import requests
+
+from lmstudio_tuner.client import stream_chat_completion
+from lmstudio_tuner.metrics import STATS
+
+
+@pytest.fixture
+def cut_off_server():
+    """Answers once with a Content-Length body and closes after the first event."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen()
+
+    def serve():
+        conn, _ = srv.accept()
+        with conn:
+            conn.recv(65536)
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nContent-Length: 5000\r\n\r\n"
+                         b'data: {"choices":[{"delta":{"content":"hi"}}]}\n\n')
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.getsockname()[1]}"
+    thread.join(5)
+    srv.close()
+
+
+def test_stream_cut_off_mid_body_raises_a_requests_error(cut_off_server, make_params):
+    failed = STATS.failedRequests
+    with pytest.raises(requests.RequestException):
+        stream_chat_completion(make_params(endpoint=cut_off_server), guard=False)
+    assert STATS.failedRequests == failed + 1
@@ -0,0 +1,22 @@
+from lmstudio_tuner.codeexec import python_source
+
+
+def test_python_source_joins_tagged_blocks():
+    text = "A:\n```python\nx = 1\n```\nB:\n```py\nprint(x)\n```\n"
+    assert python_source(text) == "x = 1\n\n\nprint(x)\n"
+
+
+def test_python_source_skips_other_languages_and_sample_output():
+    text = ("```python\ndef f(x):\n    return x + 1\n```\n"
+            "Output:\n```\n2\n>>> f(1)\n```\n"
+            "Run it:\n```bash\npython f.py\n```\n")
+    assert python_source(text) == "def f(x):\n    return x + 1\n"
+
+
+def test_python_source_keeps_untagged_blocks_that_compile():
+    text = "```python\ndef f(x):\n    return x + 1\n```\nTest:\n```\nassert f(1) == 2\n```\n"
+    assert python_source(text) == "def f(x):\n    return x + 1\n\n\nassert f(1) == 2\n"
+
+
+def test_python_source_without_code_is_empty():
+    assert python_source("No code here.") == ""
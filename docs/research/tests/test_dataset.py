@@ -0,0 +1,56 @@
+import json
+
+from lmstudio_tuner.dataset import DatasetProgress, Watermark, _replay_results
+
+
+def test_watermark_advances_over_out_of_order_rows():
+    marks = Watermark()
+    for index in (2, 0, 3):
+        marks.add(index)
+    assert marks.value == 1
+    assert marks.done == {2, 3}
+    assert 3 in marks and 1 not in marks
+    marks.add(1)
+    assert marks.value == 4
+    assert marks.done == set()
+
+
+def test_watermark_ignores_rows_below_the_mark():
+    marks = Watermark(5, {7})
+    marks.add(3)
+    assert marks.value == 5
+    assert marks.done == {7}
+
+
+def test_replay_results_folds_rows_and_truncates_a_torn_row(tmp_path):
+    results = tmp_path / "results.jsonl"
+    rows = [{"index": 0, "ok": True, "tokens": 10},
+            {"index": 2, "ok": False, "error": "boom"},
+            {"index": 1, "skipped": True}]
+    good = "".join(json.dumps(r) + "\n" for r in rows)
+    results.write_text(good + '{"index": 3, "ok": tr', encoding="utf-8")
+
+    marks, progress = Watermark(), DatasetProgress(total=10)
+    _replay_results(results, 0, marks, progress)
+
+    assert results.read_text(encoding="utf-8") == good
+    assert marks.value == 3
+    assert (progress.done, progress.ok, progress.failed, progress.skipped, progress.tokens) == (3, 1, 1, 1, 10)
+
+
+def test_replay_results_starts_at_offset(tmp_path):
+    results = tmp_path / "results.jsonl"
+    first = json.dumps({"index": 0, "ok": True, "tokens": 5}) + "\n"
+    results.write_text(first + json.dumps({"index": 1, "ok": True, "tokens": 7}) + "\n", encoding="utf-8")
+
+    marks, progress = Watermark(1), DatasetProgress(total=2)
+    _replay_results(results, len(first.encode("utf-8")), marks, progress)
+
+    assert marks.value == 2
+    assert (progress.done, progress.tokens) == (1, 7)
+
+
+def test_replay_results_without_a_file_is_a_no_op(tmp_path):
+    progress = DatasetProgress(total=1)
+    _replay_results(tmp_path / "missing.jsonl", 0, Watermark(), progress)
+    assert progress.done == 0
@@ -0,0 +1,45 @@
+import json
+import threading
+
+import requests
+
+from lmstudio_tuner import profiling
+from lmstudio_tuner.metrics import StreamMetrics
+
+
+def test_a_model_that_fails_to_load_does_not_stop_the_profile(monkeypatch):
+    def probe(endpoint, api_key, model):
+        if model == "broken":
+            raise requests.HTTPError("500 Server Error")
+        return StreamMetrics(ttft=0.5, total=1.0)
+
+    monkeypatch.setattr(profiling, "_probe", probe)
+    monkeypatch.setattr(profiling, "fetch_model_states", lambda endpoint, api_key: {})
+    results = profiling.profile_model_load("http://127.0.0.1:1", "", ["a", "broken", "b"], warm_runs=1)
+
+    assert [p.model for p in results] == ["a", "broken", "b"]
+    assert results[1].error == "500 Server Error"
+    assert "failed" in profiling.format_load_profile(results[1])
+    assert not results[0].error and results[2].warm_ttft == 0.5
+
+
+def test_concurrent_catalog_saves_keep_one_valid_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    errors = []
+
+    def save(i):
+        try:
+            for _ in range(20):
+                profiling.save_model_catalog(f"http://host-{i}", [f"model-{i}"])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    path = profiling.model_catalog_path()
+    assert list(path.parent.glob("*.tmp")) == []
+    assert isinstance(json.loads(path.read_text(encoding="utf-8")), dict)
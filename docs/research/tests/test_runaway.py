@@ -0,0 +1,65 @@
+import pytest
+
+from lmstudio_tuner.runaway import RunawayGuard
+
+
+def feed(text, step=None):
+    """Stream `text` through a fresh guard, `step` characters per delta."""
+    guard = RunawayGuard()
+    chunks = [text] if step is None else [text[i:i + step] for i in range(0, len(text), step)]
+    for chunk in chunks:
+        if guard.feed(chunk):
+            break
+    return guard
+
+
+@pytest.mark.parametrize("step", [None, 2, 7])
+def test_loop_trips_and_keeps_first_copy(step):
+    text = "Here is the answer. " + "the cat sat on the mat and then it sat again . " * 12
+    guard = feed(text, step)
+    assert guard.reason == "loop"
+    kept = text[:guard.keep]
+    assert kept.count("the cat sat on the mat") == 1
+
+
+@pytest.mark.parametrize("step", [None, 2])
+def test_repetitive_code_block_is_not_a_loop(step):
+    text = "Grid:\n```python\ngrid = [\n" + "    [0, 0, 0, 0, 0, 0, 0, 0],\n" * 30 + "]\n```\nDone."
+    assert not feed(text, step).tripped
+
+
+def test_html_strikethrough_is_not_a_leak():
+    assert not feed("Use <s> and </s> for strikethrough, e.g. <s>old</s> text.", 2).tripped
+
+
+def test_chat_template_quoted_in_code_is_not_a_leak():
+    text = "Template:\n```text\n<|im_start|>user\nhi<|im_end|>\n<|im_start|>assistant\n```\nThat is ChatML."
+    assert not feed(text, 2).tripped
+
+
+@pytest.mark.parametrize("step", [None, 2, 5])
+def test_leaked_special_token_is_cut_before_the_token(step):
+    text = "The answer is 42.<|im_end|>\n<|im_start|>user\nmore"
+    guard = feed(text, step)
+    assert guard.reason == "filler"
+    assert text[:guard.keep] == "The answer is 42."
+
+
+@pytest.mark.parametrize("marker", ["User: and another question", "[INST] next"])
+def test_new_turn_at_line_start_trips(marker):
+    guard = feed(f"The answer is 42.\n{marker}\n", 2)
+    assert guard.reason == "filler"
+    assert guard.keep == len("The answer is 42.\n")
+
+
+@pytest.mark.parametrize("text", ["He said User: hi to me.\n", "Sure.\n\n```\nUser: hi\n```\nok\n"])
+def test_turn_marker_mid_line_or_in_code_does_not_trip(text):
+    assert not feed(text, 2).tripped
+
+
+def test_blank_deltas_trip_stale():
+    guard = RunawayGuard()
+    guard.feed("Answer:")
+    for _ in range(guard.config.blank_deltas):
+        guard.feed(" \n")
+    assert guard.reason == "stale"
@@ -0,0 +1,17 @@
+import sys
+
+import lmstudio_tuner_gui
+
+
+def test_unknown_names_miss_without_importing_tk(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tkinter", None)  # a headless box without Tk
+    monkeypatch.delitem(sys.modules, "lmstudio_tuner.gui", raising=False)
+    assert not hasattr(lmstudio_tuner_gui, "score_response")
+    assert getattr(lmstudio_tuner_gui, "no_such_name", "default") == "default"
+    assert "lmstudio_tuner.gui" not in sys.modules
+
+
+def test_package_exports_resolve_through_the_shim():
+    from lmstudio_tuner.formatting import apply_prompt_format
+
+    assert lmstudio_tuner_gui.apply_prompt_format is apply_prompt_format
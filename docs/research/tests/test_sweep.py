@@ -0,0 +1,30 @@
+from lmstudio_tuner.sweep import format_summary, summarize_rows
+
+
+def row(latency, ok=True, cached=False, preset="Balanced"):
+    return {"model": "m", "preset": preset, "format": "None", "ok": ok, "cached": cached,
+            "latency_s": latency, "ttft_s": latency / 4, "decode_tps": 50.0}
+
+
+def test_summarize_rows_groups_and_counts_errors():
+    summary = summarize_rows([row(1.0), row(2.0, ok=False), row(1.0, preset="Fast")])
+    by_preset = {e["preset"]: e for e in summary}
+    assert by_preset["Balanced"]["runs"] == 2
+    assert by_preset["Balanced"]["errors"] == 1
+    assert by_preset["Fast"]["runs"] == 1
+
+
+def test_summarize_rows_leaves_cache_hits_out_of_the_timings():
+    (entry,) = summarize_rows([row(2.0), row(2.0), row(0.001, cached=True), row(0.001, cached=True)])
+    assert entry["cached"] == 2
+    assert entry["errors"] == 0
+    assert entry["latency_s_p50"] == 2.0
+    assert entry["ttft_s_p50"] == 0.5
+
+
+def test_all_cached_group_has_no_timings():
+    summary = summarize_rows([row(0.001, cached=True)])
+    assert summary[0]["latency_s_p50"] == 0.0
+    line = format_summary(summary).splitlines()[1]
+    assert "cached 1 (not timed)" in line
+    assert " - " in line